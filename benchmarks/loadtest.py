@@ -0,0 +1,482 @@
+# benchmarks/loadtest.py
+
+"""
+Load-test the client against a local mock of the Sector Alarm API.
+
+A mock API serving every registered endpoint runs in a separate process, so
+its CPU time is not counted against the client. It generates panels on
+demand with realistic payloads: sections, places and components for the
+housecheck categories, and locks, smart plugs, persons and log entries.
+Every category changes with the given probability per request.
+
+For every fleet size, a fresh interpreter creates one client per panel and
+polls the fleet through a Gateway, the scheduler behind 'sectoralarm serve'.
+A subscriber drains its feed. After one warm-up cycle, the measured cycles
+report:
+
+  throughput        Requests and panel polls per second
+  latency_ms        Request latency p50/p99/max as seen by the client
+  cycle_ms          Time to poll the whole fleet once
+  cpu_ms_per_poll   Client CPU time per panel poll (every category once)
+  rss_kb_per_panel  Resident memory growth per panel
+
+With --max-p99-ms, the largest fleet whose p99 latency stays within budget is
+reported as the capacity, and --min-capacity (which requires --max-p99-ms)
+fails the run below a given number of panels, so the figure can be
+re-checked on every release.
+
+Usage:
+  python benchmarks/loadtest.py [--panels=N[,N...]] [--cycles=N] [--interval=SECONDS]
+                                [--workers=N] [--devices=N] [--change-rate=R] [--latency-ms=MS]
+                                [--output=FILE] [--max-p99-ms=MS] [--min-capacity=N]
+  python benchmarks/loadtest.py --mock [--port=PORT] [--devices=N] [--change-rate=R] [--latency-ms=MS]
+"""
+
+import gc
+import getopt
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+DEFAULT_PANELS = "10,50,100"
+DEFAULT_CYCLES = 5
+DEFAULT_WORKERS = 32
+DEFAULT_DEVICES = 8
+DEFAULT_CHANGE_RATE = 0.1
+
+HOUSECHECK_FIELDS = {
+    "Temperatures": lambda rng: {"Temperature": f"{rng.uniform(17, 24):.1f}"},
+    "Humidity": lambda rng: {"Humidity": f"{rng.uniform(30, 60):.0f}", "Temperature": f"{rng.uniform(17, 24):.1f}"},
+    "Doors and Windows": lambda rng: {"Closed": rng.random() > 0.1},
+    "Smoke Detectors": lambda rng: {"Alarm": False, "Temperature": f"{rng.uniform(17, 24):.1f}"},
+    "Cameras": lambda rng: {"Online": True, "Model": "C300"},
+}
+
+
+# Mock API
+
+def _component(category, index, rng):
+    component = {
+        "Label": f"{category} {index + 1}",
+        "SerialNo": f"{rng.getrandbits(40):010X}",
+        "Type": category.rstrip("s"),
+        "LowBattery": False,
+        "SignalQuality": rng.randint(1, 5),
+        "LastUpdated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    component.update(HOUSECHECK_FIELDS.get(category, lambda rng: {})(rng))
+    return component
+
+
+def _housecheck(category, devices, rng):
+    sections = []
+    for section in range(2):
+        places = []
+        for place in range(section, devices, 2):
+            places.append({"Name": f"Room {place + 1}", "Components": [_component(category, place, rng)]})
+        sections.append({"Name": f"Floor {section + 1}", "Places": places})
+    return {"Sections": sections}
+
+
+def _log_entry(rng):
+    return {"User": rng.choice(["Code", "App", "Tag"]), "Channel": "Web",
+            "EventType": rng.choice(["armed", "disarmed", "partialarmed", "lock", "unlock"]),
+            "Time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def generate_category(category, devices, rng):
+    """Return realistic data for a category."""
+    if category == "Panel Status":
+        return {"Status": rng.choice([1, 2, 3]), "IsOnline": True, "StatusTime": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "AnnexAvailable": False, "ReadyToArm": True}
+    if category == "Lock Status":
+        return [{"Serial": f"L{index:05d}", "Label": f"Door {index + 1}", "Status": rng.choice(["lock", "unlock"]),
+                 "SoundLevel": 2, "AutoLockEnabled": True} for index in range(max(1, devices // 4))]
+    if category == "Smartplug Status":
+        return [{"Id": str(index), "Label": f"Plug {index + 1}", "SerialNo": f"P{index:05d}",
+                 "Status": rng.choice(["On", "Off"])} for index in range(max(1, devices // 4))]
+    if category == "Persons":
+        return [{"FirstName": f"Person {index + 1}", "LastName": "Test", "Email": f"person{index}@example.com",
+                 "PhoneNumber": "+4600000000", "IsAdmin": index == 0} for index in range(3)]
+    if category == "Leakage Detectors":
+        return [_component(category, index, rng) for index in range(max(1, devices // 4))]
+    if category == "Logs":
+        return [_log_entry(rng) for _ in range(50)]
+    return _housecheck(category, devices, rng)
+
+
+class MockPanel:
+    """A simulated panel; its data changes at random as it is read."""
+
+    def __init__(self, panel_id, categories, devices):
+        self.rng = random.Random(panel_id)
+        self.devices = devices
+        self.lock = threading.Lock()
+        self.bodies = {category: self._encode(generate_category(category, devices, self.rng))
+                       for category in categories}
+
+    @staticmethod
+    def _encode(data):
+        return json.dumps(data).encode("utf-8")
+
+    def body(self, category, change_rate):
+        with self.lock:
+            if self.rng.random() < change_rate:
+                self.bodies[category] = self._encode(generate_category(category, self.devices, self.rng))
+            return self.bodies[category]
+
+
+class MockAPI:
+    """Routes of every registered endpoint, and the panels generated so far."""
+
+    def __init__(self, devices=DEFAULT_DEVICES, change_rate=DEFAULT_CHANGE_RATE, latency_ms=0.0):
+        from sectoralarm.endpoints import action_names, data_categories, get_endpoint
+
+        self.devices = devices
+        self.change_rate = change_rate
+        self.latency = latency_ms / 1000.0
+        self.lock = threading.Lock()
+        self.panels = {}
+        self.categories = data_categories()
+        self.routes = []
+        for name in ["Login"] + self.categories + action_names():
+            endpoint = get_endpoint(name)
+            pattern = re.escape(endpoint.path).replace(re.escape("{panel_id}"), "(?P<panel_id>[^/?&]+)")
+            self.routes.append((endpoint.method, re.compile(pattern + "$"), endpoint))
+
+    def panel(self, panel_id):
+        panel = self.panels.get(panel_id)
+        if panel is None:
+            with self.lock:
+                panel = self.panels.get(panel_id)
+                if panel is None:
+                    panel = self.panels[panel_id] = MockPanel(panel_id, self.categories, self.devices)
+        return panel
+
+    def handle(self, method, path, headers, body):
+        """Return (status, body) for a request."""
+        from sectoralarm.endpoints import KIND_AUTH, KIND_DATA
+
+        if self.latency:
+            time.sleep(self.latency)
+        for route_method, pattern, endpoint in self.routes:
+            match = pattern.match(path)
+            if route_method != method or match is None:
+                continue
+            if endpoint.kind == KIND_AUTH:
+                return 200, b'{"AuthorizationToken": "loadtest-token"}'
+            if not headers.get("Authorization"):
+                return 401, b'{"Message": "Authorization has been denied for this request."}'
+            if endpoint.kind != KIND_DATA:
+                return 200, b"{}"
+            panel_id = match.groupdict().get("panel_id")
+            if panel_id is None:
+                panel_id = str(json.loads(body or b"{}").get("panelId"))
+            return 200, self.panel(panel_id).body(endpoint.name, self.change_rate)
+        return 404, b'{"Message": "No HTTP resource was found."}'
+
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        # Query strings are part of some endpoint paths, so match on the full path
+        status, payload = self.server.api.handle(method, self.path, self.headers, body)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._respond("GET")
+
+    def do_POST(self):
+        self._respond("POST")
+
+
+def serve_mock(port, devices, change_rate, latency_ms):
+    """Serve the mock API until interrupted, printing its URL first."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockRequestHandler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    server.api = MockAPI(devices, change_rate, latency_ms)
+    print(f"http://127.0.0.1:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def start_mock(devices, change_rate, latency_ms):
+    """Start the mock API in a separate process; return the process and its URL."""
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--mock", "--port=0", f"--devices={devices}",
+         f"--change-rate={change_rate}", f"--latency-ms={latency_ms}"],
+        cwd=REPO_ROOT, stdout=subprocess.PIPE,
+    )
+    url = process.stdout.readline().decode("utf-8").strip()
+    if not url:
+        process.kill()
+        raise RuntimeError("The mock API failed to start.")
+    return process, url
+
+
+# Load generation
+
+def rss_bytes():
+    """Return the resident set size of this process, or the peak where the current size is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentiles(values):
+    """Return p50, p99 and max of a list of milliseconds."""
+    if not values:
+        return {"p50": 0.0, "p99": 0.0, "max": 0.0}
+    values = sorted(values)
+    return {
+        "p50": round(statistics.median(values), 2),
+        "p99": round(values[min(len(values) - 1, int(len(values) * 0.99))], 2),
+        "max": round(values[-1], 2),
+    }
+
+
+def run_fleet(url, panels, cycles, interval, workers):
+    """
+    Poll a fleet of panels against the mock API and measure the client.
+
+    :return: Dictionary of results, see the module documentation.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from sectoralarm.breaker import CircuitBreakers
+    from sectoralarm.client import SectorAlarmAPI
+    from sectoralarm.endpoints import ApiProfile
+    from sectoralarm.gateway import Gateway
+    from sectoralarm.hooks import Hooks
+    from sectoralarm.transport import TransportPool
+
+    class LatencyRecorder(Hooks):
+        def __init__(self):
+            self.lock = threading.Lock()
+            self.latencies = []
+            self.errors = 0
+
+        def on_request_end(self, context):
+            with self.lock:
+                self.latencies.append(context.duration * 1000)
+                if context.error is not None or (context.status_code or 0) >= 400:
+                    self.errors += 1
+
+    profile = ApiProfile("loadtest", base_url=url)
+    transport = TransportPool(pool_maxsize=workers)
+    transport.session  # Import the HTTP library before taking the baseline
+    breakers = CircuitBreakers()
+    gc.collect()
+    rss_before = rss_bytes()
+
+    recorder = LatencyRecorder()
+    apis = [SectorAlarmAPI("loadtest@example.com", "password", str(100000 + index), "1234", transport=transport,
+                           hooks=[recorder], profile=profile, breakers=breakers)
+            for index in range(panels)]
+    apis[0].login()
+    for api in apis[1:]:
+        api.auth_token = apis[0].auth_token
+
+    gateway = Gateway(apis, interval=interval, workers=workers)
+    subscriber = gateway.subscribe()
+    stop = threading.Event()
+    exported = [0]
+
+    def drain():
+        while not stop.is_set():
+            if subscriber.get(timeout=0.2) is not None:
+                exported[0] += 1
+
+    drainer = threading.Thread(target=drain, daemon=True)
+    drainer.start()
+
+    cycle_ms = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Every poll retrieves every category: the harness measures upstream polling, not TTL cache hits
+        gateway.poll(executor, force=True)  # Warm up: first retrievals, connections and caches
+        recorder.latencies = []
+        recorder.errors = 0
+        exported[0] = 0
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        for cycle in range(cycles):
+            start = time.perf_counter()
+            gateway.poll(executor, force=True)
+            elapsed = time.perf_counter() - start
+            cycle_ms.append(elapsed * 1000)
+            if interval and cycle < cycles - 1:
+                time.sleep(max(0.0, interval - elapsed))
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+
+    stop.set()
+    drainer.join()
+    gc.collect()
+    rss_after = rss_bytes()
+    transport.close()
+
+    requests = len(recorder.latencies)
+    polls = panels * cycles
+    return {
+        "panels": panels,
+        "cycles": cycles,
+        "requests": requests,
+        "errors": recorder.errors,
+        "duration_s": round(wall, 3),
+        "throughput": {"requests_per_s": round(requests / wall, 1), "panel_polls_per_s": round(polls / wall, 1)},
+        "latency_ms": percentiles(recorder.latencies),
+        "cycle_ms": percentiles(cycle_ms),
+        "cpu_percent": round(100 * cpu / wall, 1),
+        "cpu_ms_per_poll": round(cpu * 1000 / polls, 3),
+        "rss_mb": round(rss_after / 2 ** 20, 1),
+        "rss_kb_per_panel": round((rss_after - rss_before) / 1024 / panels, 1),
+        "messages_exported": exported[0],
+    }
+
+
+def run_fleet_process(url, panels, cycles, interval, workers):
+    """Run one fleet size in a fresh interpreter, so memory and CPU are measured per size."""
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), f"--url={url}", f"--panels={panels}", f"--cycles={cycles}",
+         f"--interval={interval}", f"--workers={workers}", "--single"],
+        cwd=REPO_ROOT, stdout=subprocess.PIPE, check=True,
+    ).stdout
+    return json.loads(output.decode("utf-8"))
+
+
+def main():
+    try:
+        opts, _ = getopt.getopt(sys.argv[1:], "n:o:", [
+            "panels=", "cycles=", "interval=", "workers=", "devices=", "change-rate=", "latency-ms=",
+            "output=", "max-p99-ms=", "min-capacity=", "mock", "port=", "url=", "single"])
+    except getopt.GetoptError as err:
+        print(f"Error: {err}")
+        print(__doc__)
+        sys.exit(2)
+
+    panel_counts = DEFAULT_PANELS
+    cycles = DEFAULT_CYCLES
+    interval = 0.0
+    workers = DEFAULT_WORKERS
+    devices = DEFAULT_DEVICES
+    change_rate = DEFAULT_CHANGE_RATE
+    latency_ms = 0.0
+    output_file = None
+    max_p99_ms = None
+    min_capacity = None
+    mock = False
+    single = False
+    port = 0
+    url = None
+    for o, a in opts:
+        if o in ("-n", "--panels"):
+            panel_counts = a
+        elif o == "--cycles":
+            cycles = int(a)
+        elif o == "--interval":
+            interval = float(a)
+        elif o == "--workers":
+            workers = int(a)
+        elif o == "--devices":
+            devices = int(a)
+        elif o == "--change-rate":
+            change_rate = float(a)
+        elif o == "--latency-ms":
+            latency_ms = float(a)
+        elif o in ("-o", "--output"):
+            output_file = a
+        elif o == "--max-p99-ms":
+            max_p99_ms = float(a)
+        elif o == "--min-capacity":
+            min_capacity = int(a)
+        elif o == "--mock":
+            mock = True
+        elif o == "--port":
+            port = int(a)
+        elif o == "--url":
+            url = a
+        elif o == "--single":
+            single = True
+
+    if min_capacity is not None and max_p99_ms is None:
+        print("Error: --min-capacity requires --max-p99-ms, the latency budget defining capacity.")
+        sys.exit(2)
+
+    if mock:
+        serve_mock(port, devices, change_rate, latency_ms)
+        return
+    sizes = sorted(int(size) for size in panel_counts.split(","))
+    if single:
+        print(json.dumps(run_fleet(url, sizes[0], cycles, interval, workers)))
+        return
+
+    process = None
+    if url is None:
+        process, url = start_mock(devices, change_rate, latency_ms)
+    try:
+        runs = []
+        for size in sizes:
+            run = run_fleet_process(url, size, cycles, interval, workers)
+            runs.append(run)
+            print(f"{size:>6} panels: {run['throughput']['requests_per_s']:>8} req/s, "
+                  f"p50 {run['latency_ms']['p50']} ms, p99 {run['latency_ms']['p99']} ms, "
+                  f"cpu {run['cpu_ms_per_poll']} ms/poll, rss {run['rss_kb_per_panel']} KB/panel",
+                  file=sys.stderr)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "options": {"cycles": cycles, "interval": interval, "workers": workers, "devices": devices,
+                    "change_rate": change_rate, "latency_ms": latency_ms},
+        "runs": runs,
+    }
+    if max_p99_ms is not None:
+        within = [run["panels"] for run in runs if run["latency_ms"]["p99"] <= max_p99_ms and not run["errors"]]
+        result["max_p99_ms"] = max_p99_ms
+        result["capacity"] = max(within, default=0)
+    print(json.dumps(result, indent=4))
+
+    if output_file:
+        with open(output_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+
+    if min_capacity is not None and result.get("capacity", 0) < min_capacity:
+        print(f"Error: capacity of {result.get('capacity', 0)} panels is below {min_capacity} "
+              f"(p99 budget {max_p99_ms} ms)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# benchmarks/startup.py
+
+"""
+Measure the startup time of the sectoralarm command-line entry point.
+
+Each run starts a fresh interpreter that imports sectoralarm.main and invokes
+it with --help, which exercises the import path taken by every invocation
+without touching the network. Results can be appended to a JSON lines file
+so startup time can be tracked across releases.
+
+Usage:
+  python benchmarks/startup.py [--runs=N] [--output=FILE] [--max-ms=MS]
+"""
+
+import getopt
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINT = (
+    "import sys; sys.argv = ['sectoralarm', '--help']\n"
+    "from sectoralarm.main import main\n"
+    "try:\n"
+    "    main()\n"
+    "except SystemExit:\n"
+    "    pass\n"
+)
+
+# Modules that must not be imported on paths that never hit the network
+HEAVY_MODULES = ("requests", "urllib3")
+
+IMPORT_CHECK = (
+    "import sys, json, io, contextlib\n"
+    "with contextlib.redirect_stdout(io.StringIO()):\n"
+    + "".join("    " + line + "\n" for line in ENTRY_POINT.splitlines())
+    + "print(json.dumps([m for m in %r if m in sys.modules]))\n" % (HEAVY_MODULES,)
+)
+
+
+def run_once(code):
+    """Run the code in a fresh interpreter and return the wall time in milliseconds."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=REPO_ROOT,
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+    return (time.perf_counter() - start) * 1000
+
+
+def baseline_ms(runs):
+    """Return the median startup time of a bare interpreter, for reference."""
+    return statistics.median(run_once("pass") for _ in range(runs))
+
+
+def heavy_modules_loaded():
+    """Return the heavy modules that were imported by the entry point."""
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_CHECK],
+        cwd=REPO_ROOT,
+        stdout=subprocess.PIPE,
+        check=True,
+    ).stdout
+    return json.loads(output.decode("utf-8"))
+
+
+def main():
+    try:
+        opts, _ = getopt.getopt(sys.argv[1:], "n:o:", ["runs=", "output=", "max-ms="])
+    except getopt.GetoptError as err:
+        print(f"Error: {err}")
+        print(__doc__)
+        sys.exit(2)
+
+    runs = 20
+    output_file = None
+    max_ms = None
+    for o, a in opts:
+        if o in ("-n", "--runs"):
+            runs = int(a)
+        elif o in ("-o", "--output"):
+            output_file = a
+        elif o == "--max-ms":
+            max_ms = float(a)
+
+    run_once(ENTRY_POINT)  # Warm up the filesystem and bytecode caches
+    timings = [run_once(ENTRY_POINT) for _ in range(runs)]
+    interpreter_ms = baseline_ms(max(3, runs // 4))
+    loaded = heavy_modules_loaded()
+
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "runs": runs,
+        "min_ms": round(min(timings), 2),
+        "median_ms": round(statistics.median(timings), 2),
+        "max_ms": round(max(timings), 2),
+        "interpreter_ms": round(interpreter_ms, 2),
+        "heavy_modules": loaded,
+    }
+    print(json.dumps(result, indent=4))
+
+    if output_file:
+        with open(output_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+
+    if loaded:
+        print(f"Error: heavy modules imported at startup: {', '.join(loaded)}")
+        sys.exit(1)
+    if max_ms is not None and result["median_ms"] > max_ms:
+        print(f"Error: median startup {result['median_ms']} ms exceeds budget of {max_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
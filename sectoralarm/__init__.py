@@ -1,6 +1,24 @@
 # sectoralarm/__init__.py
 
-from .client import SectorAlarmAPI
-from .exceptions import AuthenticationError, APIRequestError
+from .exceptions import AuthenticationError, APIRequestError, CircuitOpenError
 
-__all__ = ['SectorAlarmAPI', 'AuthenticationError', 'APIRequestError']
+__all__ = ['SectorAlarmAPI', 'AuthenticationError', 'APIRequestError', 'CircuitOpenError']
+
+# Attributes resolved on first access so that importing the package stays cheap
+_LAZY_ATTRIBUTES = {
+    'SectorAlarmAPI': '.client',
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,26 +1,130 @@
 # sectoralarm/actions.py
 
+import time
 import logging
-from .endpoints import get_action_endpoints, API_URL
+from concurrent.futures import ThreadPoolExecutor
+from .endpoints import get_endpoint
+from .exceptions import CircuitOpenError
 
 logger = logging.getLogger("SectorAlarmAPI")
 
+# Panel Status "Status" values
+PANEL_STATUS_DISARMED = 1
+PANEL_STATUS_PARTIALLY_ARMED = 2
+PANEL_STATUS_ARMED = 3
+
+# Lock Status "Status" values
+LOCK_STATUS_LOCKED = "lock"
+LOCK_STATUS_UNLOCKED = "unlock"
+
+# Smartplug Status "Status" values, compared case-insensitively
+SMARTPLUG_STATUS_ON = "on"
+SMARTPLUG_STATUS_OFF = "off"
+
+# Fields identifying a device in Lock Status and Smartplug Status, in order of preference
+LOCK_ID_FIELDS = ("Serial", "SerialNo")
+SMARTPLUG_ID_FIELDS = ("Id", "DeviceId", "SerialNo", "Serial")
+
+# Concurrent requests of the bulk actions
+BULK_WORKERS = 8
+
+# Confirmation polling: first delay, backoff factor, maximum delay and deadline in seconds
+WAIT_INITIAL_INTERVAL = 0.5
+WAIT_BACKOFF = 1.5
+WAIT_MAX_INTERVAL = 4.0
+WAIT_TIMEOUT = 30.0
+
+
+def _device_id(device, fields):
+    for field in fields:
+        if device.get(field) not in (None, ""):
+            return device[field]
+    return None
+
+
+def _same_id(device_id, wanted):
+    # IDs given on the command line are strings, while the API may report numbers
+    return device_id is not None and str(device_id) == str(wanted)
+
+
+def run_bulk(action, keys, workers=BULK_WORKERS):
+    """
+    Run an action for many keys concurrently with a bounded worker pool.
+
+    :param action: Callable receiving a key and returning True on success.
+    :param keys: The keys, e.g. lock serials or clients.
+    :param workers: Maximum number of concurrent actions.
+    :return: Dictionary of {key: success}; actions that raised count as failed.
+    """
+    keys = list(keys)
+    if not keys:
+        return {}
+
+    def attempt(key):
+        try:
+            return bool(action(key))
+        except Exception as e:
+            logger.error(f"Bulk action failed for {key}: {e}")
+            return False
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(keys)))) as executor:
+        return dict(zip(keys, executor.map(attempt, keys)))
+
+
+def arm_many(apis, wait=False, timeout=WAIT_TIMEOUT, workers=BULK_WORKERS):
+    """
+    Arm many panels concurrently.
+
+    :param apis: Logged in SectorAlarmAPI instances, one per panel.
+    :return: Dictionary of {panel ID: success}.
+    """
+    results = run_bulk(lambda api: api.actions_manager.arm_system(wait, timeout), apis, workers)
+    return {api.panel_id: success for api, success in results.items()}
+
+
+def disarm_many(apis, wait=False, timeout=WAIT_TIMEOUT, workers=BULK_WORKERS):
+    """
+    Disarm many panels concurrently.
+
+    :param apis: Logged in SectorAlarmAPI instances, one per panel.
+    :return: Dictionary of {panel ID: success}.
+    """
+    results = run_bulk(lambda api: api.actions_manager.disarm_system(wait, timeout), apis, workers)
+    return {api.panel_id: success for api, success in results.items()}
+
 
 class ActionsManager:
     def __init__(self, api):
         self.api = api  # Reference to the SectorAlarmAPI instance
 
-    def lock_door(self, lock_serial):
-        """Lock the specified door."""
-        endpoints = get_action_endpoints()
-        endpoint = endpoints["Lock"]
-        method, url = endpoint
+    def _perform(self, name, payload, done, failed):
+        """
+        Send an action request and log its outcome.
 
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": self.api.auth_token,
-            "API-Version": "5"
-        }
+        :param name: The action endpoint, e.g. "Lock".
+        :param payload: The JSON payload.
+        :param done: Message logged on success, e.g. "Door locked successfully."
+        :param failed: What failed, e.g. "lock door".
+        :return: True if the panel accepted the action.
+        """
+        try:
+            response, _ = self.api.call(name, payload)
+        except CircuitOpenError as e:
+            logger.error(f"Failed to {failed}. {e}")
+            return False
+        if response.status_code == 200:
+            logger.info(done)
+            return True
+        logger.error(f"Failed to {failed}. Status code: {response.status_code}")
+        logger.error(response.text)
+        return False
+
+    def lock_door(self, lock_serial, wait=False, timeout=WAIT_TIMEOUT):
+        """
+        Lock the specified door.
+
+        With wait=True, poll until the panel reports the new state or the timeout expires.
+        """
         payload = {
             "LockSerial": lock_serial,
             "PanelCode": "",
@@ -28,26 +132,18 @@ class ActionsManager:
             "Platform": "web"
         }
 
-        response = self.api.session.post(url, headers=headers, json=payload, timeout=30)
-        if response.status_code == 200:
-            logger.info("Door locked successfully.")
-            return True
-        else:
-            logger.error(f"Failed to lock door. Status code: {response.status_code}")
-            logger.error(response.text)
+        if not self._perform("Lock", payload, "Door locked successfully.", "lock door"):
             return False
+        if wait:
+            return self.wait_for_lock_status(lock_serial, LOCK_STATUS_LOCKED, timeout)
+        return True
 
-    def unlock_door(self, lock_serial):
-        """Unlock the specified door."""
-        endpoints = get_action_endpoints()
-        endpoint = endpoints["Unlock"]
-        method, url = endpoint
+    def unlock_door(self, lock_serial, wait=False, timeout=WAIT_TIMEOUT):
+        """
+        Unlock the specified door.
 
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": self.api.auth_token,
-            "API-Version": "5"
-        }
+        With wait=True, poll until the panel reports the new state or the timeout expires.
+        """
         payload = {
             "LockSerial": lock_serial,
             "PanelCode": self.api.panel_code,
@@ -55,74 +151,232 @@ class ActionsManager:
             "Platform": "web"
         }
 
-        response = self.api.session.post(url, headers=headers, json=payload, timeout=30)
-        if response.status_code == 200:
-            logger.info("Door unlocked successfully.")
-            return True
-        else:
-            logger.error(f"Failed to unlock door. Status code: {response.status_code}")
-            logger.error(response.text)
+        if not self._perform("Unlock", payload, "Door unlocked successfully.", "unlock door"):
             return False
+        if wait:
+            return self.wait_for_lock_status(lock_serial, LOCK_STATUS_UNLOCKED, timeout)
+        return True
 
-    def arm_system(self):
-        """Arm the security system."""
-        endpoints = get_action_endpoints()
-        endpoint = endpoints["Arm"]
-        method, url = endpoint
+    def arm_system(self, wait=False, timeout=WAIT_TIMEOUT):
+        """
+        Arm the security system.
 
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": self.api.auth_token,
-            "API-Version": "5"
-        }
+        With wait=True, poll until the panel reports the new state or the timeout expires.
+        """
         payload = {"PanelId": self.api.panel_id}
 
-        response = self.api.session.post(url, headers=headers, json=payload, timeout=30)
-        if response.status_code == 200:
-            logger.info("System armed successfully.")
-            return True
-        else:
-            logger.error(f"Failed to arm system. Status code: {response.status_code}")
-            logger.error(response.text)
+        if not self._perform("Arm", payload, "System armed successfully.", "arm system"):
             return False
+        if wait:
+            return self.wait_for_panel_status(PANEL_STATUS_ARMED, timeout)
+        return True
 
-    def disarm_system(self):
-        """Disarm the security system."""
-        endpoints = get_action_endpoints()
-        endpoint = endpoints["Disarm"]
-        method, url = endpoint
+    def arm_partial(self, wait=False, timeout=WAIT_TIMEOUT):
+        """
+        Partially arm the security system (home mode).
 
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": self.api.auth_token,
-            "API-Version": "5"
+        With wait=True, poll until the panel reports the new state or the timeout expires.
+        """
+        payload = {
+            "PanelCode": self.api.panel_code,
+            "PanelId": self.api.panel_id
         }
+
+        if not self._perform("PartialArm", payload, "System partially armed successfully.", "partially arm system"):
+            return False
+        if wait:
+            return self.wait_for_panel_status(PANEL_STATUS_PARTIALLY_ARMED, timeout)
+        return True
+
+    def disarm_system(self, wait=False, timeout=WAIT_TIMEOUT):
+        """
+        Disarm the security system.
+
+        With wait=True, poll until the panel reports the new state or the timeout expires.
+        """
         payload = {
             "PanelCode": self.api.panel_code,
             "PanelId": self.api.panel_id
         }
 
-        response = self.api.session.post(url, headers=headers, json=payload, timeout=30)
-        if response.status_code == 200:
-            logger.info("System disarmed successfully.")
-            return True
-        else:
-            logger.error(f"Failed to disarm system. Status code: {response.status_code}")
-            logger.error(response.text)
+        if not self._perform("Disarm", payload, "System disarmed successfully.", "disarm system"):
             return False
+        if wait:
+            return self.wait_for_panel_status(PANEL_STATUS_DISARMED, timeout)
+        return True
 
-    def get_system_status(self):
-        """Get the current status of the security system."""
-        url = f"{API_URL}/api/Panel/GetPanelStatus?panelId={self.api.panel_id}"
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": self.api.auth_token,
-            "API-Version": "5"
+    def arm_annex(self):
+        """Arm the annex of the security system."""
+        payload = {
+            "PanelCode": self.api.panel_code,
+            "PanelId": self.api.panel_id
         }
+        return self._perform("ArmAnnex", payload, "Annex armed successfully.", "arm annex")
 
-        response = self.api.session.get(url, headers=headers, timeout=30)
-        if response.status_code == 200:
-            return response.json()
+    def disarm_annex(self):
+        """Disarm the annex of the security system."""
+        payload = {
+            "PanelCode": self.api.panel_code,
+            "PanelId": self.api.panel_id
+        }
+        return self._perform("DisarmAnnex", payload, "Annex disarmed successfully.", "disarm annex")
+
+    def turn_on_smartplug(self, plug_id, wait=False, timeout=WAIT_TIMEOUT):
+        """
+        Turn the specified smart plug on.
+
+        With wait=True, poll until the panel reports the new state or the timeout expires.
+        """
+        return self.set_smartplug(plug_id, True, wait, timeout)
+
+    def turn_off_smartplug(self, plug_id, wait=False, timeout=WAIT_TIMEOUT):
+        """
+        Turn the specified smart plug off.
+
+        With wait=True, poll until the panel reports the new state or the timeout expires.
+        """
+        return self.set_smartplug(plug_id, False, wait, timeout)
+
+    def set_smartplug(self, plug_id, on, wait=False, timeout=WAIT_TIMEOUT):
+        """Turn the specified smart plug on or off."""
+        payload = {
+            "DeviceId": plug_id,
+            "PanelId": self.api.panel_id,
+            "Platform": "web"
+        }
+
+        if on:
+            accepted = self._perform("TurnOnSmartplug", payload, "Smart plug turned on successfully.",
+                                     "turn on smart plug")
         else:
-            logger.error(f"Failed to retrieve system status. Status code: {response.status_code}")
+            accepted = self._perform("TurnOffSmartplug", payload, "Smart plug turned off successfully.",
+                                     "turn off smart plug")
+        if not accepted:
+            return False
+        if wait:
+            status = SMARTPLUG_STATUS_ON if on else SMARTPLUG_STATUS_OFF
+            return self.wait_for_smartplug_status(plug_id, status, timeout)
+        return True
+
+    def lock_all(self, wait=False, timeout=WAIT_TIMEOUT, workers=BULK_WORKERS):
+        """
+        Lock every door of the panel concurrently.
+
+        :return: Dictionary of {lock serial: success}, or None if the locks could not be listed.
+        """
+        serials = self._device_ids("Lock Status", LOCK_ID_FIELDS)
+        if serials is None:
             return None
+        return run_bulk(lambda serial: self.lock_door(serial, wait, timeout), serials, workers)
+
+    def unlock_all(self, wait=False, timeout=WAIT_TIMEOUT, workers=BULK_WORKERS):
+        """
+        Unlock every door of the panel concurrently.
+
+        :return: Dictionary of {lock serial: success}, or None if the locks could not be listed.
+        """
+        serials = self._device_ids("Lock Status", LOCK_ID_FIELDS)
+        if serials is None:
+            return None
+        return run_bulk(lambda serial: self.unlock_door(serial, wait, timeout), serials, workers)
+
+    def set_smartplugs(self, states, wait=False, timeout=WAIT_TIMEOUT, workers=BULK_WORKERS):
+        """
+        Switch several smart plugs concurrently.
+
+        :param states: Dictionary of {plug ID: True for on, False for off}, or a
+                       single bool to switch every smart plug of the panel.
+        :return: Dictionary of {plug ID: success}, or None if the plugs could not be listed.
+        """
+        if isinstance(states, bool):
+            plug_ids = self._device_ids("Smartplug Status", SMARTPLUG_ID_FIELDS)
+            if plug_ids is None:
+                return None
+            states = {plug_id: states for plug_id in plug_ids}
+        return run_bulk(lambda plug_id: self.set_smartplug(plug_id, states[plug_id], wait, timeout),
+                        list(states), workers)
+
+    def _device_ids(self, category, fields):
+        """Return the IDs of every device listed in a category, or None if it could not be retrieved."""
+        devices = self.api.retrieve_category_data(category)
+        if devices is None:
+            logger.error(f"Failed to retrieve {category}.")
+            return None
+        ids = []
+        for device in devices:
+            device_id = _device_id(device, fields)
+            if device_id is not None:
+                ids.append(device_id)
+        return ids
+
+    def get_system_status(self):
+        """Get the current status of the security system.
+
+        Shares the "Panel Status" category request, so it is coalesced with concurrent retrievals.
+        """
+        status = self.api.retrieve_category_data("Panel Status")
+        if status is None:
+            logger.error("Failed to retrieve system status.")
+        return status
+
+    def wait_for_state(self, category, predicate, timeout=WAIT_TIMEOUT):
+        """
+        Poll a category until its data satisfies the predicate.
+
+        The delay between polls starts short and backs off up to WAIT_MAX_INTERVAL.
+        Every successful poll updates the cache, so the confirmed state is available
+        from the cache manager without a separate refresh.
+
+        :param category: The category to poll, e.g. "Panel Status".
+        :param predicate: Callable receiving the category data, returning True once confirmed.
+        :param timeout: Deadline in seconds.
+        :return: True if the state was confirmed before the deadline, False otherwise.
+        :raises ValueError: If the category's endpoint is not idempotent, and so must not be polled.
+        """
+        endpoint = get_endpoint(category)
+        if endpoint is None or not endpoint.idempotent:
+            raise ValueError(f"Cannot wait on {category}: only idempotent endpoints may be polled.")
+        deadline = time.monotonic() + timeout
+        interval = WAIT_INITIAL_INTERVAL
+        attempt = 0
+        while True:
+            data = self.api.retrieve_category_data(category)
+            # Stale data served while the API is unavailable cannot confirm anything
+            if data is not None and not self.api.cache_manager.is_stale(category) and predicate(data):
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning(f"Timed out after {timeout}s waiting for {category} to confirm the action.")
+                return False
+            attempt += 1
+            delay = min(interval, remaining)
+            self.api.hooks.on_retry(self.api.panel_id, category, attempt, delay)
+            time.sleep(delay)
+            interval = min(interval * WAIT_BACKOFF, WAIT_MAX_INTERVAL)
+
+    def wait_for_panel_status(self, status, timeout=WAIT_TIMEOUT):
+        """Wait until the panel reports the given arming status."""
+        return self.wait_for_state(
+            "Panel Status",
+            lambda data: data.get("Status") == status,
+            timeout
+        )
+
+    def wait_for_lock_status(self, lock_serial, status, timeout=WAIT_TIMEOUT):
+        """Wait until the specified lock reports the given status."""
+        def confirmed(locks):
+            return any(
+                _same_id(_device_id(lock, LOCK_ID_FIELDS), lock_serial) and lock.get("Status") == status
+                for lock in locks
+            )
+        return self.wait_for_state("Lock Status", confirmed, timeout)
+
+    def wait_for_smartplug_status(self, plug_id, status, timeout=WAIT_TIMEOUT):
+        """Wait until the specified smart plug reports the given status."""
+        def confirmed(plugs):
+            return any(
+                _same_id(_device_id(plug, SMARTPLUG_ID_FIELDS), plug_id)
+                and str(plug.get("Status", "")).lower() == status
+                for plug in plugs
+            )
+        return self.wait_for_state("Smartplug Status", confirmed, timeout)
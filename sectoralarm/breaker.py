@@ -0,0 +1,168 @@
+# sectoralarm/breaker.py
+
+"""
+Circuit breakers for the upstream API.
+
+Each (panel, endpoint) pair has its own breaker. A breaker is closed while
+requests succeed. After failure_threshold consecutive failures it opens:
+requests fail fast with CircuitOpenError instead of waiting out their
+timeout, and category reads are served from the cache, flagged as stale.
+Once reset_timeout has passed the breaker is half-open and lets a limited
+number of probe requests through. A successful probe closes it again; a
+failed probe opens it for twice as long, up to max_reset_timeout.
+"""
+
+import threading
+import time
+import logging
+
+from .exceptions import CircuitOpenError
+
+logger = logging.getLogger("SectorAlarmAPI")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+DEFAULT_MAX_RESET_TIMEOUT = 300.0
+DEFAULT_HALF_OPEN_CALLS = 1
+
+
+def is_failure(status_code):
+    """Return True for responses that indicate an unhealthy upstream rather than a bad request."""
+    return status_code >= 500 or status_code == 429
+
+
+class CircuitBreaker:
+    """Track the health of one endpoint of one panel.
+
+    :param name: Label used in logs and errors, e.g. "123456 / Panel Status".
+    :param failure_threshold: Consecutive failures that open the breaker.
+    :param reset_timeout: Seconds the breaker stays open before probing.
+    :param max_reset_timeout: Upper bound of the open period after repeated failed probes.
+    :param half_open_calls: Probe requests let through at a time while half-open.
+    """
+
+    def __init__(self, name, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT,
+                 max_reset_timeout=DEFAULT_MAX_RESET_TIMEOUT, half_open_calls=DEFAULT_HALF_OPEN_CALLS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.half_open_calls = half_open_calls
+        self.lock = threading.Lock()
+        self._state = CLOSED
+        self.failures = 0  # Consecutive failures
+        self.opened_at = None
+        self.open_timeout = reset_timeout
+        self.probes = 0  # Probe requests in flight while half-open
+        self.rejected = 0
+
+    @property
+    def state(self):
+        with self.lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == OPEN and time.monotonic() - self.opened_at >= self.open_timeout:
+            self._state = HALF_OPEN
+            self.probes = 0
+        return self._state
+
+    def retry_after(self):
+        """Seconds until the breaker lets a probe through, 0.0 unless open."""
+        with self.lock:
+            if self._current_state() != OPEN:
+                return 0.0
+            return max(0.0, self.open_timeout - (time.monotonic() - self.opened_at))
+
+    def allow(self):
+        """Return True if a request may be sent now, counting it as a probe while half-open."""
+        with self.lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self.probes < self.half_open_calls:
+                self.probes += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def check(self):
+        """Like allow(), but raise CircuitOpenError instead of returning False."""
+        if not self.allow():
+            raise CircuitOpenError(f"Circuit for {self.name} is open; retry in {self.retry_after():.0f}s.")
+
+    def record_success(self):
+        with self.lock:
+            if self._state != CLOSED:
+                logger.info(f"Circuit for {self.name} closed.")
+            self._state = CLOSED
+            self.failures = 0
+            self.probes = 0
+            self.open_timeout = self.reset_timeout
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            state = self._current_state()
+            if state == HALF_OPEN:
+                # The probe failed: stay open longer before the next one
+                self.open_timeout = min(self.open_timeout * 2, self.max_reset_timeout)
+                self._open()
+            elif state == CLOSED and self.failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        self._state = OPEN
+        self.opened_at = time.monotonic()
+        self.probes = 0
+        logger.warning(f"Circuit for {self.name} opened after {self.failures} failures; "
+                       f"failing fast for {self.open_timeout:.0f}s.")
+
+    def as_dict(self):
+        with self.lock:
+            return {"state": self._current_state(), "failures": self.failures, "rejected": self.rejected}
+
+
+class CircuitBreakers:
+    """The breakers of any number of clients, one per (panel, endpoint), created on first use.
+
+    Takes the CircuitBreaker options, which apply to every breaker it creates.
+    """
+
+    def __init__(self, **options):
+        self.options = options
+        self.lock = threading.Lock()
+        self.breakers = {}
+
+    def get(self, panel_id, endpoint):
+        """Return the breaker of a panel's endpoint."""
+        key = (panel_id, endpoint)
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            with self.lock:
+                breaker = self.breakers.get(key)
+                if breaker is None:
+                    breaker = self.breakers[key] = CircuitBreaker(f"{panel_id} / {endpoint}", **self.options)
+        return breaker
+
+    def open_circuits(self):
+        """Return the labels of the breakers that are not closed, with their state."""
+        circuits = {}
+        for breaker in list(self.breakers.values()):
+            state = breaker.state
+            if state != CLOSED:
+                circuits[breaker.name] = state
+        return circuits
+
+    def stats(self):
+        """Return the state of every breaker, keyed by "panel / endpoint"."""
+        return {breaker.name: breaker.as_dict() for breaker in list(self.breakers.values())}
+
+
+# Breakers shared by every client in the process, so that clients for the same
+# panel see the same upstream health
+default_breakers = CircuitBreakers()
@@ -0,0 +1,298 @@
+# sectoralarm/cache.py
+
+import json
+import numbers
+import time
+import threading
+import logging
+from collections import OrderedDict
+from .endpoints import data_categories, get_endpoint
+from .utils import extract_structure, compact, estimate_size
+
+logger = logging.getLogger("SectorAlarmAPI")
+
+CACHE_FILE = "sectoralarm_cache_{panel_id}.json"
+
+
+class CacheEntry:
+    """The latest data retrieved for a category and when it was retrieved."""
+
+    __slots__ = ('data', 'timestamp', 'size', 'stale')
+
+    def __init__(self, data, timestamp=None, size=0):
+        self.data = data
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.size = size  # Estimated bytes, only measured under a memory budget
+        self.stale = False  # Served in place of a failed retrieval, see CacheManager.get_stale_data()
+
+    @property
+    def age(self):
+        """Seconds since the data was retrieved."""
+        return time.time() - self.timestamp
+
+
+class MemoryBudget:
+    """A limit on the memory used by cached data, shared by any number of cache managers.
+
+    Entries are evicted least recently used first once the estimated size of
+    all entries exceeds max_bytes. Share one budget between the clients of a
+    fleet to bound the memory of the whole process.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.sizes = OrderedDict()  # {(cache_manager, category): bytes}, least recently used first
+        self.used = 0
+        self.evictions = 0
+
+    def charge(self, owner, category, size):
+        """Account for a stored entry and evict other entries until within budget."""
+        with self.lock:
+            key = (owner, category)
+            self.used += size - self.sizes.pop(key, 0)
+            self.sizes[key] = size
+            while self.used > self.max_bytes and len(self.sizes) > 1:
+                victim, victim_size = next(iter(self.sizes.items()))
+                if victim == key:
+                    break
+                del self.sizes[victim]
+                self.used -= victim_size
+                self.evictions += 1
+                victim_owner, victim_category = victim
+                victim_owner.evict(victim_category)
+
+    def touch(self, owner, category):
+        """Mark an entry as recently used."""
+        with self.lock:
+            key = (owner, category)
+            if key in self.sizes:
+                self.sizes.move_to_end(key)
+
+    def release(self, owner, category=None):
+        """Stop accounting for one entry, or every entry of a cache manager."""
+        with self.lock:
+            keys = [(owner, category)] if category is not None else [k for k in self.sizes if k[0] is owner]
+            for key in keys:
+                self.used -= self.sizes.pop(key, 0)
+
+    def usage(self):
+        with self.lock:
+            return {"bytes": self.used, "max_bytes": self.max_bytes,
+                    "entries": len(self.sizes), "evictions": self.evictions}
+
+
+class CacheManager:
+    def __init__(self, api, cache_file=None, memory_budget=None, max_log_entries=None, search_index=None):
+        self.api = api  # Reference to the SectorAlarmAPI instance
+        self.cache_file = cache_file or CACHE_FILE.format(panel_id=api.panel_id)
+        self.cache = {}
+        self.entries = {}  # Latest data per category, see store()
+        # Bounded-memory mode: a byte limit or a MemoryBudget shared with other cache managers
+        if isinstance(memory_budget, numbers.Real) and not isinstance(memory_budget, bool):
+            memory_budget = MemoryBudget(int(memory_budget))
+        elif memory_budget is not None and not isinstance(memory_budget, MemoryBudget):
+            raise TypeError(f"memory_budget must be a number of bytes or a MemoryBudget, "
+                            f"not {type(memory_budget).__name__}.")
+        self.memory_budget = memory_budget
+        self.max_log_entries = max_log_entries
+        self._statistics_engine = None
+        # Search index kept up to date by store(); may be shared with other cache managers
+        self._search_index = search_index
+
+    def load_cache(self):
+        """Load the cached structure from disk, building it if it does not exist."""
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                self.cache = json.load(f)
+            logger.info("Cache loaded from disk.")
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.rebuild_cache()
+
+    def rebuild_cache(self):
+        """Retrieve every category from the API and store its structure."""
+        cache = {}
+        for category in data_categories():
+            data = self.api.retrieve_category_data(category)
+            if data is not None:
+                cache[category] = extract_structure(data)
+        self.cache = cache
+        self.save_cache()
+
+    def save_cache(self):
+        """Persist the cached structure to disk."""
+        try:
+            with open(self.cache_file, 'w', encoding='utf-8') as f:
+                json.dump(self.cache, f, ensure_ascii=False)
+        except OSError as e:
+            logger.error(f"Failed to save cache to {self.cache_file}: {e}")
+
+    def store(self, category, data):
+        """
+        Store the latest data retrieved for a category.
+
+        Under a memory budget, the data is compacted (keys and labels interned,
+        logs trimmed to max_log_entries) and its size charged to the budget.
+
+        :return: The data as stored, which callers should use in place of the original.
+        """
+        if category == "Logs" and self.max_log_entries is not None:
+            if isinstance(data, list):
+                data = data[:self.max_log_entries]
+            elif isinstance(data, dict) and isinstance(data.get("Logs"), list):
+                data = dict(data, Logs=data["Logs"][:self.max_log_entries])
+        if self.memory_budget is None:
+            self.entries[category] = CacheEntry(data)
+        else:
+            data = compact(data)
+            size = estimate_size(data)
+            self.entries[category] = CacheEntry(data, size=size)
+            self.memory_budget.charge(self, category, size)
+        if self._search_index is not None:
+            self._search_index.update(self.api.panel_id, category, data)
+        return data
+
+    def evict(self, category):
+        """Drop the stored data for a category, as decided by the memory budget."""
+        self.entries.pop(category, None)
+        if self._search_index is not None:
+            self._search_index.remove(self.api.panel_id, category)
+
+    def get_entry(self, category, max_age=None):
+        """
+        Return the latest stored entry for a category, with its age and stale flag.
+
+        Every read of stored data goes through here, reporting a cache hit or miss to the hooks.
+
+        :param category: The category name.
+        :param max_age: Maximum age in seconds, or None to accept any age.
+        :return: The CacheEntry, or None if missing or older than max_age.
+        """
+        entry = self.entries.get(category)
+        if entry is None or (max_age is not None and entry.age > max_age):
+            self.api.hooks.on_cache_miss(self.api.panel_id, category)
+            return None
+        self.api.hooks.on_cache_hit(self.api.panel_id, category)
+        if self.memory_budget is not None:
+            self.memory_budget.touch(self, category)
+        return entry
+
+    def get_data(self, category, max_age=None):
+        """
+        Return the latest stored data for a category.
+
+        :param category: The category name.
+        :param max_age: Maximum age in seconds, or None to accept any age.
+        :return: The stored data, or None if missing or older than max_age.
+        """
+        entry = self.get_entry(category, max_age)
+        return entry.data if entry is not None else None
+
+    def get_fresh_data(self, category, max_age=None):
+        """
+        Return the stored data for a category if it is still fresh, else None.
+
+        :param max_age: Maximum age in seconds, defaults to the endpoint's TTL.
+        :return: The stored data, or None if missing, too old, or the endpoint is not cacheable.
+        """
+        endpoint = get_endpoint(category)
+        if endpoint is None or not endpoint.cacheable or endpoint.ttl is None:
+            self.api.hooks.on_cache_miss(self.api.panel_id, category)
+            return None
+        return self.get_data(category, max_age=endpoint.ttl if max_age is None else max_age)
+
+    def get_stale_data(self, category):
+        """
+        Return the stored data for a category, of any age, to serve while the API is unavailable.
+
+        The entry stays flagged as stale until fresh data is stored, see is_stale() and stale_categories().
+
+        :return: The stored data, or None if there is none.
+        """
+        entry = self.entries.get(category)
+        if entry is None:
+            self.api.hooks.on_cache_miss(self.api.panel_id, category)
+            return None
+        entry.stale = True
+        self.api.hooks.on_stale(self.api.panel_id, category, entry.age)
+        if self.memory_budget is not None:
+            self.memory_budget.touch(self, category)
+        return entry.data
+
+    def is_stale(self, category):
+        """Return True if the stored data for a category was last served in place of a failed retrieval."""
+        entry = self.entries.get(category)
+        return entry is not None and entry.stale
+
+    def stale_categories(self):
+        """Return the categories currently served from stale data, {category: age in seconds}."""
+        return {category: round(entry.age, 1) for category, entry in list(self.entries.items()) if entry.stale}
+
+    def memory_usage(self):
+        """
+        Report the estimated memory used by the stored data.
+
+        :return: Dictionary with the bytes used per category and in total, and,
+                 under a memory budget, the budget's usage and evictions.
+        """
+        categories = {}
+        for category, entry in list(self.entries.items()):
+            categories[category] = entry.size or estimate_size(entry.data)
+        usage = {"bytes": sum(categories.values()), "categories": categories}
+        if self.memory_budget is not None:
+            usage["budget"] = self.memory_budget.usage()
+        return usage
+
+    def clear(self):
+        """Drop all stored data and release it from the memory budget."""
+        self.entries = {}
+        if self.memory_budget is not None:
+            self.memory_budget.release(self)
+        if self._search_index is not None:
+            self._search_index.remove(self.api.panel_id)
+
+    def statistics(self):
+        """
+        Compute structure statistics for the cached categories.
+
+        Uses the latest retrieved data where available, and the cached structure otherwise.
+        Change counts accumulate across calls, for retrieved categories only.
+        """
+        entries = dict(self.entries)
+        categories = {category: structure for category, structure in self.cache.items()}
+        for category, entry in entries.items():
+            categories[category] = entry.data
+        skeletons = {category for category in categories if category not in entries}
+        return self.statistics_engine.update({self.api.panel_id: categories}, untracked=skeletons)
+
+    @property
+    def statistics_engine(self):
+        """Engine behind statistics(), created on first use as it remembers every value."""
+        if self._statistics_engine is None:
+            from .stats import StatisticsEngine
+            self._statistics_engine = StatisticsEngine()
+        return self._statistics_engine
+
+    @property
+    def search_index(self):
+        """Index behind search(), created on first use from the data stored so far."""
+        if self._search_index is None:
+            from .search import SearchIndex
+            index = SearchIndex()
+            for category, entry in list(self.entries.items()):
+                index.update(self.api.panel_id, category, entry.data)
+            self._search_index = index
+        return self._search_index
+
+    def search(self, query, category=None, limit=None):
+        """
+        Search the stored data of this panel for devices and log entries.
+
+        :param query: Free text, e.g. "kitchen smoke detector" or a serial number.
+        :param category: Only search this category.
+        :param limit: Maximum number of results, defaults to sectoralarm.search.DEFAULT_LIMIT.
+        :return: List of results, best match first, see SearchIndex.search().
+        """
+        from .search import DEFAULT_LIMIT
+        return self.search_index.search(query, panel_id=self.api.panel_id, category=category,
+                                        limit=limit or DEFAULT_LIMIT)
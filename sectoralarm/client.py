@@ -1,72 +1,219 @@
 # sectoralarm/client.py
 
-import requests
+import time
 import logging
-from .endpoints import get_data_endpoints, API_URL
-from .exceptions import AuthenticationError
+from .breaker import default_breakers, is_failure
+from .endpoints import KIND_DATA, get_endpoint, get_profile
+from .exceptions import AuthenticationError, CircuitOpenError
 from .cache import CacheManager
 from .actions import ActionsManager
+from .singleflight import default_group
+from .transport import get_default_pool
+from .hooks import HookDispatcher, RequestContext
 
 logger = logging.getLogger("SectorAlarmAPI")
 logger.setLevel(logging.INFO)  # Adjust logging level as needed
 
+REQUEST_TIMEOUT = 30
+REQUEST_RETRIES = 1  # Retries of idempotent requests after a connection error or gateway failure
+RETRY_DELAY = 0.5  # Seconds before the first retry, doubled for each further one
+RETRY_STATUS_CODES = (502, 503, 504)
+
 
 class SectorAlarmAPI:
-    def __init__(self, email, password, panel_id, panel_code):
+    def __init__(self, email, password, panel_id, panel_code, request_group=None, transport=None,
+                 hooks=None, memory_budget=None, max_log_entries=None, search_index=None, profile=None,
+                 breakers=None, timeout=REQUEST_TIMEOUT, serve_stale=True, retries=REQUEST_RETRIES):
         self.email = email
         self.password = password
         self.panel_id = panel_id
         self.panel_code = panel_code
-        self.session = requests.Session()
+        # Connections are pooled and kept alive across every client sharing the transport
+        self.transport = transport or get_default_pool()
+        self.session = self.transport.session
         self.auth_token = None
-        self.cache_manager = CacheManager(self)
+        # API base URL, version and prebuilt headers, see sectoralarm.endpoints
+        self.profile = get_profile(profile)
+        # Instrumentation hooks, see sectoralarm.hooks
+        self.hooks = HookDispatcher(hooks)
+        # Concurrent retrievals of the same category by this client share one request
+        self.request_group = request_group or default_group
+        # Requests to an endpoint that keeps failing fail fast, see sectoralarm.breaker
+        self.breakers = breakers or default_breakers
+        self.timeout = timeout
+        # Idempotent requests are retried this many times on transient failures, see call()
+        self.retries = retries
+        # Serve the last retrieved data, flagged as stale, when a category cannot be retrieved
+        self.serve_stale = serve_stale
+        # memory_budget: byte limit, or a MemoryBudget shared between clients, on cached data
+        # search_index: a SearchIndex shared between clients, updated as categories are retrieved
+        self.cache_manager = CacheManager(self, memory_budget=memory_budget, max_log_entries=max_log_entries,
+                                          search_index=search_index)
         self.actions_manager = ActionsManager(self)
 
     def login(self):
         """Authenticate and retrieve the authorization token."""
-        headers = {
-            "Content-Type": "application/json",
-            "API-Version": "5"
-        }
         data = {
             "UserId": self.email,
             "Password": self.password
         }
 
-        response = self.session.post(
-            f"{API_URL}/api/Login/Login", headers=headers, json=data, timeout=30)
+        response, result = self.call("Login", data, decode=True)
         if response.status_code == 200:
-            self.auth_token = response.json().get("AuthorizationToken")
+            self.auth_token = result.get("AuthorizationToken")
             logger.info("Login successful.")
         else:
             logger.error(f"Login failed with status code {response.status_code}.")
             logger.error(response.text)
             raise AuthenticationError("Login failed. Please check your credentials.")
 
+    def request(self, endpoint, method, url, headers, payload=None, decode=False):
+        """
+        Send a request through the shared session, reporting it to the hooks.
+
+        :param endpoint: Name of the category or action, used to label metrics.
+        :param method: "GET" or "POST"; the payload is only sent with POST.
+        :param url: The request URL.
+        :param headers: The request headers.
+        :param payload: JSON payload for POST requests.
+        :param decode: Decode the body of a successful response as JSON.
+        :return: Tuple of (response, data), where data is None unless decoded.
+        """
+        context = RequestContext(endpoint, method, url, self.panel_id)
+        self.hooks.on_request_start(context)
+        try:
+            if method == "POST":
+                response = self.session.post(url, headers=headers, json=payload, timeout=self.timeout)
+            else:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            context.status_code = response.status_code
+            context.size = len(response.content)
+
+            data = None
+            if decode and response.status_code == 200:
+                start = time.perf_counter()
+                data = response.json()
+                self.hooks.on_parse(context, time.perf_counter() - start)
+            return response, data
+        except Exception as e:
+            context.error = e
+            raise
+        finally:
+            context.duration = time.perf_counter() - context.start
+            self.hooks.on_request_end(context)
+
+    def call(self, name, payload=None, decode=False):
+        """
+        Send a request to a registered endpoint, see sectoralarm.endpoints.
+
+        The outcome is recorded by the endpoint's circuit breaker; while it is open,
+        the request is not sent. Requests to idempotent endpoints are retried up to
+        self.retries times after a connection error or a 502, 503 or 504 response;
+        other requests are sent once.
+
+        :param name: The endpoint name, e.g. "Lock" or "Panel Status".
+        :param payload: JSON payload for POST endpoints.
+        :param decode: Decode the body of a successful response as JSON.
+        :return: Tuple of (response, data), as returned by request().
+        :raises CircuitOpenError: If the endpoint's circuit breaker is open.
+        """
+        endpoint = get_endpoint(name)
+        if endpoint is None:
+            raise ValueError(f"Unknown endpoint '{name}'.")
+        breaker = self.breakers.get(self.panel_id, name)
+        attempts = 1 + (self.retries if endpoint.idempotent else 0)
+        for attempt in range(1, attempts + 1):
+            breaker.check()
+            try:
+                response, data = self.request(name, endpoint.method, endpoint.url(self.panel_id, self.profile),
+                                              self.profile.headers(self.auth_token), payload, decode=decode)
+            except Exception as e:
+                breaker.record_failure()
+                if attempt == attempts or not isinstance(e, OSError):
+                    raise
+                reason = repr(e)
+            else:
+                if not is_failure(response.status_code):
+                    breaker.record_success()
+                    return response, data
+                breaker.record_failure()
+                if attempt == attempts or response.status_code not in RETRY_STATUS_CODES:
+                    return response, data
+                reason = f"status code {response.status_code}"
+            delay = RETRY_DELAY * 2 ** (attempt - 1)
+            logger.info(f"Retrying {name} in {delay:.1f}s after {reason}.")
+            self.hooks.on_retry(self.panel_id, name, attempt, delay)
+            time.sleep(delay)
+
+    def memory_usage(self):
+        """Report the estimated memory used by this client's cached data."""
+        return self.cache_manager.memory_usage()
+
+    def search(self, query, category=None, limit=None):
+        """Search the retrieved data of this panel, see CacheManager.search()."""
+        return self.cache_manager.search(query, category, limit)
+
+    def get_category_data(self, category, max_age=None):
+        """
+        Return a category's data from the cache while it is fresh, and retrieve it otherwise.
+
+        :param category: The category name.
+        :param max_age: Maximum age in seconds of cached data, defaults to the endpoint's TTL.
+                        Categories that are not cacheable are always retrieved.
+        :return: The category data, or None if it could not be retrieved.
+        """
+        data = self.cache_manager.get_fresh_data(category, max_age)
+        if data is None:
+            data = self.retrieve_category_data(category)
+        return data
+
+    def _request_key(self, category):
+        # Keyed by client, not only by panel: every client has its own account,
+        # authorization and cache, so it must never be handed another client's response
+        return (id(self), self.panel_id, category)
+
     def retrieve_category_data(self, category):
-        """Retrieve data for a specific category from the API."""
-        endpoints = get_data_endpoints(self.panel_id)
+        """Retrieve data for a specific category from the API.
+
+        Concurrent calls for the same category on this client are coalesced into one request.
+        """
+        return self.request_group.do(self._request_key(category), self._retrieve_category_data, category)
 
-        method_url = endpoints.get(category)
-        if method_url is None:
+    async def retrieve_category_data_async(self, category):
+        """Retrieve data for a specific category without blocking the event loop."""
+        return await self.request_group.do_async(
+            self._request_key(category), self._retrieve_category_data, category)
+
+    def _retrieve_category_data(self, category):
+        endpoint = get_endpoint(category)
+        if endpoint is None or endpoint.kind != KIND_DATA:
             logger.error(f"Unknown category {category}")
             return None
-        method, url = method_url
-
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": self.auth_token,
-            "API-Version": "5"
-        }
         payload = {"panelId": self.panel_id}
 
-        if method == "POST":
-            response = self.session.post(url, headers=headers, json=payload, timeout=30)
-        else:
-            response = self.session.get(url, headers=headers, timeout=30)
-
+        try:
+            response, data = self.call(category, payload, decode=True)
+        except CircuitOpenError as e:
+            return self._serve_stale(category, e)
+        except Exception as e:
+            stale = self._serve_stale(category, e)
+            if stale is None:
+                raise
+            return stale
         if response.status_code == 200:
-            return response.json()
+            # Return the stored copy, so that the decoded payload is not kept alive twice
+            return self.cache_manager.store(category, data)
+        reason = f"Status code: {response.status_code}"
+        if is_failure(response.status_code):
+            return self._serve_stale(category, reason)
+        logger.error(f"Failed to retrieve data from {category}. {reason}")
+        return None
+
+    def _serve_stale(self, category, reason):
+        """Return the last retrieved data of a category in place of a failed retrieval, or None."""
+        data = self.cache_manager.get_stale_data(category) if self.serve_stale else None
+        if data is None:
+            logger.error(f"Failed to retrieve data from {category}. {reason}")
         else:
-            logger.error(f"Failed to retrieve data from {category}. Status code: {response.status_code}")
-            return None
+            logger.warning(f"Failed to retrieve data from {category}, serving stale data. {reason}")
+        return data
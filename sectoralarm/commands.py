@@ -0,0 +1,628 @@
+# sectoralarm/commands.py
+
+"""
+Non-interactive subcommands for the sectoralarm entry point.
+
+Every subcommand runs a list of operations, either built from the command
+line or read from a batch file, concurrently across panels and prints one
+JSON result per operation.
+"""
+
+import getopt
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sectoralarm.exceptions import APIRequestError, AuthenticationError
+
+DEFAULT_WORKERS = 16
+DEFAULT_WATCH_INTERVAL = 60
+DEFAULT_SNAPSHOT_EVERY = 10
+
+# Actions whose new state the panel does not report, so --wait cannot confirm them
+NO_WAIT_COMMANDS = ('annex-arm', 'annex-disarm')
+
+
+class ClientPool:
+    """Create one SectorAlarmAPI per (account, panel) and log in once per account."""
+
+    def __init__(self, config):
+        self.config = config
+        self.clients = {}
+        self.tokens = {}
+        self.lock = threading.Lock()  # Guards account_locks only
+        self.account_locks = {}
+
+    def _account_lock(self, email):
+        with self.lock:
+            lock = self.account_locks.get(email)
+            if lock is None:
+                lock = self.account_locks[email] = threading.Lock()
+            return lock
+
+    def get(self, operation):
+        """Return a logged in client for the panel targeted by the operation."""
+        validate_operation(operation)
+        email = operation.get('email', self.config.get('email'))
+        password = operation.get('password', self.config.get('password'))
+        panel_id = operation.get('panel_id') or self.config.get('panel_id')
+        panel_code = operation.get('panel_code', self.config.get('panel_code'))
+        if not email or not password or not panel_id:
+            raise ValueError("Missing required parameters (email, password, panel_id).")
+
+        panel_id = str(panel_id)
+        key = (email, panel_id)
+        api = self.clients.get(key)
+        if api is not None:
+            return api
+        # Logging in to one account does not hold up operations on the others
+        with self._account_lock(email):
+            api = self.clients.get(key)
+            if api is None:
+                from sectoralarm.client import SectorAlarmAPI
+                api = SectorAlarmAPI(email, password, panel_id, panel_code)
+                api.mask_sensitive = self.config.get('mask_sensitive', False)
+                # The authorization token is per account, so panels sharing an account share it
+                token = self.tokens.get(email)
+                if token is None:
+                    api.login()
+                    token = self.tokens[email] = api.auth_token
+                api.auth_token = token
+                self.clients[key] = api
+        return api
+
+
+def _is_id(value):
+    return isinstance(value, (str, int)) and not isinstance(value, bool)
+
+
+def validate_operation(operation):
+    """
+    Check the types of an operation's fields.
+
+    :raises ValueError: If the operation is not a dictionary or a field has the wrong type.
+    """
+    if not isinstance(operation, dict):
+        raise ValueError(f"Operation must be a JSON object, not {type(operation).__name__}.")
+    for field in ('command', 'email', 'password', 'panel_code'):
+        if operation.get(field) is not None and not isinstance(operation[field], str):
+            raise ValueError(f"Operation field '{field}' must be a string.")
+    if operation.get('panel_id') is not None and not _is_id(operation['panel_id']):
+        raise ValueError("Operation field 'panel_id' must be a string or a number.")
+    for field in ('lock_serial', 'plug_id'):
+        value = operation.get(field)
+        if value is not None and not _is_id(value) and not (isinstance(value, list) and all(map(_is_id, value))):
+            raise ValueError(f"Operation field '{field}' must be an ID or a list of IDs.")
+    for field in ('categories', 'oids'):
+        value = operation.get(field)
+        if value is not None and not (isinstance(value, list) and all(isinstance(item, str) for item in value)):
+            raise ValueError(f"Operation field '{field}' must be a list of strings.")
+
+
+def load_batch(path):
+    """
+    Load operations from a batch file.
+
+    The file holds either a JSON array of operations or one JSON operation per line.
+    Use '-' to read from standard input.
+
+    :param path: Path to the batch file.
+    :return: List of operation dictionaries.
+    """
+    if path == '-':
+        content = sys.stdin.read()
+    else:
+        with open(path, 'r', encoding='utf-8') as batch_file:
+            content = batch_file.read()
+    content = content.strip()
+    if not content:
+        return []
+    if content.startswith('['):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def execute_operation(api, operation):
+    """
+    Execute a single operation against a client.
+
+    :param api: Instance of SectorAlarmAPI.
+    :param operation: The operation dictionary.
+    :return: Tuple of (success, result).
+    """
+    command = operation['command']
+    actions = api.actions_manager
+    wait = operation.get('wait', False)
+    if wait and command in NO_WAIT_COMMANDS:
+        raise ValueError(f"The {command} command cannot wait: the panel does not report the annex state.")
+
+    if command == 'arm':
+        return actions.arm_system(wait=wait), None
+    elif command == 'disarm':
+        return actions.disarm_system(wait=wait), None
+    elif command == 'partial':
+        return actions.arm_partial(wait=wait), None
+    elif command == 'annex-arm':
+        return actions.arm_annex(), None
+    elif command == 'annex-disarm':
+        return actions.disarm_annex(), None
+    elif command in ('lock', 'unlock'):
+        serials = operation.get('lock_serial')
+        if serials is None:
+            # Without a serial, apply the action to every lock on the panel
+            bulk = actions.lock_all if command == 'lock' else actions.unlock_all
+            results = bulk(wait=wait)
+            if results is None:
+                return False, "Failed to retrieve lock status."
+        else:
+            from sectoralarm.actions import run_bulk
+            action = actions.lock_door if command == 'lock' else actions.unlock_door
+            if not isinstance(serials, list):
+                serials = [serials]
+            results = run_bulk(lambda serial: action(serial, wait=wait), serials)
+        return all(results.values()), results
+    elif command in ('plug-on', 'plug-off'):
+        on = command == 'plug-on'
+        plug_ids = operation.get('plug_id')
+        if plug_ids is None:
+            # Without an ID, switch every smart plug on the panel
+            states = on
+        else:
+            if not isinstance(plug_ids, list):
+                plug_ids = [plug_ids]
+            states = {plug_id: on for plug_id in plug_ids}
+        results = actions.set_smartplugs(states, wait=wait)
+        if results is None:
+            return False, "Failed to retrieve smart plug status."
+        return all(results.values()), results
+    elif command == 'snapshot':
+        from sectoralarm.snapshot import capture_panel
+        data = capture_panel(api)
+        return bool(data), data
+    elif command == 'status':
+        status = actions.get_system_status()
+        return status is not None, status
+    elif command == 'get':
+        from sectoralarm.main import fetch_data_by_oid
+        if not operation.get('categories') and not operation.get('oids'):
+            raise ValueError("The get command requires 'oids' or 'categories'.")
+        result = {}
+        for category in operation.get('categories', []):
+            result[category] = api.retrieve_category_data(category)
+        if operation.get('oids'):
+            if not api.cache_manager.cache:
+                api.cache_manager.load_cache()
+            for oid in operation['oids']:
+                result[oid] = fetch_data_by_oid(api, oid)
+        return all(value is not None for value in result.values()), result
+    raise ValueError(f"Unknown command '{command}'.")
+
+
+def run_operation(pool, operation):
+    """Run one operation and return its JSON-serializable result record."""
+    start = time.perf_counter()
+    if not isinstance(operation, dict):
+        record = {'operation': operation, 'panel_id': None, 'success': False}
+        try:
+            validate_operation(operation)
+        except ValueError as e:
+            record['error'] = str(e)
+        record['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        return record
+    record = {key: value for key, value in operation.items() if key not in ('email', 'password', 'panel_code')}
+    try:
+        api = pool.get(operation)
+        success, result = execute_operation(api, operation)
+        record['success'] = bool(success)
+        if result is not None:
+            if api.mask_sensitive:
+                from sectoralarm.main import mask_sensitive_data
+                result = mask_sensitive_data(result)
+            record['result'] = result
+        stale = api.cache_manager.stale_categories()
+        if stale:
+            # Categories served from the cache because the API is unavailable, {category: age}
+            record['stale'] = stale
+    except (AuthenticationError, APIRequestError, ValueError, KeyError, TypeError, AttributeError, OSError) as e:
+        record['success'] = False
+        record['error'] = str(e)
+    record['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    return record
+
+
+def run_batch(pool, operations, workers=DEFAULT_WORKERS):
+    """
+    Run operations concurrently with a bounded worker pool.
+
+    :param pool: ClientPool used to obtain clients.
+    :param operations: List of operation dictionaries.
+    :param workers: Maximum number of concurrent operations.
+    :return: List of result records, in the same order as the operations.
+    """
+    if not operations:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(operations)))) as executor:
+        return list(executor.map(lambda operation: run_operation(pool, operation), operations))
+
+
+def watch(pool, operations, workers, interval, count):
+    """Repeatedly run the operations, printing one JSON line per result."""
+    iteration = 0
+    while count is None or iteration < count:
+        if iteration:
+            time.sleep(interval)
+        for record in run_batch(pool, operations, workers):
+            record['timestamp'] = time.strftime("%Y-%m-%dT%H:%M:%S")
+            print(json.dumps(record, ensure_ascii=False), flush=True)
+        iteration += 1
+
+
+def poll_panels(config, operations, settings, interval, count):
+    """Poll the panels from sharded worker processes, printing one JSON line per event."""
+    from sectoralarm.sharding import Aggregator, ShardedPoller
+
+    panels = []
+    for operation in operations:
+        validate_operation(operation)
+        panel = {key: operation.get(key, config.get(key)) for key in ('email', 'password', 'panel_code')}
+        panel['panel_id'] = operation.get('panel_id') or config.get('panel_id')
+        if not panel['email'] or not panel['password'] or not panel['panel_id']:
+            raise ValueError("Missing required parameters (email, password, panel_id).")
+        panels.append(panel)
+
+    history = None
+    if settings.get('history'):
+        from sectoralarm.history import HistoryStore
+        history = HistoryStore(settings['history'])
+    poller = ShardedPoller(panels, shards=settings.get('shards'), interval=interval,
+                           snapshot_every=settings.get('snapshot_every', DEFAULT_SNAPSHOT_EVERY), cycles=count)
+    aggregator = Aggregator(shards=sum(1 for partition in poller.partitions if partition))
+    try:
+        with poller:
+            for message in poller.messages():
+                # Record the fleet once per cycle, after every shard has reported it
+                if aggregator.add(message) and history is not None:
+                    history.append(aggregator.states)
+                if message['type'] == 'snapshot':
+                    continue
+                print(json.dumps(message, ensure_ascii=False), flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if history is not None:
+            history.close()
+    print(json.dumps(aggregator.summary(), ensure_ascii=False))
+    return 0 if not aggregator.errors else 1
+
+
+def serve_gateway(pool, operations, settings, interval, workers):
+    """Serve the panels' state to local subscribers until interrupted."""
+    from sectoralarm.gateway import DEFAULT_HOST, DEFAULT_PORT, Gateway, serve
+
+    apis = [pool.get(operation) for operation in operations]
+    gateway = Gateway(apis, interval=interval, workers=workers)
+    host = settings.get('host', DEFAULT_HOST)
+    port = settings.get('port', DEFAULT_PORT)
+    print(f"Serving {len(apis)} panel(s) on http://{host}:{port}/events and ws://{host}:{port}/ws", flush=True)
+    try:
+        serve(gateway, host, port)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def search_panels(pool, operations, settings, query, workers):
+    """Index every category of the panels, from the API or a snapshot file, and print the matches."""
+    from sectoralarm.search import DEFAULT_LIMIT, SearchIndex
+
+    index = SearchIndex()
+    if settings.get('snapshot'):
+        from sectoralarm.snapshot import Snapshot
+        with Snapshot(settings['snapshot']) as snapshot:
+            for operation in operations:
+                validate_operation(operation)
+            panel_ids = [str(operation['panel_id']) for operation in operations if operation.get('panel_id')]
+            for panel_id in panel_ids or snapshot.panels():
+                for category, data in snapshot.load_panel(panel_id).items():
+                    index.update(panel_id, category, data)
+    else:
+        operations = [dict(operation, command='snapshot') if isinstance(operation, dict) else operation
+                      for operation in operations]
+        captures = run_batch(pool, operations, workers)
+        for record in captures:
+            if not record['success']:
+                print(f"Error: panel {record['panel_id']}: {record.get('error', 'no data retrieved')}")
+            for category, data in record.get('result', {}).items():
+                index.update(record['panel_id'], category, data)
+
+    results = index.search(query, category=settings.get('category'), limit=settings.get('limit', DEFAULT_LIMIT))
+    if settings['config'].get('mask_sensitive'):
+        from sectoralarm.main import mask_sensitive_data
+        results = [dict(result, serial=None, data=mask_sensitive_data(result['data'])) for result in results]
+    print(json.dumps(results, indent=4, ensure_ascii=False))
+    return 0 if results else 1
+
+
+def query_panels(pool, operations, settings, queries, workers):
+    """Evaluate path queries over the panels, from the API or a snapshot file, and print the results."""
+    from sectoralarm.query import run_queries
+
+    if settings.get('snapshot'):
+        from sectoralarm.snapshot import Snapshot, SnapshotAPI, SnapshotError
+        try:
+            with Snapshot(settings['snapshot']) as snapshot:
+                for operation in operations:
+                    validate_operation(operation)
+                panel_ids = [str(operation['panel_id']) for operation in operations if operation.get('panel_id')]
+                apis = [SnapshotAPI(snapshot, panel_id) for panel_id in panel_ids or snapshot.panels()]
+                results = run_queries(queries, apis, workers)
+        except SnapshotError as e:
+            raise ValueError(str(e))
+    else:
+        apis = [pool.get(operation) for operation in operations]
+        results = run_queries(queries, apis, workers)
+    if settings['config'].get('mask_sensitive'):
+        from sectoralarm.main import mask_sensitive_data
+        results = mask_sensitive_data(results)
+    print(json.dumps(results, indent=4, ensure_ascii=False))
+    return 0 if results else 1
+
+
+def write_snapshot_results(settings, results):
+    """Write the captured panels to a snapshot file and/or history and print a summary per panel."""
+    panels = {record['panel_id']: record.pop('result') for record in results if record.get('result')}
+    summary = {}
+    if settings.get('output'):
+        from sectoralarm.snapshot import write_snapshot
+        summary['output'] = settings['output']
+        summary['bytes'] = write_snapshot(settings['output'], panels)
+    if settings.get('history'):
+        from sectoralarm.history import HistoryStore
+        with HistoryStore(settings['history']) as history:
+            summary['history'] = settings['history']
+            summary['changed'] = history.append(panels)
+    for record in results:
+        record['categories'] = len(panels.get(record['panel_id'], {}))
+    summary['panels'] = results
+    print(json.dumps(summary, indent=4, ensure_ascii=False))
+    return 0 if all(record['success'] for record in results) else 1
+
+
+def build_operations(command, settings, positional):
+    """Build the operation list from the batch file and command-line arguments."""
+    if settings.get('batch'):
+        operations = load_batch(settings['batch'])
+    else:
+        operations = [{}]
+
+    default_command = 'status' if command in ('watch', 'poll', 'serve') else command
+    built = []
+    for operation in operations:
+        if not isinstance(operation, dict):
+            # Reported as a failed operation when it is run
+            built.append(operation)
+            continue
+        operation = dict(operation)
+        operation.setdefault('command', default_command)
+        operation.setdefault('panel_id', settings['config'].get('panel_id'))
+        if settings.get('wait') and operation['command'] not in NO_WAIT_COMMANDS:
+            operation.setdefault('wait', True)
+        if operation['command'] in ('lock', 'unlock') and 'lock_serial' not in operation and positional:
+            operation['lock_serial'] = positional
+        if operation['command'] in ('plug-on', 'plug-off') and 'plug_id' not in operation and positional:
+            operation['plug_id'] = positional
+        if operation['command'] == 'get' and not operation.get('categories') and not operation.get('oids'):
+            oids = settings.get('oids') or [oid for arg in positional for oid in arg.split(',')]
+            if oids:
+                operation['oids'] = oids
+            elif not settings.get('batch'):
+                raise ValueError("The get command requires OIDs, e.g. 'sectoralarm get 1.2'.")
+            # Otherwise the batch entry fails on its own when it is run
+        built.append(operation)
+    return built
+
+
+def command_usage(command):
+    """Display the usage instructions for the subcommands."""
+    print(f"""
+Usage:
+  sectoralarm {command} [options] [arguments]
+
+Commands:
+  get OIDs                  Fetch data for the given OIDs (comma-separated)
+  arm                       Arm the system
+  disarm                    Disarm the system
+  lock [SERIAL ...]         Lock the given doors, or every door on the panel
+  unlock [SERIAL ...]       Unlock the given doors, or every door on the panel
+  partial                   Partially arm the system
+  annex-arm                 Arm the annex
+  annex-disarm              Disarm the annex
+  plug-on [ID ...]          Turn the given smart plugs on, or every smart plug on the panel
+  plug-off [ID ...]         Turn the given smart plugs off, or every smart plug on the panel
+  status                    Get the system status
+  watch                     Repeat the batch (default: status) every interval
+  snapshot -o FILE          Capture every category of the panels into a snapshot file
+  snapshot --history=FILE   Append the captured panels to a delta-encoded history file
+  poll                      Poll every category of the panels from sharded worker processes,
+                            printing changes as they are detected
+  serve                     Poll the panels once and push their state to local subscribers
+                            over Server-Sent Events (/events) and WebSocket (/ws)
+  search WORDS              Find devices and log entries by label, room, serial or text
+  query QUERY ...           Select data with path queries, e.g.
+                            'Temperatures/*/*/Components[?Temperature>25]{{Label,Temperature}}'
+
+Options:
+  -h, --help                Show this help message and exit
+  -e EMAIL, --email=EMAIL   Email address used for authentication
+  -p PWD, --password=PWD    Password used for authentication
+  -i ID, --panel_id=ID      Panel ID of your Sector Alarm system
+  -c CODE, --panel_code=CODE Panel code (if required)
+  -m, --mask                Mask sensitive data in output (SerialNo, Id, etc.)
+  -b FILE, --batch=FILE     Run the operations in FILE ('-' for stdin)
+  -o FILE, --output=FILE    Snapshot file to write
+  -s FILE, --snapshot=FILE  Search or query a snapshot file instead of the API
+  --category=NAME           Only search this category
+  --limit=N                 Maximum number of search results (default: 20)
+  --history=FILE            History file to append snapshots to
+  -w N, --workers=N         Number of concurrent operations (default: {DEFAULT_WORKERS})
+  --wait                    Confirm that arming, locking and plug actions reached the new state
+  --record=FILE             Record all HTTP traffic to a cassette file
+  --replay=FILE             Serve all HTTP traffic from a cassette file
+  --replay-speed=FACTOR     Replay with the recorded timing scaled by 1/FACTOR (default: 0, fastest)
+  --interval=SECONDS        Seconds between watch, poll or serve iterations (default: {DEFAULT_WATCH_INTERVAL})
+  --count=N                 Stop watching or polling after N iterations
+  --shards=N                Number of poll worker processes (default: number of CPUs)
+  --host=ADDRESS            Address the serve command listens on (default: 127.0.0.1)
+  --port=PORT               Port the serve command listens on (default: 8765)
+  --snapshot-every=N        Aggregate a full poll snapshot every N iterations (default: {DEFAULT_SNAPSHOT_EVERY})
+
+Batch files contain a JSON array, or one JSON object per line, of operations:
+  {{"command": "lock", "panel_id": "123456", "lock_serial": "ABC123"}}
+  {{"command": "arm", "panel_id": "654321", "panel_code": "1234"}}
+  {{"command": "get", "panel_id": "123456", "categories": ["Temperatures"]}}
+Fields that are omitted default to the subcommand and configuration.
+
+Examples:
+  sectoralarm lock --batch=sites.jsonl
+  sectoralarm status -i 123456
+  sectoralarm watch --interval=30 --batch=sites.jsonl
+  sectoralarm snapshot --batch=sites.jsonl -o fleet.snap
+  sectoralarm poll --batch=sites.jsonl --shards=8 --history=fleet.hist
+  sectoralarm serve --batch=sites.jsonl --interval=30 --port=8765
+  sectoralarm search kitchen smoke detector -i 123456
+  sectoralarm search ABC123 --category=Logs -s fleet.snap
+  sectoralarm query 'Lock Status[?Status=unlock]{{Label}}' --batch=sites.jsonl
+""")
+
+
+def run_command(command, argv):
+    """
+    Parse the arguments of a subcommand and run it.
+
+    :param command: The subcommand name.
+    :param argv: Remaining command-line arguments.
+    :return: Process exit code.
+    """
+    from sectoralarm.main import configure_transport, load_config
+
+    try:
+        opts, positional = getopt.gnu_getopt(
+            argv, "he:p:i:c:mb:w:d:o:s:",
+            ["help", "email=", "password=", "panel_id=", "panel_code=", "mask", "batch=", "workers=",
+             "data=", "wait", "interval=", "count=", "output=", "history=",
+             "record=", "replay=", "replay-speed=", "shards=", "snapshot-every=", "host=", "port=", "snapshot=", "category=", "limit="]
+        )
+    except getopt.GetoptError as err:
+        print(f"Error: {err}")
+        command_usage(command)
+        return 2
+
+    config = load_config()
+    settings = {'config': config}
+    workers = DEFAULT_WORKERS
+    interval = DEFAULT_WATCH_INTERVAL
+    count = None
+    traffic = {}
+    try:
+        for o, a in opts:
+            if o in ("-h", "--help"):
+                command_usage(command)
+                return 0
+            elif o in ("-e", "--email"):
+                config['email'] = a
+            elif o in ("-p", "--password"):
+                config['password'] = a
+            elif o in ("-i", "--panel_id"):
+                config['panel_id'] = a
+            elif o in ("-c", "--panel_code"):
+                config['panel_code'] = a
+            elif o in ("-m", "--mask"):
+                config['mask_sensitive'] = True
+            elif o in ("-b", "--batch"):
+                settings['batch'] = a
+            elif o in ("-w", "--workers"):
+                workers = int(a)
+            elif o in ("-d", "--data"):
+                settings['oids'] = a.split(',')
+            elif o == "--wait":
+                settings['wait'] = True
+            elif o in ("-o", "--output"):
+                settings['output'] = a
+            elif o in ("--record", "--replay", "--replay-speed"):
+                traffic[o[2:]] = a
+            elif o == "--history":
+                settings['history'] = a
+            elif o == "--interval":
+                interval = float(a)
+            elif o == "--count":
+                count = int(a)
+            elif o == "--shards":
+                settings['shards'] = int(a)
+            elif o == "--snapshot-every":
+                settings['snapshot_every'] = int(a)
+            elif o in ("-s", "--snapshot"):
+                settings['snapshot'] = a
+            elif o == "--category":
+                settings['category'] = a
+            elif o == "--limit":
+                settings['limit'] = int(a)
+            elif o == "--host":
+                settings['host'] = a
+            elif o == "--port":
+                settings['port'] = int(a)
+        if command in NO_WAIT_COMMANDS and settings.get('wait'):
+            raise ValueError(f"The {command} command does not support --wait.")
+        operations = build_operations(command, settings, positional)
+        if command == 'snapshot' and not settings.get('output') and not settings.get('history'):
+            raise ValueError("The snapshot command requires an output or history file, e.g. '-o fleet.snap'.")
+        if command == 'search' and not positional:
+            raise ValueError("The search command requires search words, e.g. 'sectoralarm search kitchen'.")
+        if command == 'query':
+            from sectoralarm.query import compile_query
+            if not positional:
+                raise ValueError("The query command requires a query, e.g. 'sectoralarm query \"Lock Status\"'.")
+            queries = [compile_query(query) for query in positional]
+        if command == 'poll':
+            if traffic:
+                raise ValueError("Recording and replaying traffic is not supported by the poll command.")
+            return poll_panels(config, operations, settings, interval, count)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}")
+        return 2
+
+    configure_transport(traffic)
+    pool = ClientPool(config)
+    if command == 'watch':
+        try:
+            watch(pool, operations, workers, interval, count)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if command == 'query':
+        try:
+            return query_panels(pool, operations, settings, queries, workers)
+        except (AuthenticationError, ValueError, OSError) as e:
+            print(f"Error: {e}")
+            return 1
+    if command == 'search':
+        from sectoralarm.snapshot import SnapshotError
+        try:
+            return search_panels(pool, operations, settings, " ".join(positional), workers)
+        except (SnapshotError, ValueError, OSError) as e:
+            print(f"Error: {e}")
+            return 1
+    if command == 'serve':
+        try:
+            return serve_gateway(pool, operations, settings, interval, workers)
+        except (AuthenticationError, ValueError, OSError) as e:
+            print(f"Error: {e}")
+            return 1
+
+    results = run_batch(pool, operations, workers)
+    if command == 'snapshot':
+        return write_snapshot_results(settings, results)
+    print(json.dumps(results, indent=4, ensure_ascii=False))
+    return 0 if all(record['success'] for record in results) else 1
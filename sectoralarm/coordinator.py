@@ -0,0 +1,260 @@
+# sectoralarm/coordinator.py
+
+"""
+Shared refresh for integrations with one entity per device.
+
+A DataUpdateCoordinator refreshes every category of a panel in one batched
+cycle and indexes the devices by serial. Entities read their slice from the
+index instead of retrieving categories themselves, so the number of
+upstream requests does not depend on the number of entities, and listeners
+registered for a serial are only called when that device changed.
+
+    coordinator = DataUpdateCoordinator(api, interval=60)
+    coordinator.refresh()
+    sensor = CoordinatorEntity(coordinator, "ABC123", "Temperatures")
+    sensor.add_listener(lambda: print(sensor.data["Temperature"]))
+    coordinator.start()
+"""
+
+import asyncio
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from .endpoints import data_categories, refresh_age
+from .history import SERIAL_FIELDS
+from .stats import PLACES_KEY, SECTIONS_KEY
+
+logger = logging.getLogger("SectorAlarmAPI")
+
+DEFAULT_INTERVAL = 60
+DEFAULT_WORKERS = 4
+
+# Categories whose items are events rather than devices, and are not indexed by serial
+UNINDEXED_CATEGORIES = ("Logs",)
+
+
+def index_devices(category, data):
+    """
+    Index the devices of a category's data by serial.
+
+    Devices are the items of lists, e.g. the locks of "Lock Status" or the
+    Components of a place; the sections and places of the navigation
+    hierarchy are not devices, even when they carry an ID.
+
+    :return: Dictionary of {serial: item}; the first item wins if a serial repeats.
+    """
+    index = {}
+    stack = [(data, None, False)]  # (value, key of the value or of the list holding it, is a list item)
+    while stack:
+        value, key, is_item = stack.pop()
+        if isinstance(value, dict):
+            if is_item and key not in (SECTIONS_KEY, PLACES_KEY):
+                for field in SERIAL_FIELDS:
+                    serial = value.get(field)
+                    if serial not in (None, ""):
+                        index.setdefault(str(serial), value)
+                        break
+            stack.extend((item, item_key, False) for item_key, item in reversed(list(value.items()))
+                         if isinstance(item, (dict, list)))
+        elif isinstance(value, list):
+            stack.extend((item, key, True) for item in reversed(value))
+    return index
+
+
+class DataUpdateCoordinator:
+    """Refresh a panel's categories together and fan the results out to entities.
+
+    :param api: Logged in SectorAlarmAPI instance.
+    :param interval: Seconds between refreshes when started.
+    :param categories: Categories to refresh, defaults to all.
+    :param workers: Number of categories retrieved concurrently.
+    """
+
+    def __init__(self, api, interval=DEFAULT_INTERVAL, categories=None, workers=DEFAULT_WORKERS):
+        self.api = api
+        self.interval = interval
+        self.categories = categories or data_categories()
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.data = {}  # {category: data}
+        self.devices = {}  # {category: {serial: item}}
+        self.categories_by_serial = {}  # {serial: [category, ...]}
+        self.listeners = {}  # {serial or None: [callback, ...]}
+        self.last_update = None
+        self.last_update_success = False
+        self.refreshes = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def get(self, serial, category=None):
+        """
+        Return the latest data of a device.
+
+        :param serial: The device serial.
+        :param category: The category to read it from, or None for the first one holding it.
+        :return: The device's item, or None if it is unknown.
+        """
+        serial = str(serial)
+        if category is None:
+            categories = self.categories_by_serial.get(serial)
+            if not categories:
+                return None
+            category = categories[0]
+        return self.devices.get(category, {}).get(serial)
+
+    def add_listener(self, callback, serial=None):
+        """
+        Call callback() after every refresh that changed the device, or after every refresh.
+
+        :param callback: Callable without arguments.
+        :param serial: Only call it when this device changed; None for every refresh.
+        :return: Function removing the listener.
+        """
+        key = str(serial) if serial is not None else None
+        with self.lock:
+            self.listeners.setdefault(key, []).append(callback)
+
+        def remove():
+            with self.lock:
+                callbacks = self.listeners.get(key, [])
+                if callback in callbacks:
+                    callbacks.remove(callback)
+
+        return remove
+
+    def _apply(self, results):
+        """Index the retrieved data and return the serials whose data changed."""
+        changed = set()
+        success = True
+        for category, data in results.items():
+            if data is None:
+                # Keep serving the previous data for a category that failed to refresh
+                success = False
+                continue
+            self.data[category] = data
+            if category in UNINDEXED_CATEGORIES:
+                continue
+            previous = self.devices.get(category, {})
+            current = self.devices[category] = index_devices(category, data)
+            for serial, item in current.items():
+                if previous.get(serial) != item:
+                    changed.add(serial)
+                    categories = self.categories_by_serial.setdefault(serial, [])
+                    if category not in categories:
+                        categories.append(category)
+            for serial in previous:
+                if serial not in current:
+                    changed.add(serial)
+                    self.categories_by_serial[serial].remove(category)
+                    if not self.categories_by_serial[serial]:
+                        del self.categories_by_serial[serial]
+        self.last_update = time.time()
+        self.last_update_success = success
+        self.refreshes += 1
+        return changed
+
+    def _notify(self, changed):
+        with self.lock:
+            callbacks = list(self.listeners.get(None, ()))
+            for serial in changed:
+                callbacks.extend(self.listeners.get(serial, ()))
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Coordinator listener failed: {e}")
+
+    def refresh(self, force=True):
+        """
+        Retrieve every category once, update the index and notify the listeners.
+
+        :param force: Retrieve every category; otherwise categories whose cached data is
+                      still within its TTL at the next refresh are read from the cache.
+        :return: Set of serials whose data changed.
+        """
+        def retrieve(category):
+            return self.api.get_category_data(category, 0 if force else refresh_age(category, self.interval))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = dict(zip(self.categories, executor.map(retrieve, self.categories)))
+        with self.lock:
+            changed = self._apply(results)
+        self._notify(changed)
+        return changed
+
+    async def async_refresh(self):
+        """Asyncio counterpart of refresh()."""
+        results = await asyncio.gather(
+            *(self.api.retrieve_category_data_async(category) for category in self.categories))
+        with self.lock:
+            changed = self._apply(dict(zip(self.categories, results)))
+        self._notify(changed)
+        return changed
+
+    def run(self):
+        """Refresh until stop() is called, skipping categories still within their TTL."""
+        while not self._stop.is_set():
+            start = time.monotonic()
+            try:
+                self.refresh(force=False)
+            except Exception as e:
+                logger.error(f"Coordinator refresh failed: {e}")
+                self.last_update_success = False
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - start)))
+
+    def start(self):
+        """Refresh every interval in a background thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="sectoralarm-coordinator", daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=True):
+        """Stop refreshing; with wait=False, do not wait for a refresh in progress to finish."""
+        self._stop.set()
+        if self._thread is not None:
+            if wait:
+                self._thread.join()
+            self._thread = None
+
+
+class CoordinatorEntity:
+    """Base class for an entity reading one device from a coordinator.
+
+    :param coordinator: The DataUpdateCoordinator.
+    :param serial: The device serial, or None for a panel-wide entity.
+    :param category: The category holding the device; for a panel-wide
+                     entity, the category whose data it reads.
+    """
+
+    def __init__(self, coordinator, serial, category=None):
+        self.coordinator = coordinator
+        self.serial = str(serial) if serial is not None else None
+        self.category = category
+
+    @property
+    def data(self):
+        """The entity's current data, looked up in constant time."""
+        if self.serial is None:
+            return self.coordinator.data.get(self.category)
+        return self.coordinator.get(self.serial, self.category)
+
+    @property
+    def available(self):
+        return self.coordinator.last_update_success and self.data is not None
+
+    @property
+    def stale(self):
+        """True if the entity's data was served from the cache because the API is unavailable."""
+        category = self.category
+        if category is None:
+            categories = self.coordinator.categories_by_serial.get(self.serial)
+            if not categories:
+                return False
+            category = categories[0]
+        return self.coordinator.api.cache_manager.is_stale(category)
+
+    def add_listener(self, callback):
+        """Call callback() whenever this entity's data changes; returns a function removing it."""
+        return self.coordinator.add_listener(callback, self.serial)
@@ -1,34 +1,223 @@
 # sectoralarm/endpoints.py
 
+"""
+Registry of Sector Alarm API endpoints.
+
+Every endpoint is registered once with its method, URL template and
+metadata: whether it is safe to retry (idempotent), whether its response may
+be cached, the default time-to-live of cached data, and, through
+sectoralarm.navigation, how its data is navigated. URLs are built once per
+panel and API profile and reused afterwards.
+
+An ApiProfile holds the base URL and API version, and the headers sent with
+every request, prebuilt per authorization token. Clients use the default
+profile unless given another one.
+"""
+
+import threading
+
 API_URL = "https://mypagesapi.sectoralarm.net"
+API_VERSION = "5"
+
+KIND_AUTH = "auth"
+KIND_DATA = "data"
+KIND_ACTION = "action"
+
+# Prebuilt header dictionaries kept per profile; the oldest are dropped beyond this
+MAX_CACHED_HEADERS = 1024
+
+
+class ApiProfile:
+    """The base URL and version of the API, and the headers sent with every request."""
+
+    def __init__(self, name, base_url=API_URL, version=API_VERSION, extra_headers=None):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.version = version
+        self.base_headers = {"Content-Type": "application/json", "API-Version": version}
+        self.base_headers.update(extra_headers or {})
+        self._headers = {}
+        self._lock = threading.Lock()
+
+    def headers(self, auth_token=None):
+        """
+        Return the request headers for an authorization token.
+
+        The same dictionary is returned for the same token; callers must not modify it.
+        """
+        if auth_token is None:
+            return self.base_headers
+        headers = self._headers.get(auth_token)
+        if headers is None:
+            headers = dict(self.base_headers, Authorization=auth_token)
+            with self._lock:
+                if len(self._headers) >= MAX_CACHED_HEADERS:
+                    self._headers.pop(next(iter(self._headers)))
+                self._headers[auth_token] = headers
+        return headers
+
+    def __repr__(self):
+        return f"ApiProfile({self.name!r}, {self.base_url!r}, version={self.version!r})"
+
+
+class Endpoint:
+    """A registered endpoint with a precompiled URL template.
+
+    :param name: The category or action name, e.g. "Panel Status" or "Lock".
+    :param method: "GET" or "POST".
+    :param path: URL path, with a {panel_id} placeholder where the panel ID goes.
+    :param kind: KIND_AUTH, KIND_DATA or KIND_ACTION.
+    :param idempotent: Repeating the request has no further effect, so it is safe to retry.
+    :param cacheable: The response may be cached and served again.
+    :param ttl: Seconds cached data stays fresh, or None if it is not cached.
+    """
+
+    __slots__ = ('name', 'method', 'path', 'kind', 'idempotent', 'cacheable', 'ttl', '_per_panel', '_urls')
+
+    def __init__(self, name, method, path, kind, idempotent=True, cacheable=False, ttl=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.kind = kind
+        self.idempotent = idempotent
+        self.cacheable = cacheable
+        self.ttl = ttl
+        self._per_panel = "{panel_id}" in path
+        self._urls = {}  # {(base_url, panel_id): url}
+
+    def url(self, panel_id=None, profile=None):
+        """Return the endpoint's URL for a panel, built on first use."""
+        base_url = (profile or get_profile()).base_url
+        key = (base_url, panel_id if self._per_panel else None)
+        url = self._urls.get(key)
+        if url is None:
+            path = self.path.format(panel_id=panel_id) if self._per_panel else self.path
+            url = self._urls[key] = base_url + path
+        return url
+
+    def navigable_keys(self, level):
+        """Return the keys navigated into at the given depth level, see sectoralarm.navigation."""
+        from .navigation import get_navigable_keys
+        return get_navigable_keys(self.name, level)
+
+    def __repr__(self):
+        return f"Endpoint({self.name!r}, {self.method!r}, {self.path!r})"
+
+
+_registry = {}
+
+
+def register(endpoint):
+    """Register an endpoint, replacing any endpoint of the same name."""
+    _registry[endpoint.name] = endpoint
+    return endpoint
+
+
+def get_endpoint(name):
+    """Return a registered endpoint, or None if the name is unknown."""
+    return _registry.get(name)
+
+
+def refresh_age(name, interval):
+    """
+    Return the age from which a category polled every interval seconds is retrieved again.
+
+    Data younger than this is still within its TTL at the next poll, so the poll may skip it.
+
+    :return: Maximum age in seconds; 0 if the category is not cacheable, so that it is always retrieved.
+    """
+    endpoint = _registry.get(name)
+    if endpoint is None or not endpoint.cacheable or endpoint.ttl is None:
+        return 0
+    return endpoint.ttl - interval
+
+
+def data_categories():
+    """Return the names of the data endpoints, in registration order."""
+    return [name for name, endpoint in _registry.items() if endpoint.kind == KIND_DATA]
+
+
+def action_names():
+    """Return the names of the action endpoints, in registration order."""
+    return [name for name, endpoint in _registry.items() if endpoint.kind == KIND_ACTION]
+
+
+# Authentication
+register(Endpoint("Login", "POST", "/api/Login/Login", KIND_AUTH))
+
+# Housecheck endpoints; sensor readings change slowly
+register(Endpoint("Humidity", "GET", "/api/housecheck/panels/{panel_id}/humidity", KIND_DATA,
+                  cacheable=True, ttl=300))
+register(Endpoint("Doors and Windows", "POST", "/api/v2/housecheck/doorsandwindows", KIND_DATA,
+                  cacheable=True, ttl=60))
+register(Endpoint("Leakage Detectors", "POST", "/api/v2/housecheck/leakagedetectors", KIND_DATA,
+                  cacheable=True, ttl=300))
+register(Endpoint("Smoke Detectors", "POST", "/api/v2/housecheck/smokedetectors", KIND_DATA,
+                  cacheable=True, ttl=300))
+register(Endpoint("Cameras", "GET", "/api/v2/housecheck/cameras/{panel_id}", KIND_DATA,
+                  cacheable=True, ttl=3600))
+register(Endpoint("Persons", "GET", "/api/persons/panels/{panel_id}", KIND_DATA, cacheable=True, ttl=3600))
+register(Endpoint("Temperatures", "POST", "/api/v2/housecheck/temperatures", KIND_DATA,
+                  cacheable=True, ttl=300))
+
+# Panel endpoints; states change with every action
+register(Endpoint("Panel Status", "GET", "/api/panel/GetPanelStatus?panelId={panel_id}", KIND_DATA,
+                  cacheable=True, ttl=30))
+register(Endpoint("Smartplug Status", "GET", "/api/panel/GetSmartplugStatus?panelId={panel_id}", KIND_DATA,
+                  cacheable=True, ttl=30))
+register(Endpoint("Lock Status", "GET", "/api/panel/GetLockStatus?panelId={panel_id}", KIND_DATA,
+                  cacheable=True, ttl=30))
+register(Endpoint("Logs", "GET", "/api/panel/GetLogs?panelId={panel_id}", KIND_DATA, cacheable=True, ttl=60))
+
+# Lock/Unlock and Arm/Disarm endpoints. Never retried: the panel may have carried out a request
+# whose response was lost, and repeating it later could override a change made in between
+register(Endpoint("Unlock", "POST", "/api/Panel/Unlock", KIND_ACTION, idempotent=False))
+register(Endpoint("Lock", "POST", "/api/Panel/Lock", KIND_ACTION, idempotent=False))
+register(Endpoint("Arm", "POST", "/api/Panel/Arm", KIND_ACTION, idempotent=False))
+register(Endpoint("Disarm", "POST", "/api/Panel/Disarm", KIND_ACTION, idempotent=False))
+register(Endpoint("PartialArm", "POST", "/api/Panel/PartialArm", KIND_ACTION, idempotent=False))
+register(Endpoint("ArmAnnex", "POST", "/api/Panel/ArmAnnex", KIND_ACTION, idempotent=False))
+register(Endpoint("DisarmAnnex", "POST", "/api/Panel/DisarmAnnex", KIND_ACTION, idempotent=False))
+
+# Smart plug endpoints, never retried either
+register(Endpoint("TurnOnSmartplug", "POST", "/api/Panel/TurnOnSmartplug", KIND_ACTION, idempotent=False))
+register(Endpoint("TurnOffSmartplug", "POST", "/api/Panel/TurnOffSmartplug", KIND_ACTION, idempotent=False))
+
+
+_profiles = {"v5": ApiProfile("v5")}
+_default_profile = "v5"
+
+
+def register_profile(profile):
+    """Register an API profile, e.g. for a newer API version or a test server."""
+    _profiles[profile.name] = profile
+    return profile
+
+
+def get_profile(name=None):
+    """Return the named profile, or the default profile."""
+    if isinstance(name, ApiProfile):
+        return name
+    try:
+        return _profiles[name or _default_profile]
+    except KeyError:
+        raise ValueError(f"Unknown API profile '{name}'.")
+
+
+def set_default_profile(name):
+    """Select the profile used by clients created without one."""
+    global _default_profile
+    get_profile(name)
+    _default_profile = name
+
 
 def get_data_endpoints(panel_id):
-    """Return a dictionary of data retrieval endpoints."""
-    endpoints = {
-        # Housecheck endpoints
-        "Humidity": ("GET", f"{API_URL}/api/housecheck/panels/{panel_id}/humidity"),
-        "Doors and Windows": ("POST", f"{API_URL}/api/v2/housecheck/doorsandwindows"),
-        "Leakage Detectors": ("POST", f"{API_URL}/api/v2/housecheck/leakagedetectors"),
-        "Smoke Detectors": ("POST", f"{API_URL}/api/v2/housecheck/smokedetectors"),
-        "Cameras": ("GET", f"{API_URL}/api/v2/housecheck/cameras/{panel_id}"),
-        "Persons": ("GET", f"{API_URL}/api/persons/panels/{panel_id}"),
-        "Temperatures": ("POST", f"{API_URL}/api/v2/housecheck/temperatures"),
-        # Panel endpoints
-        "Panel Status": ("GET", f"{API_URL}/api/panel/GetPanelStatus?panelId={panel_id}"),
-        "Smartplug Status": ("GET", f"{API_URL}/api/panel/GetSmartplugStatus?panelId={panel_id}"),
-        "Lock Status": ("GET", f"{API_URL}/api/panel/GetLockStatus?panelId={panel_id}"),
-        "Logs": ("GET", f"{API_URL}/api/panel/GetLogs?panelId={panel_id}"),#&take=100"),
-    }
-    return endpoints
+    """Return a dictionary of data retrieval endpoints, {category: (method, url)}."""
+    return {name: (endpoint.method, endpoint.url(panel_id))
+            for name, endpoint in _registry.items() if endpoint.kind == KIND_DATA}
+
 
 def get_action_endpoints():
-    """Return a dictionary of action endpoints."""
-    endpoints = {
-        # Lock/Unlock endpoints
-        "Unlock": ("POST", f"{API_URL}/api/Panel/Unlock"),
-        "Lock": ("POST", f"{API_URL}/api/Panel/Lock"),
-        # Arm/Disarm endpoints
-        "Arm": ("POST", f"{API_URL}/api/Panel/Arm"),
-        "Disarm": ("POST", f"{API_URL}/api/Panel/Disarm"),
-    }
-    return endpoints
+    """Return a dictionary of action endpoints, {action: (method, url)}."""
+    return {name: (endpoint.method, endpoint.url())
+            for name, endpoint in _registry.items() if endpoint.kind == KIND_ACTION}
@@ -7,3 +7,7 @@ class AuthenticationError(Exception):
 class APIRequestError(Exception):
     """Exception raised for API request errors."""
     pass
+
+class CircuitOpenError(APIRequestError):
+    """Exception raised when a request is rejected because its circuit breaker is open."""
+    pass
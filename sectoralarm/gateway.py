@@ -0,0 +1,420 @@
+# sectoralarm/gateway.py
+
+"""
+Local push gateway for panel state.
+
+The gateway polls every panel once per interval through its client and
+cache, skipping categories still within their TTL, and fans the changes out to any number of local subscribers over
+Server-Sent Events or WebSocket. Each subscriber first receives a snapshot
+of the current state, then one delta per changed category:
+
+    {"type": "snapshot", "timestamp": ..., "panels": {panel_id: {category: data}}}
+    {"type": "delta", "timestamp": ..., "panel_id": "123", "category": "Panel Status",
+     "changes": [...]}     # See sectoralarm.history.diff and apply_delta
+
+Endpoints:
+
+    GET /events[?panel=ID]    Server-Sent Events feed
+    GET /ws[?panel=ID]        WebSocket feed (text frames, one message each)
+    GET /state[?panel=ID]     Current state as JSON
+    GET /health               Gateway statistics, including panels served from stale data
+"""
+
+import base64
+import hashlib
+import json
+import queue
+import struct
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from .endpoints import data_categories, refresh_age
+from .history import diff
+
+logger = logging.getLogger("SectorAlarmAPI")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_INTERVAL = 30
+DEFAULT_WORKERS = 8
+KEEPALIVE_INTERVAL = 15
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+WEBSOCKET_VERSION = "13"
+MAX_CLIENT_FRAME = 1 << 16  # Clients only send control frames; anything larger is refused
+
+# WebSocket opcodes and close status codes (RFC 6455)
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+CLOSE_PROTOCOL_ERROR = 1002
+CLOSE_TOO_BIG = 1009
+
+
+def _dumps(message):
+    return json.dumps(message, ensure_ascii=False, separators=(',', ':'))
+
+
+class Subscriber:
+    """A local consumer of the feed, optionally limited to one panel."""
+
+    def __init__(self, panel_id=None, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        self.panel_id = panel_id
+        self.queue = queue.Queue(maxsize)
+        self.dropped = False
+        self.closed = False
+
+    def wants(self, panel_id):
+        return self.panel_id is None or self.panel_id == panel_id
+
+    def put(self, message):
+        """Queue a message; a subscriber that falls too far behind is dropped."""
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.dropped = True
+
+    def close(self):
+        """End the subscription, e.g. when the client has gone; wakes up a consumer waiting in get()."""
+        self.closed = True
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def get(self, timeout=None):
+        """Return the next message, or None on timeout or once closed."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class Gateway:
+    """Poll panels once and publish their state to many subscribers.
+
+    :param apis: Logged in SectorAlarmAPI instances, one per panel.
+    :param interval: Seconds between polls of each panel.
+    :param categories: Categories to poll, defaults to all.
+    :param workers: Number of categories retrieved concurrently.
+    """
+
+    def __init__(self, apis, interval=DEFAULT_INTERVAL, categories=None, workers=DEFAULT_WORKERS):
+        self.apis = {api.panel_id: api for api in apis}
+        self.interval = interval
+        self.categories = categories or data_categories()
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.state = {panel_id: {} for panel_id in self.apis}
+        self.subscribers = []
+        self.polls = 0
+        self.deltas = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, panel_id=None):
+        """
+        Register a subscriber and queue the current state as its first message.
+
+        :param panel_id: Only receive this panel's state, or None for every panel.
+        :return: The Subscriber.
+        """
+        subscriber = Subscriber(panel_id)
+        with self.lock:
+            # Taking the snapshot under the publishing lock guarantees no delta is missed or repeated
+            subscriber.put({"type": "snapshot", "timestamp": time.time(), "panels": self.snapshot(panel_id)})
+            self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+
+    def snapshot(self, panel_id=None):
+        """Return the current state, {panel_id: {category: data}}."""
+        if panel_id is not None:
+            return {panel_id: self.state.get(panel_id, {})}
+        return dict(self.state)
+
+    def _publish(self, panel_id, category, data):
+        with self.lock:
+            previous = self.state[panel_id].get(category)
+            changes = diff(previous, data) if category in self.state[panel_id] else [
+                {"op": "set", "path": [], "value": data}]
+            if not changes:
+                return
+            self.state[panel_id] = dict(self.state[panel_id], **{category: data})
+            self.deltas += 1
+            message = {"type": "delta", "timestamp": time.time(), "panel_id": panel_id,
+                       "category": category, "changes": changes}
+            for subscriber in list(self.subscribers):
+                if subscriber.wants(panel_id):
+                    subscriber.put(message)
+                if subscriber.dropped:
+                    logger.warning("Dropping a gateway subscriber that fell behind.")
+                    self.subscribers.remove(subscriber)
+
+    def poll(self, executor=None, force=False):
+        """
+        Poll the categories of every panel once and publish the changes.
+
+        Categories whose cached data is still within its TTL at the next poll are not
+        retrieved again, unless force is set.
+        """
+        work = [(api, category) for api in self.apis.values() for category in self.categories]
+        max_ages = {category: 0 if force else refresh_age(category, self.interval) for category in self.categories}
+
+        def retrieve(item):
+            api, category = item
+            return api.get_category_data(category, max_ages[category])
+
+        if executor is None:
+            results = map(retrieve, work)
+        else:
+            results = executor.map(retrieve, work)
+        for (api, category), data in zip(work, results):
+            if data is not None:
+                self._publish(api.panel_id, category, data)
+        self.polls += 1
+
+    def run(self):
+        """Poll until stop() is called."""
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while not self._stop.is_set():
+                start = time.monotonic()
+                try:
+                    self.poll(executor)
+                except Exception as e:
+                    logger.error(f"Gateway poll failed: {e}")
+                self._stop.wait(max(0.0, self.interval - (time.monotonic() - start)))
+
+    def start(self):
+        """Start polling in a background thread."""
+        self._thread = threading.Thread(target=self.run, name="sectoralarm-gateway", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self):
+        """Return the gateway statistics, and the panels served from stale data with the age of each category."""
+        stale = {}
+        for panel_id, api in self.apis.items():
+            categories = api.cache_manager.stale_categories()
+            if categories:
+                stale[panel_id] = categories
+        return {"panels": len(self.apis), "subscribers": len(self.subscribers),
+                "polls": self.polls, "deltas": self.deltas, "stale": stale}
+
+
+def websocket_accept(key):
+    """Return the Sec-WebSocket-Accept value for a handshake key (RFC 6455)."""
+    return base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode('ascii')).digest()).decode('ascii')
+
+
+def websocket_frame(payload, opcode=0x1):
+    """Encode an unmasked, unfragmented server-to-client WebSocket frame."""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def websocket_close_frame(code):
+    return websocket_frame(struct.pack("!H", code), opcode=OPCODE_CLOSE)
+
+
+def read_websocket_frame(rfile, max_length=MAX_CLIENT_FRAME):
+    """
+    Read and unmask one client-to-server WebSocket frame.
+
+    :return: Tuple of (opcode, payload), or None at the end of the stream.
+    :raises ValueError: If the frame is not masked.
+    :raises OverflowError: If the frame is longer than max_length.
+    """
+    header = rfile.read(2)
+    if len(header) < 2:
+        return None
+    first, second = header
+    length = second & 0x7F
+    if length >= 126:
+        size = 2 if length == 126 else 8
+        extended = rfile.read(size)
+        if len(extended) < size:
+            return None
+        length = int.from_bytes(extended, "big")
+    if not second & 0x80:
+        raise ValueError("Client frames must be masked.")
+    if length > max_length:
+        raise OverflowError(f"Client frame of {length} bytes is too long.")
+    mask = rfile.read(4)
+    payload = rfile.read(length)
+    if len(mask) < 4 or len(payload) < length:
+        return None
+    key = int.from_bytes((mask * (length // 4 + 1))[:length], "big")
+    return first & 0x0F, (int.from_bytes(payload, "big") ^ key).to_bytes(length, "big")
+
+
+class GatewayRequestHandler(BaseHTTPRequestHandler):
+    """HTTP handler serving the gateway feeds; self.server.gateway is the Gateway."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug(f"Gateway: {self.address_string()} {format % args}")
+
+    def _send_json(self, status, body, headers=None):
+        payload = _dumps(body).encode('utf-8')
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        panel_id = parse_qs(url.query).get("panel", [None])[0]
+        gateway = self.server.gateway
+        if panel_id is not None and panel_id not in gateway.apis:
+            self._send_json(404, {"error": f"Unknown panel {panel_id}."})
+        elif url.path == "/events":
+            self._stream_events(gateway, panel_id)
+        elif url.path == "/ws":
+            self._stream_websocket(gateway, panel_id)
+        elif url.path == "/state":
+            # Panel states are replaced rather than modified, so the snapshot can be
+            # serialized and sent after the lock is released
+            with gateway.lock:
+                state = gateway.snapshot(panel_id)
+            self._send_json(200, state)
+        elif url.path == "/health":
+            self._send_json(200, gateway.stats())
+        else:
+            self._send_json(404, {"error": "Not found."})
+
+    def _stream(self, gateway, subscriber, write, keepalive):
+        try:
+            while not subscriber.dropped:
+                message = subscriber.get(timeout=KEEPALIVE_INTERVAL)
+                if subscriber.closed:
+                    break
+                if message is None:
+                    keepalive()
+                else:
+                    write(message)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            gateway.unsubscribe(subscriber)
+            self.close_connection = True
+
+    def _stream_events(self, gateway, panel_id):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        def write(message):
+            self.wfile.write(f"event: {message['type']}\ndata: {_dumps(message)}\n\n".encode('utf-8'))
+
+        def keepalive():
+            self.wfile.write(b": keepalive\n\n")
+
+        self._stream(gateway, gateway.subscribe(panel_id), write, keepalive)
+
+    def _stream_websocket(self, gateway, panel_id):
+        key = self.headers.get("Sec-WebSocket-Key")
+        if self.headers.get("Upgrade", "").lower() != "websocket" or not key:
+            self._send_json(400, {"error": "Expected a WebSocket upgrade request."})
+            return
+        if self.headers.get("Sec-WebSocket-Version") != WEBSOCKET_VERSION:
+            self._send_json(426, {"error": f"Only WebSocket version {WEBSOCKET_VERSION} is supported."},
+                            {"Sec-WebSocket-Version": WEBSOCKET_VERSION})
+            return
+        self.send_response(101, "Switching Protocols")
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", websocket_accept(key))
+        self.end_headers()
+
+        subscriber = gateway.subscribe(panel_id)
+        send_lock = threading.Lock()  # The reader thread answers control frames
+
+        def send(frame, close=False):
+            with send_lock:
+                # Nothing may follow a close frame
+                if not subscriber.closed:
+                    self.wfile.write(frame)
+                if close:
+                    subscriber.close()
+
+        def write(message):
+            send(websocket_frame(_dumps(message).encode('utf-8')))
+
+        def keepalive():
+            send(websocket_frame(b"", opcode=OPCODE_PING))
+
+        reader = threading.Thread(target=self._read_websocket, args=(subscriber, send),
+                                  name="sectoralarm-gateway-ws", daemon=True)
+        reader.start()
+        self._stream(gateway, subscriber, write, keepalive)
+
+    def _read_websocket(self, subscriber, send):
+        """Answer the client's pings and close frame; its pongs and data frames are discarded."""
+        try:
+            while not subscriber.closed:
+                frame = read_websocket_frame(self.rfile)
+                if frame is None:
+                    break
+                opcode, payload = frame
+                if opcode == OPCODE_CLOSE:
+                    # Echo the client's status code, then end the stream
+                    send(websocket_frame(payload[:2], opcode=OPCODE_CLOSE), close=True)
+                elif opcode == OPCODE_PING:
+                    send(websocket_frame(payload, opcode=OPCODE_PONG))
+        except (OverflowError, ValueError) as e:
+            logger.debug(f"Gateway: {e}")
+            code = CLOSE_TOO_BIG if isinstance(e, OverflowError) else CLOSE_PROTOCOL_ERROR
+            try:
+                send(websocket_close_frame(code), close=True)
+            except OSError:
+                pass
+        except OSError:
+            pass
+        finally:
+            subscriber.close()
+
+
+def serve(gateway, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    Poll with the gateway and serve its feeds until interrupted.
+
+    :param gateway: The Gateway to serve.
+    :param host: Address to listen on; the feeds are unauthenticated, so keep it local.
+    :param port: Port to listen on.
+    """
+    server = ThreadingHTTPServer((host, port), GatewayRequestHandler)
+    server.daemon_threads = True
+    server.gateway = gateway
+    gateway.start()
+    logger.info(f"Gateway listening on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        gateway.stop()
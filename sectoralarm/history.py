@@ -0,0 +1,322 @@
+# sectoralarm/history.py
+
+"""
+Delta-encoded history of panel snapshots.
+
+A history file is an append-only sequence of records. Keyframes hold the full
+state, {panel_id: {category: data}}, and are written every keyframe_interval
+records; the records in between hold only the structural delta from the
+previous state. The state at any timestamp is rebuilt from the nearest
+preceding keyframe.
+
+Deltas are lists of operations on paths into the state. Path segments are
+dictionary keys, list indexes, or [field, serial] pairs that select the list
+item whose identifying field (e.g. "SerialNo") has the given value, so that
+changes to a component are recorded against its serial rather than its position.
+
+    {"op": "set", "path": [...], "value": ...}
+    {"op": "remove", "path": [...]}
+    {"op": "splice", "path": [...], "start": i, "end": j, "items": [...]}
+
+File layout (integers little-endian):
+
+    magic      6 bytes   b"SAHIST"
+    version    1 byte    HISTORY_VERSION
+    codec      1 byte    as in sectoralarm.snapshot
+    records    ...       kind (1 byte, b"K" or b"D"), timestamp (double),
+                         length (4 bytes), payload
+"""
+
+import bisect
+import copy
+import os
+import struct
+import threading
+import time
+import logging
+
+from .snapshot import SnapshotError, check_codec, decode, encode, _best_compressor, _best_serializer
+
+logger = logging.getLogger("SectorAlarmAPI")
+
+MAGIC = b"SAHIST"
+HISTORY_VERSION = 1
+HEADER = struct.Struct("<6sBB")
+RECORD = struct.Struct("<cdI")
+
+KEYFRAME = b"K"
+DELTA = b"D"
+
+DEFAULT_KEYFRAME_INTERVAL = 50
+
+# Fields identifying a list item, in order of preference
+SERIAL_FIELDS = ("Serial", "SerialNo", "SerialString", "DeviceId", "Id")
+
+
+def _serial_field(items):
+    """Return the field that uniquely identifies every item of a list, or None."""
+    if not items or not all(isinstance(item, dict) for item in items):
+        return None
+    for field in SERIAL_FIELDS:
+        serials = [item.get(field) for item in items]
+        if None not in serials and len(set(map(repr, serials))) == len(serials):
+            return field
+    return None
+
+
+def _diff_list(old, new, path, ops):
+    field = _serial_field(old)
+    if field is not None and field == _serial_field(new):
+        old_serials = [item[field] for item in old]
+        if old_serials == [item[field] for item in new]:
+            # Same devices in the same order; record changes against their serials
+            for serial, old_item, new_item in zip(old_serials, old, new):
+                _diff(old_item, new_item, path + [[field, serial]], ops)
+            return
+
+    # Items added at either end and removed from the other, as with logs:
+    # find where the old list starts in the new one
+    if old:
+        first = old[0]
+        for shift in range(len(new)):
+            if new[shift] != first:
+                continue
+            kept = min(len(new) - shift, len(old))
+            if new[shift:shift + kept] == old[:kept]:
+                if kept < len(old) or shift + kept < len(new):
+                    ops.append({"op": "splice", "path": path, "start": kept, "end": len(old),
+                                "items": new[shift + kept:]})
+                if shift:
+                    ops.append({"op": "splice", "path": path, "start": 0, "end": 0, "items": new[:shift]})
+                return
+
+    if len(old) == len(new):
+        for index, (old_item, new_item) in enumerate(zip(old, new)):
+            _diff(old_item, new_item, path + [index], ops)
+        return
+    ops.append({"op": "set", "path": path, "value": new})
+
+
+def _diff(old, new, path, ops):
+    if type(old) is not type(new):
+        ops.append({"op": "set", "path": path, "value": new})
+    elif isinstance(new, dict):
+        for key, value in new.items():
+            if key not in old:
+                ops.append({"op": "set", "path": path + [key], "value": value})
+            else:
+                _diff(old[key], value, path + [key], ops)
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": path + [key]})
+    elif isinstance(new, list):
+        if old != new:
+            _diff_list(old, new, path, ops)
+    elif old != new:
+        ops.append({"op": "set", "path": path, "value": new})
+
+
+def diff(old, new):
+    """
+    Compute the structural delta between two states.
+
+    :return: List of operations transforming old into new; empty if they are equal.
+    """
+    ops = []
+    _diff(old, new, [], ops)
+    return ops
+
+
+def _select(container, segment):
+    if isinstance(segment, list):
+        field, serial = segment
+        for index, item in enumerate(container):
+            if isinstance(item, dict) and item.get(field) == serial:
+                return index
+        raise KeyError(f"No item with {field}={serial!r}")
+    return segment
+
+
+def apply_delta(state, ops):
+    """
+    Apply a delta produced by diff() to a state, in place where possible.
+
+    :return: The new state.
+    """
+    for op in ops:
+        path = op["path"]
+        if not path:
+            if op["op"] == "set":
+                state = op["value"]
+                continue
+            parent, key = None, None
+        else:
+            parent = state
+            for segment in path[:-1]:
+                parent = parent[_select(parent, segment)]
+            key = _select(parent, path[-1])
+
+        if op["op"] == "set":
+            parent[key] = op["value"]
+        elif op["op"] == "remove":
+            del parent[key]
+        elif op["op"] == "splice":
+            # Only a splice needs the existing value; a set may add a new key
+            target = parent[key] if parent is not None else state
+            target[op["start"]:op["end"]] = op["items"]
+    return state
+
+
+class HistoryStore:
+    """An append-only, delta-encoded history of panel states.
+
+    :param path: History file, created if it does not exist.
+    :param keyframe_interval: Number of records between full keyframes.
+    """
+
+    def __init__(self, path, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.lock = threading.Lock()
+        self.timestamps = []  # Record timestamps, ascending
+        self.offsets = []  # File offset of each record's payload
+        self.lengths = []
+        self.keyframes = []  # Indexes of keyframe records
+        self._last_state = None
+
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            self.serializer = _best_serializer()
+            self.compressor = _best_compressor()
+            with open(path, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, HISTORY_VERSION, self.serializer << 4 | self.compressor))
+        self._file = open(path, 'r+b')
+        try:
+            self._scan()
+        except Exception:
+            self._file.close()
+            raise
+
+    def _scan(self):
+        """
+        Read the header and index every record without decoding payloads.
+
+        A record torn by an interrupted write is cut off, so the next append
+        continues from the last complete record.
+        """
+        header = self._file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise SnapshotError(f"History '{self.path}' is truncated.")
+        magic, version, codec = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise SnapshotError(f"'{self.path}' is not a history file.")
+        if version > HISTORY_VERSION:
+            raise SnapshotError(f"History version {version} is not supported (maximum {HISTORY_VERSION}).")
+        self.serializer = codec >> 4
+        self.compressor = codec & 0x0F
+        check_codec(self.serializer, self.compressor)
+
+        offset = HEADER.size
+        size = os.fstat(self._file.fileno()).st_size
+        while offset + RECORD.size <= size:
+            self._file.seek(offset)
+            kind, timestamp, length = RECORD.unpack(self._file.read(RECORD.size))
+            if offset + RECORD.size + length > size:
+                break
+            if kind not in (KEYFRAME, DELTA) or (kind == DELTA and not self.keyframes):
+                raise SnapshotError(f"History '{self.path}' has a corrupt record at offset {offset}.")
+            if self.timestamps and timestamp < self.timestamps[-1]:
+                raise SnapshotError(f"History '{self.path}' has records out of timestamp order at offset {offset}.")
+            self._index_record(kind, timestamp, offset + RECORD.size, length)
+            offset += RECORD.size + length
+        if offset < size:
+            logger.warning(f"Discarding a truncated record at the end of {self.path}.")
+            self._file.truncate(offset)
+        self._end = offset
+
+    def _index_record(self, kind, timestamp, offset, length):
+        if kind == KEYFRAME:
+            self.keyframes.append(len(self.timestamps))
+        self.timestamps.append(timestamp)
+        self.offsets.append(offset)
+        self.lengths.append(length)
+
+    def _read(self, index):
+        self._file.seek(self.offsets[index])
+        return decode(self._file.read(self.lengths[index]), self.serializer, self.compressor)
+
+    def _rebuild(self, index):
+        position = bisect.bisect_right(self.keyframes, index) - 1
+        keyframe = self.keyframes[position]
+        state = self._read(keyframe)
+        for delta_index in range(keyframe + 1, index + 1):
+            try:
+                state = apply_delta(state, self._read(delta_index))
+            except SnapshotError:
+                raise
+            except Exception as e:
+                raise SnapshotError(f"History '{self.path}' has a corrupt delta at record {delta_index}: {e}")
+        return state
+
+    def append(self, state, timestamp=None):
+        """
+        Record a state, as a keyframe or as a delta from the previous state.
+
+        :param state: Dictionary of {panel_id: {category: data}}.
+        :param timestamp: Time of the state, defaults to now; must not precede the last record.
+        :return: True if a record was written, False if nothing changed.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.lock:
+            if self.timestamps and timestamp < self.timestamps[-1]:
+                raise ValueError("History records must be appended in timestamp order.")
+            if self.timestamps and self._last_state is None:
+                self._last_state = self._rebuild(len(self.timestamps) - 1)
+
+            since_keyframe = len(self.timestamps) - self.keyframes[-1] if self.keyframes else None
+            if since_keyframe is None or since_keyframe >= self.keyframe_interval:
+                kind, payload = KEYFRAME, state
+            else:
+                payload = diff(self._last_state, state)
+                if not payload:
+                    return False
+                kind = DELTA
+
+            blob = encode(payload, self.serializer, self.compressor)
+            self._file.seek(self._end)
+            self._file.write(RECORD.pack(kind, timestamp, len(blob)))
+            self._file.write(blob)
+            self._file.flush()
+            self._index_record(kind, timestamp, self._end + RECORD.size, len(blob))
+            self._end += RECORD.size + len(blob)
+            # Keep a private copy, as the caller may go on to mutate the state it passed in
+            self._last_state = copy.deepcopy(state)
+        return True
+
+    def state_at(self, timestamp=None):
+        """
+        Rebuild the state as it was at the given time.
+
+        :param timestamp: Point in time, defaults to the latest record.
+        :return: Dictionary of {panel_id: {category: data}}, or None if no record precedes the time.
+        """
+        with self.lock:
+            if timestamp is None:
+                index = len(self.timestamps) - 1
+            else:
+                index = bisect.bisect_right(self.timestamps, timestamp) - 1
+            if index < 0:
+                return None
+            return self._rebuild(index)
+
+    def diff(self, start, end):
+        """Return the delta between the states at two points in time."""
+        return diff(self.state_at(start) or {}, self.state_at(end) or {})
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,271 @@
+# sectoralarm/hooks.py
+
+import bisect
+import threading
+import time
+import logging
+
+logger = logging.getLogger("SectorAlarmAPI")
+
+# Latency histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class RequestContext:
+    """Describes one HTTP request as it passes through the hooks."""
+
+    __slots__ = ('endpoint', 'method', 'url', 'panel_id', 'start', 'duration',
+                 'status_code', 'size', 'error', 'span')
+
+    def __init__(self, endpoint, method, url, panel_id):
+        self.endpoint = endpoint  # Category or action name, e.g. "Panel Status" or "Lock"
+        self.method = method
+        self.url = url
+        self.panel_id = panel_id
+        self.start = time.perf_counter()
+        self.duration = None  # Seconds, set when the request ends
+        self.status_code = None
+        self.size = None  # Response body size in bytes
+        self.error = None
+        self.span = None  # Free for use by hooks, e.g. a tracing span
+
+
+class Hooks:
+    """Base class for instrumentation hooks; override the methods you need.
+
+    Hooks are called synchronously on the calling thread, so they should be cheap.
+    """
+
+    def on_request_start(self, context):
+        """Called before a request is sent."""
+
+    def on_request_end(self, context):
+        """Called after a request completes or fails; context.duration is set."""
+
+    def on_parse(self, context, seconds):
+        """Called after a response body has been decoded, with the decode time."""
+
+    def on_cache_hit(self, panel_id, category):
+        """Called when cached data is served for a category."""
+
+    def on_cache_miss(self, panel_id, category):
+        """Called when no usable cached data exists for a category."""
+
+    def on_retry(self, panel_id, name, attempt, delay):
+        """Called before an operation is retried after delay seconds."""
+
+    def on_stale(self, panel_id, category, age):
+        """Called when cached data age seconds old is served because the API is unavailable."""
+
+
+class HookDispatcher(Hooks):
+    """Fan hook calls out to several hooks, isolating the caller from their failures."""
+
+    def __init__(self, hooks=None):
+        if hooks is None:
+            hooks = []
+        elif isinstance(hooks, Hooks):
+            hooks = [hooks]
+        self.hooks = list(hooks)
+
+    def add(self, hook):
+        """Register an additional hook."""
+        self.hooks.append(hook)
+
+    def _dispatch(self, name, *args):
+        for hook in self.hooks:
+            try:
+                getattr(hook, name)(*args)
+            except Exception as e:
+                logger.error(f"Hook {type(hook).__name__}.{name} failed: {e}")
+
+    def on_request_start(self, context):
+        self._dispatch('on_request_start', context)
+
+    def on_request_end(self, context):
+        self._dispatch('on_request_end', context)
+
+    def on_parse(self, context, seconds):
+        self._dispatch('on_parse', context, seconds)
+
+    def on_cache_hit(self, panel_id, category):
+        self._dispatch('on_cache_hit', panel_id, category)
+
+    def on_cache_miss(self, panel_id, category):
+        self._dispatch('on_cache_miss', panel_id, category)
+
+    def on_retry(self, panel_id, name, attempt, delay):
+        self._dispatch('on_retry', panel_id, name, attempt, delay)
+
+    def on_stale(self, panel_id, category, age):
+        self._dispatch('on_stale', panel_id, category, age)
+
+
+class Histogram:
+    """A fixed-bucket histogram."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last bucket holds values above the largest bound
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction):
+        """Return the bucket upper bound below which the given fraction of values fall."""
+        if not self.count:
+            return 0.0
+        threshold = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= threshold:
+                return round(min(bound, self.max), 3)
+        return round(self.max, 3)
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 3) if self.count else 0.0,
+            'p50': self.percentile(0.5),
+            'p90': self.percentile(0.9),
+            'p99': self.percentile(0.99),
+            'max': round(self.max, 3),
+            'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], self.counts)),
+        }
+
+
+class MetricsHooks(Hooks):
+    """Built-in metrics: per-endpoint latency histograms, payload sizes, decode times, cache and stale counters.
+
+    Metrics are keyed by endpoint and, with per_panel=True, by (panel_id, endpoint).
+    """
+
+    def __init__(self, per_panel=False):
+        self.per_panel = per_panel
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clear all collected metrics."""
+        with self.lock:
+            self.latency = {}
+            self.requests = {}
+            self.errors = {}
+            self.payload_bytes = {}
+            self.decode_seconds = {}
+            self.cache_hits = {}
+            self.cache_misses = {}
+            self.retries = {}
+            self.stale = {}
+
+    def _key(self, panel_id, name):
+        return (panel_id, name) if self.per_panel else name
+
+    @staticmethod
+    def _increment(counter, key, amount=1):
+        counter[key] = counter.get(key, 0) + amount
+
+    def on_request_end(self, context):
+        key = self._key(context.panel_id, context.endpoint)
+        with self.lock:
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = Histogram()
+            histogram.observe(context.duration * 1000)
+            self._increment(self.requests, key)
+            if context.error is not None or (context.status_code or 0) >= 400:
+                self._increment(self.errors, key)
+            if context.size:
+                self._increment(self.payload_bytes, key, context.size)
+
+    def on_parse(self, context, seconds):
+        with self.lock:
+            self._increment(self.decode_seconds, self._key(context.panel_id, context.endpoint), seconds)
+
+    def on_cache_hit(self, panel_id, category):
+        with self.lock:
+            self._increment(self.cache_hits, self._key(panel_id, category))
+
+    def on_cache_miss(self, panel_id, category):
+        with self.lock:
+            self._increment(self.cache_misses, self._key(panel_id, category))
+
+    def on_retry(self, panel_id, name, attempt, delay):
+        with self.lock:
+            self._increment(self.retries, self._key(panel_id, name))
+
+    def on_stale(self, panel_id, category, age):
+        with self.lock:
+            self._increment(self.stale, self._key(panel_id, category))
+
+    def snapshot(self):
+        """Return the collected metrics as a JSON-serializable dictionary, slowest endpoints first."""
+        with self.lock:
+            keys = sorted(self.latency, key=lambda k: self.latency[k].total, reverse=True)
+            endpoints = {}
+            for key in keys:
+                label = ' / '.join(str(part) for part in key) if isinstance(key, tuple) else key
+                endpoints[label] = {
+                    'requests': self.requests.get(key, 0),
+                    'errors': self.errors.get(key, 0),
+                    'latency_ms': self.latency[key].as_dict(),
+                    'payload_bytes': self.payload_bytes.get(key, 0),
+                    'decode_ms': round(self.decode_seconds.get(key, 0.0) * 1000, 3),
+                }
+            return {
+                'endpoints': endpoints,
+                'cache_hits': self._labelled(self.cache_hits),
+                'cache_misses': self._labelled(self.cache_misses),
+                'retries': self._labelled(self.retries),
+                'stale': self._labelled(self.stale),
+            }
+
+    @staticmethod
+    def _labelled(counter):
+        return {' / '.join(str(part) for part in key) if isinstance(key, tuple) else key: value
+                for key, value in counter.items()}
+
+
+class OpenTelemetryHooks(Hooks):
+    """Export requests as OpenTelemetry spans (requires the opentelemetry-api package)."""
+
+    def __init__(self, tracer=None):
+        if tracer is None:
+            from opentelemetry import trace
+            tracer = trace.get_tracer("sectoralarm")
+        self.tracer = tracer
+
+    def on_request_start(self, context):
+        context.span = self.tracer.start_span(
+            f"sectoralarm {context.endpoint}",
+            attributes={
+                'http.method': context.method,
+                'http.url': context.url,
+                'sectoralarm.endpoint': context.endpoint,
+                'sectoralarm.panel_id': str(context.panel_id),
+            },
+        )
+
+    def on_parse(self, context, seconds):
+        if context.span is not None:
+            context.span.set_attribute('sectoralarm.decode_ms', seconds * 1000)
+
+    def on_request_end(self, context):
+        span = context.span
+        if span is None:
+            return
+        if context.status_code is not None:
+            span.set_attribute('http.status_code', context.status_code)
+        if context.size is not None:
+            span.set_attribute('http.response_content_length', context.size)
+        if context.error is not None:
+            span.record_exception(context.error)
+        span.end()
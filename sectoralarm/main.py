@@ -3,21 +3,14 @@
 import sys
 import getopt
 import json
-import os
-from sectoralarm.client import SectorAlarmAPI, AuthenticationError
+from sectoralarm.exceptions import AuthenticationError
+from sectoralarm.navigation import get_navigable_keys
 
-# Load CATEGORY_NAVIGATION from category_navigation.json
-CONFIG_FILE = 'config/category_navigation.json'  # Adjust the path if necessary
+CONFIG_FILE = 'config/config.json'
 
-try:
-    with open(CONFIG_FILE, 'r', encoding='utf-8') as config_file:
-        CATEGORY_NAVIGATION = json.load(config_file)
-except FileNotFoundError:
-    print(f"Error: Configuration file '{CONFIG_FILE}' not found.")
-    sys.exit(1)
-except json.JSONDecodeError as e:
-    print(f"Error parsing '{CONFIG_FILE}': {e}")
-    sys.exit(1)
+# Non-interactive subcommands, implemented in sectoralarm.commands
+SUBCOMMANDS = ('get', 'arm', 'disarm', 'partial', 'annex-arm', 'annex-disarm', 'lock', 'unlock', 'plug-on', 'plug-off',
+               'status', 'watch', 'snapshot', 'poll', 'serve', 'search', 'query')
 
 
 def main():
@@ -25,11 +18,19 @@ def main():
     The main entry point of the SectorAlarm client script.
     Parses command-line arguments, initializes the API client,
     and starts either direct data fetching or interactive mode.
+    Subcommands such as 'lock' or 'status' are dispatched to sectoralarm.commands.
     """
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        # Command modules are only imported when a subcommand is used
+        from sectoralarm.commands import run_command
+        sys.exit(run_command(sys.argv[1], sys.argv[2:]))
+
     # Parse command-line options
     try:
         opts, args = getopt.getopt(
-            sys.argv[1:], "he:p:i:c:md:", ["help", "email=", "password=", "panel_id=", "panel_code=", "mask", "data="]
+            sys.argv[1:], "he:p:i:c:md:q:s:t",
+            ["help", "email=", "password=", "panel_id=", "panel_code=", "mask", "data=", "query=", "snapshot=",
+             "record=", "replay=", "replay-speed=", "tui"]
         )
     except getopt.GetoptError as err:
         # Print help information and exit
@@ -41,6 +42,10 @@ def main():
     config_overrides = {}
     mask_sensitive = False
     direct_data_oids = []
+    queries = []
+    snapshot_file = None
+    tui = False
+    traffic = {}
 
     # Process command-line options
     for o, a in opts:
@@ -60,15 +65,19 @@ def main():
         elif o in ("-d", "--data"):
             # Assume that 'a' is a comma-separated list of OIDs
             direct_data_oids = a.split(',')
+        elif o in ("-q", "--query"):
+            queries.append(a)
+        elif o in ("-s", "--snapshot"):
+            snapshot_file = a
+        elif o in ("-t", "--tui"):
+            tui = True
+        elif o in ("--record", "--replay", "--replay-speed"):
+            traffic[o[2:]] = a
         else:
             assert False, "Unhandled option"
 
     # Load configuration from file
-    try:
-        with open('config/config.json', 'r', encoding='utf-8') as config_file:
-            config = json.load(config_file)
-    except FileNotFoundError:
-        config = {}
+    config = load_config()
 
     # Override config with command-line options
     email = config_overrides.get('email', config.get('email'))
@@ -76,34 +85,108 @@ def main():
     panel_id = config_overrides.get('panel_id', config.get('panel_id'))
     panel_code = config_overrides.get('panel_code', config.get('panel_code'))
 
-    # Check that required parameters are provided
-    if not email or not password or not panel_id:
-        print("Error: Missing required configuration parameters (email, password, panel_id).")
-        usage()
-        sys.exit(2)
+    configure_transport(traffic)
 
-    # Initialize the API client
-    api = SectorAlarmAPI(email, password, panel_id, panel_code)
-    try:
-        api.login()
-    except AuthenticationError as e:
-        print(f"Authentication Error: {e}")
-        sys.exit(1)
+    if snapshot_file:
+        # Work offline from a snapshot; credentials are not needed
+        from sectoralarm.snapshot import SnapshotAPI, SnapshotError
+        try:
+            api = SnapshotAPI(snapshot_file, config_overrides.get('panel_id'))
+        except (OSError, SnapshotError) as e:
+            print(f"Snapshot Error: {e}")
+            sys.exit(1)
+    else:
+        # Check that required parameters are provided
+        if not email or not password or not panel_id:
+            print("Error: Missing required configuration parameters (email, password, panel_id).")
+            usage()
+            sys.exit(2)
 
-    # Load cache
-    api.cache_manager.load_cache()
+        # Initialize the API client (imported here to keep startup light)
+        from sectoralarm.client import SectorAlarmAPI
+        api = SectorAlarmAPI(email, password, panel_id, panel_code)
+        try:
+            api.login()
+        except AuthenticationError as e:
+            print(f"Authentication Error: {e}")
+            sys.exit(1)
 
     # Set mask_sensitive flag
     api.mask_sensitive = mask_sensitive or config.get('mask_sensitive', False)
 
-    # If direct_data_oids are provided, fetch data for those OIDs
-    if direct_data_oids:
-        fetch_direct_data(api, direct_data_oids)
+    if snapshot_file:
+        # Categories are decoded on access, so a corrupt one is only found while running
+        try:
+            run_session(api, tui, direct_data_oids, queries)
+        except SnapshotError as e:
+            print(f"Snapshot Error: {e}")
+            sys.exit(1)
+        finally:
+            api.close()
+    else:
+        run_session(api, tui, direct_data_oids, queries)
+
+
+def run_session(api, tui, direct_data_oids, queries):
+    """Run the terminal interface, fetch the requested data, or start the interactive session."""
+    if tui:
+        # The terminal interface retrieves every category in the background instead of loading the cache first
+        from sectoralarm.tui import run_tui
+        try:
+            run_tui(api)
+        except ImportError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        return
+
+    # Load cache
+    api.cache_manager.load_cache()
+
+    # If direct_data_oids or queries are provided, fetch data for those
+    if direct_data_oids or queries:
+        if direct_data_oids:
+            fetch_direct_data(api, direct_data_oids)
+        if queries:
+            fetch_query_data(api, queries)
     else:
         # Start interactive session
         interactive_mode(api)
 
 
+def load_config():
+    """
+    Load the configuration file, returning an empty configuration if it does not exist.
+
+    :return: Dictionary of configuration values.
+    """
+    try:
+        with open(CONFIG_FILE, 'r', encoding='utf-8') as config_file:
+            return json.load(config_file)
+    except FileNotFoundError:
+        return {}
+
+
+def configure_transport(traffic):
+    """
+    Record HTTP traffic to, or replay it from, a cassette file.
+
+    :param traffic: Dictionary with optional 'record', 'replay' and 'replay-speed' values.
+    """
+    if traffic.get('record'):
+        from sectoralarm.replay import RecordingTransport
+        from sectoralarm.transport import set_default_pool
+        set_default_pool(RecordingTransport(traffic['record']))
+    elif traffic.get('replay'):
+        from sectoralarm.replay import ReplayTransport
+        from sectoralarm.transport import set_default_pool
+        try:
+            speed = float(traffic.get('replay-speed', 0))
+            set_default_pool(ReplayTransport(traffic['replay'], speed=speed))
+        except (OSError, ValueError) as e:
+            print(f"Replay Error: {e}")
+            sys.exit(1)
+
+
 def usage():
     """
     Displays the usage instructions for the script.
@@ -111,6 +194,13 @@ def usage():
     print("""
 Usage:
   sectoralarm [options]
+  sectoralarm COMMAND [options] [arguments]
+
+Commands:
+  get, arm, disarm, partial, annex-arm, annex-disarm, lock, unlock,
+  plug-on, plug-off, status, watch, snapshot, poll, serve, search, query
+                            Run non-interactively, optionally on a batch of
+                            panels; see 'sectoralarm COMMAND --help'
 
 Options:
   -h, --help                Show this help message and exit
@@ -120,15 +210,27 @@ Options:
   -c CODE, --panel_code=CODE Panel code (if required)
   -m, --mask                Mask sensitive data in output (SerialNo, Id, etc.)
   -d OIDs, --data=OIDs      Comma-separated list of OIDs to fetch data for directly
+  -q QUERY, --query=QUERY   Select data with a path query (repeatable), e.g.
+                            'Temperatures/*/*/Components[?Temperature>25]{Label,Temperature}'
+  -s FILE, --snapshot=FILE  Work offline from a snapshot file (see 'sectoralarm snapshot')
+  -t, --tui                 Full-screen interface that retrieves data in the background
+  --record=FILE             Record all HTTP traffic to a cassette file
+  --replay=FILE             Serve all HTTP traffic from a cassette file, without network access
+  --replay-speed=FACTOR     Replay with the recorded timing scaled by 1/FACTOR
+                            (default: 0, as fast as possible)
 
 Examples:
   sectoralarm -e user@example.com -p password -i 123456
   sectoralarm -m -d 1.2,3.4.5
+  sectoralarm --tui
+  sectoralarm lock --batch=sites.jsonl
+  sectoralarm -s fleet.snap -i 123456 -d 1.2
+  sectoralarm -q 'Lock Status[?Status=unlock]{Label}'
 
 Description:
   This script allows you to interact with your Sector Alarm system.
   You can use command-line options to provide configuration parameters,
-  enable data masking, and fetch data directly using OIDs.
+  enable data masking, and fetch data directly using OIDs or queries.
 
   If no options are provided, the script will attempt to read configuration
   from 'config.json' and start in interactive mode.
@@ -162,7 +264,7 @@ def get_navigable_items(current_structure, category, level):
     """
     Identify and return navigable items within the current structure based on the category and level.
     Navigable items are those that are dictionaries or lists,
-    following the navigation rules defined in CATEGORY_NAVIGATION.
+    following the navigation rules bundled in category_navigation.json.
 
     :param current_structure: The current data structure (dict or list).
     :param category: The current category being navigated.
@@ -172,17 +274,9 @@ def get_navigable_items(current_structure, category, level):
     navigable_items = []
 
     if isinstance(current_structure, dict):
-        # Determine navigable keys based on the level
-        navigable_keys = []
-        if level == 0:
-            # Top-level navigable keys (e.g., "Sections" for Humidity)
-            navigable_keys = CATEGORY_NAVIGATION.get(category, {}).get("navigable_keys", [])
-        elif level == 1:
-            # Sub-level navigable keys (e.g., "Places" within "Sections")
-            navigable_keys = CATEGORY_NAVIGATION.get(category, {}).get("sub_navigable_keys", [])
-        elif level == 2:
-            # Further sub-level navigable keys (e.g., "Components" within "Places")
-            navigable_keys = CATEGORY_NAVIGATION.get(category, {}).get("sub_sub_navigable_keys", [])
+        # Determine navigable keys based on the level, e.g. "Sections" at level 0,
+        # "Places" within "Sections" at level 1 and "Components" within "Places" at level 2
+        navigable_keys = get_navigable_keys(category, level)
 
         # Traverse navigable keys
         for key, value in current_structure.items():
@@ -243,6 +337,24 @@ def fetch_direct_data(api, direct_data_oids):
             print("-" * 40)
 
 
+def fetch_query_data(api, queries):
+    """
+    Fetch and output the data selected by path queries, see sectoralarm.query.
+
+    :param api: Instance of SectorAlarmAPI.
+    :param queries: List of query strings.
+    """
+    from sectoralarm.query import QueryError, run_queries
+    try:
+        results = run_queries(queries, [api])
+    except QueryError as e:
+        print(f"Query Error: {e}")
+        sys.exit(2)
+    if api.mask_sensitive:
+        results = mask_sensitive_data(results)
+    print(json.dumps(results, indent=4, ensure_ascii=False))
+
+
 def fetch_data_by_oid(api, oid):
     """
     Fetch data from the API based on the OID.
@@ -262,7 +374,7 @@ def fetch_data_by_oid(api, oid):
         if category_index < 0 or category_index >= len(categories):
             return None
         category = categories[category_index]
-        data = api.retrieve_category_data(category)
+        data = api.get_category_data(category)
         sub_data = data
 
         level = 0  # Initial navigation level
@@ -309,6 +421,7 @@ def interactive_mode(api):
         print("4. Lock/Unlock Doors")
         print("5. Arm/Disarm System")
         print("F. Fetch all data")
+        print("S. Search devices and logs")
         print("0. Exit")
         choice = input("Select an option: ").strip()
         if choice == "1":
@@ -324,6 +437,8 @@ def interactive_mode(api):
             arm_disarm_system(api)
         elif choice.upper() == "F":
             fetch_all_data(api)
+        elif choice.upper() == "S":
+            search_data(api)
         elif choice == "0":
             print("Exiting...")
             sys.exit(0)
@@ -350,8 +465,8 @@ def select_category(api):
         choice_num = int(choice)
         if 1 <= choice_num <= len(categories):
             category = categories[choice_num - 1]
-            # Retrieve data for the selected category
-            data = api.retrieve_category_data(category)
+            # Retrieve data for the selected category, unless it is still fresh in the cache
+            data = api.get_category_data(category)
             if data is None:
                 print(f"Failed to retrieve data for category '{category}'.")
                 input("Press Enter to continue...")
@@ -481,14 +596,24 @@ def fetch_data_at_path(api, path, category):
     :param category: The current category being navigated.
     :return: The data retrieved from the API or None if not found.
     """
-    data = api.retrieve_category_data(category)
+    data = api.get_category_data(category)
     if data is None:
         return None
+    return find_data_at_path(data, [p['key'] for p in path[1:]], category)
+
+
+def find_data_at_path(data, keys, category):
+    """
+    Find the data at a navigation path within a category's data.
 
+    :param data: The category's data.
+    :param keys: The identifiers of the items navigated into below the category.
+    :param category: The category being navigated.
+    :return: The data at the path, or None if the path no longer exists.
+    """
     sub_data = data
     level = 0  # Initial navigation level
-    for p in path[1:]:
-        key = p['key']
+    for key in keys:
         if isinstance(sub_data, dict):
             navigable_items = get_navigable_items(sub_data, category, level)
             if not navigable_items:
@@ -504,9 +629,11 @@ def fetch_data_at_path(api, path, category):
                 return None
             level += 1
         elif isinstance(sub_data, list):
+            # List items are identified like dictionary items, or by their 1-based index
+            matches = [item for identifier, item in get_navigable_items(sub_data, category, level)
+                       if identifier == key]
             try:
-                index = int(key) - 1
-                sub_data = sub_data[index]
+                sub_data = matches[0] if matches else sub_data[int(key) - 1]
                 level += 1
             except (ValueError, IndexError):
                 return None
@@ -532,40 +659,69 @@ def fetch_all_data(api):
     input("Press Enter to continue...")
 
 
+def search_data(api):
+    """
+    Search the panel's devices and logs by label, room, serial or text, and display a selected result.
+
+    :param api: Instance of SectorAlarmAPI.
+    """
+    query = input("Search (e.g. 'kitchen smoke detector' or a serial): ").strip()
+    if not query:
+        return
+    cache_manager = api.cache_manager
+    # Creating the index first lets it pick up every category as it is retrieved
+    cache_manager.search_index
+    for category in cache_manager.cache.keys():
+        if cache_manager.get_data(category) is None:
+            api.retrieve_category_data(category)
+    results = api.search(query)
+    if not results:
+        print(f"No results for '{query}'.")
+        input("Press Enter to continue...")
+        return
+
+    print(f"\nResults for '{query}':")
+    for idx, result in enumerate(results, start=1):
+        serial = f" [{result['serial']}]" if result['serial'] and not api.mask_sensitive else ""
+        print(f"{idx}. {result['label'] or 'Item'}{serial} - {result['location']}")
+    print("0. Back")
+    choice = input("Select a result to display: ").strip()
+    if choice.isdigit() and 1 <= int(choice) <= len(results):
+        data = results[int(choice) - 1]['data']
+        if api.mask_sensitive:
+            data = mask_sensitive_data(data)
+        print(json.dumps(data, indent=4, ensure_ascii=False))
+        input("Press Enter to continue...")
+
+
 def cache_statistics(api):
     """
     Display statistics of the cache, including the number of categories,
-    sections, and items.
+    sections, places and components, payload sizes and device types.
 
     :param api: Instance of SectorAlarmAPI.
     """
-    num_categories = len(api.cache_manager.cache)
-    num_sections = 0
-    num_items = 0
-
-    def traverse(node):
-        """
-        Recursively traverse the data structure to count sections and items.
-
-        :param node: The current node in the data structure.
-        """
-        nonlocal num_sections, num_items
-        if isinstance(node, dict):
-            num_sections += len(node)
-            for value in node.values():
-                traverse(value)
-        elif isinstance(node, list):
-            num_items += len(node)
-            for item in node:
-                traverse(item)
-
-    for category in api.cache_manager.cache.values():
-        traverse(category)
+    statistics = api.cache_manager.statistics()
+    totals = statistics["totals"]
 
     print("\nCache Statistics:")
-    print(f"Total Categories: {num_categories}")
-    print(f"Total Sections: {num_sections}")
-    print(f"Total Items: {num_items}")
+    print(f"Total Categories: {totals['categories']}")
+    print(f"Total Sections: {totals['sections']}")
+    print(f"Total Places: {totals['places']}")
+    print(f"Total Components: {totals['components']}")
+    print(f"Total Keys: {totals['keys']}")
+    print(f"Total Items: {totals['items']}")
+    print(f"Total Size: {totals['bytes']} bytes")
+
+    print("\nPer Category:")
+    for category, counters in statistics["categories"].items():
+        print(f"  {category}: {counters['components']} components, {counters['bytes']} bytes, "
+              f"depth {counters['max_depth']}, {counters['change_rate']} changes/update")
+
+    if statistics["device_types"]:
+        print("\nDevice Types:")
+        for device_type, count in statistics["device_types"].items():
+            print(f"  {device_type}: {count}")
     input("Press Enter to continue...")
 
 
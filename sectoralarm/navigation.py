@@ -0,0 +1,34 @@
+# sectoralarm/navigation.py
+
+import json
+import pkgutil
+from functools import lru_cache
+
+NAVIGATION_RESOURCE = "category_navigation.json"
+
+# Keys in category_navigation.json, ordered by navigation depth
+LEVEL_KEYS = ("navigable_keys", "sub_navigable_keys", "sub_sub_navigable_keys")
+
+
+@lru_cache(maxsize=1)
+def load_navigation():
+    """Load the category navigation rules bundled with the package."""
+    raw = pkgutil.get_data(__package__, NAVIGATION_RESOURCE)
+    return json.loads(raw.decode("utf-8"))
+
+
+@lru_cache(maxsize=1)
+def compiled_navigation():
+    """Return the navigation rules compiled to {category: (frozenset, ...)} indexed by level."""
+    return {
+        category: tuple(frozenset(rules.get(level_key, ())) for level_key in LEVEL_KEYS)
+        for category, rules in load_navigation().items()
+    }
+
+
+def get_navigable_keys(category, level):
+    """Return the set of navigable keys for a category at the given depth level."""
+    levels = compiled_navigation().get(category)
+    if levels is None or level >= len(levels):
+        return frozenset()
+    return levels[level]
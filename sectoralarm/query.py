@@ -0,0 +1,377 @@
+# sectoralarm/query.py
+
+"""
+A small path query language over panel data.
+
+A query is a category followed by path steps separated by '/':
+
+    Temperatures/*/*/Components[?Temperature>25]{Label,Temperature}
+    Lock Status[?Status=lock]
+    */**[?SerialNo=ABC123]
+    Temperatures/Ground floor/Kitchen/Components
+
+Steps:
+
+    name      A dictionary key, or a section, place or component by its name or
+              label; glob patterns such as 'Temp*' are allowed
+    *         Every navigable item, following the navigation rules of the
+              category (Sections, then Places, then Components), or every
+              value or list item where there are no rules
+    **        The node and every dictionary below it
+
+Each step may be followed by filters, which keep the items of a list, or a
+dictionary itself, when the condition holds:
+
+    [?Field]              Field is present and truthy
+    [?Field=value]        Also !=, >, >=, <, <= and ~ (case-insensitive substring)
+    [?Place.Name=Hall]    Dotted fields reach into nested dictionaries
+
+The last step may end with {Field,...} to keep only some fields of each result.
+The category may also be a glob pattern, e.g. '*' for every category.
+
+Queries are compiled once to a plan. Executing a set of queries over many
+panels retrieves every needed category once per panel and evaluates all
+queries over it in the same pass.
+"""
+
+import fnmatch
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from .endpoints import data_categories
+from .navigation import get_navigable_keys
+
+DEFAULT_WORKERS = 8
+
+# Fields identifying an item in a path, in order of preference (as in interactive mode)
+IDENTIFIER_FIELDS = ("Name", "Label", "Id", "Key")
+
+_CONDITION = re.compile(r"^\s*([^!=<>~\s]+)\s*(?:(==|!=|>=|<=|=|>|<|~)\s*(.*?))?\s*$")
+
+
+class QueryError(ValueError):
+    """Exception raised for queries that cannot be parsed."""
+    pass
+
+
+def _split(text, separator):
+    """Split on a separator outside of brackets, braces and quotes."""
+    parts, current, depth, quote = [], [], 0, None
+    for char in text:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char in "[{":
+            depth += 1
+        elif char in "]}":
+            depth -= 1
+        elif char == separator and depth == 0:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    if quote or depth:
+        raise QueryError(f"Unbalanced brackets or quotes in '{text}'.")
+    parts.append("".join(current))
+    return parts
+
+
+def _literal(text):
+    """Parse a filter value: a number, true/false/null, or a (quoted) string."""
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "'\"":
+        return text[1:-1]
+    lowered = text.lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    if lowered in ("null", "none"):
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def _number(value):
+    """Return a number, or a string holding one such as "21.5", as a float; otherwise None."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            number = float(value)
+        except ValueError:
+            return None
+        return number if math.isfinite(number) else None
+    return None
+
+
+class Condition:
+    """A compiled filter condition."""
+
+    __slots__ = ('field', 'operator', 'value')
+
+    def __init__(self, text):
+        match = _CONDITION.match(text)
+        if match is None:
+            raise QueryError(f"Invalid filter '[?{text}]'.")
+        field, self.operator, value = match.groups()
+        self.field = tuple(field.split('.'))
+        self.value = _literal(value) if self.operator else None
+        if self.operator == "==":
+            self.operator = "="
+
+    def _lookup(self, item):
+        for key in self.field:
+            if not isinstance(item, dict) or key not in item:
+                return False, None
+            item = item[key]
+        return True, item
+
+    def matches(self, item):
+        found, value = self._lookup(item)
+        if not found:
+            return False
+        operator, expected = self.operator, self.value
+        if operator is None:
+            return bool(value)
+        if operator == "~":
+            return str(expected).lower() in str(value).lower()
+        # The API reports many numbers as strings, e.g. "Temperature": "21.5"
+        numbers = _number(value), _number(expected)
+        if None not in numbers and not (isinstance(value, str) and isinstance(expected, str)):
+            value, expected = numbers
+        if operator in ("=", "!="):
+            equal = value == expected or (type(value) is not type(expected)
+                                          and str(value).lower() == str(expected).lower())
+            return equal == (operator == "=")
+        # Order comparisons only between numbers, or between strings
+        numbers = all(isinstance(x, float) for x in (value, expected))
+        if not numbers and not (isinstance(value, str) and isinstance(expected, str)):
+            return False
+        if operator == ">":
+            return value > expected
+        if operator == ">=":
+            return value >= expected
+        if operator == "<":
+            return value < expected
+        return value <= expected
+
+
+class Step:
+    """A compiled path step: a selector with optional filters."""
+
+    __slots__ = ('selector', 'pattern', 'filters')
+
+    def __init__(self, text):
+        selector, filters = self._parse(text)
+        self.selector = selector
+        self.pattern = None
+        if selector not in ("*", "**"):
+            self.pattern = re.compile(fnmatch.translate(selector)) if any(c in selector for c in "*?[") else None
+        self.filters = filters
+
+    @staticmethod
+    def _parse(text):
+        position = len(text)
+        for marker in ("[", "{"):
+            index = text.find(marker)
+            if index != -1:
+                position = min(position, index)
+        selector = text[:position].strip()
+        filters = []
+        rest = text[position:]
+        while rest.startswith("[?"):
+            end = rest.find("]")
+            if end == -1:
+                raise QueryError(f"Unterminated filter in '{text}'.")
+            filters.append(Condition(rest[2:end]))
+            rest = rest[end + 1:].strip()
+        if rest and not rest.startswith("{"):
+            raise QueryError(f"Unexpected '{rest}' in '{text}'.")
+        return selector, filters
+
+    def _name_matches(self, name):
+        if self.pattern is not None:
+            return self.pattern.match(str(name)) is not None
+        return str(name) == self.selector
+
+    def select(self, node, path, category, level):
+        """Yield (path, value, level) for every child selected by the step."""
+        if self.selector == "**":
+            stack = [(path, node)]
+            while stack:
+                current_path, current = stack.pop()
+                if isinstance(current, dict):
+                    yield current_path, current, level
+                    children = list(current.items())
+                elif isinstance(current, list):
+                    children = list(enumerate(current))
+                else:
+                    continue
+                for key, child in reversed(children):
+                    if isinstance(child, (dict, list)):
+                        stack.append((current_path + (key,), child))
+        elif self.selector == "*":
+            if isinstance(node, dict):
+                keys = get_navigable_keys(category, level)
+                navigable = [key for key in node if key in keys and isinstance(node[key], (dict, list))]
+                if navigable:
+                    for key in navigable:
+                        value = node[key]
+                        if isinstance(value, list):
+                            for index, item in enumerate(value):
+                                if isinstance(item, dict):
+                                    yield path + (key, index), item, level + 1
+                        else:
+                            yield path + (key,), value, level + 1
+                else:
+                    for key, value in node.items():
+                        yield path + (key,), value, level
+            elif isinstance(node, list):
+                for index, item in enumerate(node):
+                    yield path + (index,), item, level + 1
+        elif isinstance(node, dict):
+            matched = False
+            for key, value in node.items():
+                if self._name_matches(key):
+                    matched = True
+                    yield path + (key,), value, level
+            if not matched:
+                # Otherwise select sections, places and components by their name
+                for child_path, child, child_level in Step("*").select(node, path, category, level):
+                    if isinstance(child, dict) and self._identified(child):
+                        yield child_path, child, child_level
+        elif isinstance(node, list):
+            for index, item in enumerate(node):
+                if isinstance(item, dict) and self._identified(item):
+                    yield path + (index,), item, level + 1
+
+    def _identified(self, item):
+        for field in IDENTIFIER_FIELDS:
+            if item.get(field):
+                return self._name_matches(item[field])
+        return False
+
+    def filter(self, path, node):
+        """Yield (path, value) for the node, or its list items, passing every filter."""
+        if not self.filters:
+            yield path, node
+        elif isinstance(node, list):
+            for index, item in enumerate(node):
+                if all(condition.matches(item) for condition in self.filters):
+                    yield path + (index,), item
+        elif isinstance(node, dict):
+            if all(condition.matches(node) for condition in self.filters):
+                yield path, node
+
+
+class Query:
+    """A compiled query, see compile_query()."""
+
+    def __init__(self, text):
+        self.text = text
+        segments = [segment.strip() for segment in _split(text.strip(), "/")]
+        if not segments or not segments[0]:
+            raise QueryError("A query starts with a category, e.g. 'Temperatures/*'.")
+        self.projection = None
+        last = segments[-1]
+        brace = last.find("{")
+        if brace != -1:
+            if not last.endswith("}"):
+                raise QueryError(f"Unterminated field list in '{last}'.")
+            self.projection = tuple(field.strip() for field in last[brace + 1:-1].split(",") if field.strip())
+            segments[-1] = last[:brace]
+        self.root = Step(segments[0])
+        self.steps = tuple(Step(segment) for segment in segments[1:])
+
+    def categories(self, available):
+        """Return the categories among those available that the query reads."""
+        if self.root.selector in ("*", "**"):
+            return list(available)
+        return [category for category in available if self.root._name_matches(category)]
+
+    def evaluate(self, category, data):
+        """
+        Evaluate the query over one category's data.
+
+        :return: List of (path, value) tuples, where path is a tuple of keys and indexes.
+        """
+        nodes = [(path, node, 0) for path, node in self.root.filter((), data)]
+        for step in self.steps:
+            selected = []
+            for path, node, level in nodes:
+                for child_path, child, child_level in step.select(node, path, category, level):
+                    for result_path, result in step.filter(child_path, child):
+                        selected.append((result_path, result, child_level))
+            nodes = selected
+        results = []
+        for path, node, _ in nodes:
+            if self.projection is not None and isinstance(node, dict):
+                node = {field: node[field] for field in self.projection if field in node}
+            results.append((path, node))
+        return results
+
+    def __repr__(self):
+        return f"Query({self.text!r})"
+
+
+@lru_cache(maxsize=256)
+def compile_query(text):
+    """Compile a query string, reusing the plan of queries seen before."""
+    return Query(text)
+
+
+def available_categories(api):
+    """Return the categories a client, or a SnapshotAPI, can provide."""
+    snapshot = getattr(api, "snapshot", None)
+    if snapshot is not None:
+        return snapshot.categories(api.panel_id)
+    return data_categories()
+
+
+def run_queries(queries, apis, workers=DEFAULT_WORKERS):
+    """
+    Evaluate queries over many panels, retrieving each needed category once per panel.
+
+    :param queries: Query strings or compiled queries.
+    :param apis: Logged in SectorAlarmAPI (or SnapshotAPI) instances.
+    :param workers: Number of categories retrieved concurrently.
+    :return: List of result dictionaries with panel_id, query, category, path and value,
+             in the order of the panels, then the queries.
+    """
+    queries = [compile_query(query) if isinstance(query, str) else query for query in queries]
+
+    # Plan: the categories each query reads, and the union to retrieve, per panel
+    plan = []
+    for api in apis:
+        reads = [(query, query.categories(available_categories(api))) for query in queries]
+        needed = []
+        for _, categories in reads:
+            needed.extend(category for category in categories if category not in needed)
+        plan.append((api, reads, needed))
+
+    fetches = [(api, category) for api, _, needed in plan for category in needed]
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(fetches) or 1))) as executor:
+        fetched = executor.map(lambda fetch: fetch[0].retrieve_category_data(fetch[1]), fetches)
+        data = {(api.panel_id, category): result for (api, category), result in zip(fetches, fetched)}
+
+    results = []
+    for api, reads, _ in plan:
+        for query, categories in reads:
+            for category in categories:
+                category_data = data.get((api.panel_id, category))
+                if category_data is None:
+                    continue
+                for path, value in query.evaluate(category, category_data):
+                    results.append({"panel_id": api.panel_id, "query": query.text, "category": category,
+                                    "path": list(path), "value": value})
+    return results
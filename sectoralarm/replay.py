@@ -0,0 +1,224 @@
+# sectoralarm/replay.py
+
+"""
+Record and replay HTTP traffic for offline, deterministic runs.
+
+RecordingTransport wraps a transport and appends every request/response pair,
+with its timing, to a cassette file. ReplayTransport serves the recorded
+responses from the cassette without any network access, either with the
+original timing or as fast as possible. Both plug into SectorAlarmAPI
+through its transport argument, or process-wide through
+sectoralarm.transport.set_default_pool().
+
+Cassettes are JSON lines: a header line followed by one line per interaction.
+Credentials, panel codes and authorization tokens are redacted before they are
+written.
+"""
+
+import json
+import threading
+import time
+import logging
+from collections import deque
+
+from .transport import get_default_pool
+
+logger = logging.getLogger("SectorAlarmAPI")
+
+CASSETTE_VERSION = 1
+
+# Credentials that are never written to a cassette, nor used to match requests
+REDACTED_FIELDS = ("UserId", "Password", "AuthorizationToken", "PanelCode")
+REDACTED = "***REDACTED***"
+
+
+def _redact(value):
+    if isinstance(value, dict):
+        return {key: REDACTED if key in REDACTED_FIELDS else _redact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_redact(item) for item in value]
+    return value
+
+
+def _request_key(method, url, body):
+    """Key used to match a replayed request to recorded ones."""
+    return (method, url, json.dumps(_redact(body), sort_keys=True) if body is not None else None)
+
+
+class ReplayResponse:
+    """A recorded response, exposing the parts of requests.Response used by the client."""
+
+    def __init__(self, status_code, text, headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode('utf-8')
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class RecordingSession:
+    """Session wrapper that records every interaction to a cassette."""
+
+    def __init__(self, session, path):
+        self.session = session
+        self.path = path
+        self.lock = threading.Lock()
+        self.start = time.time()
+        self.count = 0
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"version": CASSETTE_VERSION, "created": self.start}) + "\n")
+
+    def _record(self, method, url, body, response, elapsed):
+        try:
+            text = json.dumps(_redact(response.json()), ensure_ascii=False)
+        except ValueError:
+            text = response.text
+        interaction = {
+            "method": method,
+            "url": url,
+            "body": _redact(body),
+            "status": response.status_code,
+            "content_type": response.headers.get("Content-Type"),
+            "response": text,
+            "elapsed": round(elapsed, 6),
+            "offset": round(time.time() - elapsed - self.start, 6),
+        }
+        line = json.dumps(interaction, ensure_ascii=False) + "\n"
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+            self.count += 1
+
+    def get(self, url, **kwargs):
+        start = time.perf_counter()
+        response = self.session.get(url, **kwargs)
+        self._record("GET", url, None, response, time.perf_counter() - start)
+        return response
+
+    def post(self, url, json=None, **kwargs):
+        start = time.perf_counter()
+        response = self.session.post(url, json=json, **kwargs)
+        self._record("POST", url, json, response, time.perf_counter() - start)
+        return response
+
+    def close(self):
+        self.session.close()
+
+
+class ReplaySession:
+    """Session stand-in that serves responses from a cassette.
+
+    Recorded responses for the same request are served in recording order;
+    once exhausted they are served again from the start when loop is True,
+    which allows load testing beyond the length of the recording.
+
+    With a speed, playback follows the recording's timeline from the first
+    request served: each response is held until its recorded offset plus
+    latency, scaled by 1/speed, and for at least its scaled latency. A looped
+    response is due one recording length later than on its previous pass.
+
+    :param path: Cassette file.
+    :param speed: 1.0 replays with the recorded timing, 2.0 twice as fast;
+                  None or 0 replays as fast as possible.
+    :param loop: Cycle through recorded responses once they are exhausted.
+    """
+
+    def __init__(self, path, speed=None, loop=True):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.lock = threading.Lock()
+        self.recorded = {}
+        self.pending = {}
+        self.served = 0
+        self.missed = 0
+        self.started = None  # time.monotonic() of the first request served
+        self.duration = 0.0  # Length of the recording in seconds
+        self.passes = {}  # {request key: times its responses were served again from the start}
+        with open(path, 'r', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if header.get("version", 0) > CASSETTE_VERSION:
+                raise ValueError(f"Cassette version {header['version']} is not supported.")
+            for line in f:
+                if not line.strip():
+                    continue
+                interaction = json.loads(line)
+                self.duration = max(self.duration, interaction.get("offset", 0) + interaction["elapsed"])
+                key = _request_key(interaction["method"], interaction["url"], interaction["body"])
+                self.recorded.setdefault(key, []).append(interaction)
+        self.pending = {key: deque(interactions) for key, interactions in self.recorded.items()}
+
+    def _next(self, key):
+        """Return the next recorded interaction for a request and the time it is due, or (None, None)."""
+        with self.lock:
+            now = time.monotonic()
+            if self.started is None:
+                self.started = now
+            queue = self.pending.get(key)
+            if not queue:
+                if not self.loop or key not in self.recorded:
+                    self.missed += 1
+                    return None, None
+                queue = self.pending[key] = deque(self.recorded[key])
+                self.passes[key] = self.passes.get(key, 0) + 1
+            self.served += 1
+            interaction = queue.popleft()
+            if not self.speed:
+                return interaction, now
+            latency = interaction["elapsed"] / self.speed
+            if "offset" not in interaction:
+                # Cassettes without offsets are replayed with their latency only
+                return interaction, now + latency
+            offset = self.passes.get(key, 0) * self.duration + interaction["offset"] + interaction["elapsed"]
+            return interaction, max(now + latency, self.started + offset / self.speed)
+
+    def _serve(self, method, url, body):
+        interaction, due = self._next(_request_key(method, url, body))
+        if interaction is None:
+            logger.warning(f"No recorded response for {method} {url}.")
+            return ReplayResponse(404, json.dumps({"Message": "No recorded response."}))
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        headers = {"Content-Type": interaction["content_type"]} if interaction.get("content_type") else {}
+        return ReplayResponse(interaction["status"], interaction["response"], headers)
+
+    def get(self, url, **kwargs):
+        return self._serve("GET", url, None)
+
+    def post(self, url, json=None, **kwargs):
+        return self._serve("POST", url, json)
+
+    def close(self):
+        pass
+
+
+class RecordingTransport:
+    """Transport recording all traffic of the wrapped transport to a cassette."""
+
+    def __init__(self, path, transport=None):
+        self.transport = transport or get_default_pool()
+        self.session = RecordingSession(self.transport.session, path)
+
+    def stats(self):
+        stats = dict(self.transport.stats())
+        stats["recorded"] = self.session.count
+        return stats
+
+    def close(self):
+        self.transport.close()
+
+
+class ReplayTransport:
+    """Transport serving all traffic from a cassette, without network access."""
+
+    def __init__(self, path, speed=None, loop=True):
+        self.session = ReplaySession(path, speed, loop)
+
+    def stats(self):
+        return {"replayed": self.session.served, "missed": self.session.missed}
+
+    def close(self):
+        pass
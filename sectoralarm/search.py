@@ -0,0 +1,225 @@
+# sectoralarm/search.py
+
+"""
+Indexed, fuzzy search across devices and logs.
+
+SearchIndex keeps an inverted index from words to documents, where a
+document is any item of the cached data carrying a label, name, serial,
+room or log text. A document is also indexed under the words of its
+category and of the sections and places containing it, so a query such as
+"kitchen smoke detector" finds the smoke detector placed in the kitchen.
+
+The index is updated incrementally whenever a cache manager stores a
+category, replacing that category's previous documents.
+
+Query words match indexed words exactly, by prefix, or, when neither
+matches, by similarity (difflib). A document must match every query word.
+"""
+
+import bisect
+import difflib
+import re
+import threading
+
+# Fields whose text is indexed, and shown as the label of a result in this order
+LABEL_FIELDS = ("Label", "Name", "LockName", "RoomName", "Room", "Text", "Description", "EventType", "Type",
+                "User", "UserName")
+SERIAL_FIELDS = ("Serial", "SerialNo", "SerialString", "DeviceId", "Id")
+INDEXED_FIELDS = LABEL_FIELDS + SERIAL_FIELDS
+
+# Keys holding the navigation hierarchy, see category_navigation.json
+CONTEXT_KEYS = ("Sections", "Places")
+
+SCORE_EXACT = 3
+SCORE_PREFIX = 2
+SCORE_FUZZY = 1
+FUZZY_CUTOFF = 0.8
+FUZZY_MATCHES = 5
+DEFAULT_LIMIT = 20
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    """Split text into lower-case words."""
+    return _WORD.findall(str(text).lower())
+
+
+class Document:
+    """An indexed item: where it is and the words it is found by."""
+
+    __slots__ = ('panel_id', 'category', 'path', 'label', 'serial', 'context', 'item', 'words')
+
+    def __init__(self, panel_id, category, path, label, serial, context, item, words):
+        self.panel_id = panel_id
+        self.category = category
+        self.path = path
+        self.label = label
+        self.serial = serial
+        self.context = context
+        self.item = item
+        self.words = words
+
+    def to_dict(self, score):
+        return {
+            "panel_id": self.panel_id,
+            "category": self.category,
+            "path": list(self.path),
+            "location": " > ".join([self.category] + list(self.context)),
+            "label": self.label,
+            "serial": self.serial,
+            "score": score,
+            "data": self.item,
+        }
+
+
+def _first(item, fields):
+    for field in fields:
+        value = item.get(field)
+        if value not in (None, ""):
+            return str(value)
+    return None
+
+
+def _documents(panel_id, category, data):
+    """Yield a Document for every searchable item of a category's data."""
+    category_words = tokenize(category)
+    # (path, value, context names), walked iteratively
+    stack = [((), data, ())]
+    while stack:
+        path, value, context = stack.pop()
+        if isinstance(value, dict):
+            label = _first(value, LABEL_FIELDS)
+            serial = _first(value, SERIAL_FIELDS)
+            if label is not None or serial is not None:
+                words = set(category_words)
+                for name in context:
+                    words.update(tokenize(name))
+                for field in INDEXED_FIELDS:
+                    if isinstance(value.get(field), (str, int)) and not isinstance(value.get(field), bool):
+                        words.update(tokenize(value[field]))
+                yield Document(panel_id, category, path, label, serial, context, value, frozenset(words))
+            # Sections and places name the context of everything inside them
+            if label is not None and len(path) >= 2 and path[-2] in CONTEXT_KEYS:
+                context = context + (label,)
+            for key, item in value.items():
+                if isinstance(item, (dict, list)):
+                    stack.append((path + (key,), item, context))
+        elif isinstance(value, list):
+            for index in range(len(value) - 1, -1, -1):
+                stack.append((path + (index,), value[index], context))
+
+
+class SearchIndex:
+    """An inverted index over the cached data of one or more panels."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.documents = {}  # {document id: Document}
+        self.postings = {}  # {word: set of document ids}
+        self.by_category = {}  # {(panel_id, category): list of document ids}
+        self.vocabulary = []  # Sorted words, for prefix matching
+        self._vocabulary_dirty = False
+        self._next_id = 0
+
+    def update(self, panel_id, category, data):
+        """Index a category's data, replacing what was previously indexed for it."""
+        documents = list(_documents(str(panel_id), category, data)) if data is not None else []
+        with self.lock:
+            self._remove(str(panel_id), category)
+            ids = []
+            for document in documents:
+                document_id = self._next_id
+                self._next_id += 1
+                self.documents[document_id] = document
+                for word in document.words:
+                    posting = self.postings.get(word)
+                    if posting is None:
+                        posting = self.postings[word] = set()
+                        self._vocabulary_dirty = True
+                    posting.add(document_id)
+                ids.append(document_id)
+            self.by_category[(str(panel_id), category)] = ids
+
+    def remove(self, panel_id, category=None):
+        """Remove one category, or every category, of a panel from the index."""
+        with self.lock:
+            if category is not None:
+                self._remove(str(panel_id), category)
+                return
+            for key in [key for key in self.by_category if key[0] == str(panel_id)]:
+                self._remove(*key)
+
+    def _remove(self, panel_id, category):
+        for document_id in self.by_category.pop((panel_id, category), ()):
+            document = self.documents.pop(document_id)
+            for word in document.words:
+                posting = self.postings[word]
+                posting.discard(document_id)
+                if not posting:
+                    del self.postings[word]
+                    self._vocabulary_dirty = True
+
+    def _matches(self, word):
+        """Return {document id: score} for one query word."""
+        if self._vocabulary_dirty:
+            self.vocabulary = sorted(self.postings)
+            self._vocabulary_dirty = False
+
+        scores = {}
+        position = bisect.bisect_left(self.vocabulary, word)
+        while position < len(self.vocabulary) and self.vocabulary[position].startswith(word):
+            candidate = self.vocabulary[position]
+            score = SCORE_EXACT if candidate == word else SCORE_PREFIX
+            for document_id in self.postings[candidate]:
+                if scores.get(document_id, 0) < score:
+                    scores[document_id] = score
+            position += 1
+        if not scores:
+            for candidate in difflib.get_close_matches(word, self.vocabulary, FUZZY_MATCHES, FUZZY_CUTOFF):
+                for document_id in self.postings[candidate]:
+                    scores[document_id] = SCORE_FUZZY
+        return scores
+
+    def search(self, query, panel_id=None, category=None, limit=DEFAULT_LIMIT):
+        """
+        Find the items matching every word of a query.
+
+        :param query: Free text, e.g. "kitchen smoke detector" or a serial number.
+        :param panel_id: Only search this panel.
+        :param category: Only search this category.
+        :param limit: Maximum number of results, or None for all.
+        :return: List of result dictionaries, best match first.
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+        with self.lock:
+            scores = None
+            for word in words:
+                matches = self._matches(word)
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = {document_id: score + matches[document_id]
+                              for document_id, score in scores.items() if document_id in matches}
+                if not scores:
+                    return []
+            results = []
+            for document_id, score in scores.items():
+                document = self.documents[document_id]
+                if panel_id is not None and document.panel_id != str(panel_id):
+                    continue
+                if category is not None and document.category != category:
+                    continue
+                results.append((score, document_id, document))
+        # Best score first; among equals, the order in which items were indexed
+        results.sort(key=lambda result: (-result[0], result[1]))
+        if limit is not None:
+            results = results[:limit]
+        return [document.to_dict(score) for score, _, document in results]
+
+    def stats(self):
+        with self.lock:
+            return {"documents": len(self.documents), "words": len(self.postings),
+                    "categories": len(self.by_category)}
@@ -0,0 +1,308 @@
+# sectoralarm/sharding.py
+
+"""
+Multi-process, sharded polling for large fleets.
+
+Panels are partitioned across worker processes by a stable hash of their
+panel ID. Each worker runs its own clients and caches, polls its panels,
+decodes and diffs the responses, and sends the results back to the parent
+process over a queue:
+
+    {"type": "event", "shard": 0, "panel_id": "123", "category": "Panel Status",
+     "timestamp": ..., "changes": [...]}     # Delta, see sectoralarm.history.diff
+    {"type": "snapshot", "shard": 0, "panel_id": "123", "timestamp": ..., "state": {...}}
+    {"type": "metrics", "shard": 0, "timestamp": ..., "cycle": 1, "duration": ..., "metrics": {...}}
+    {"type": "error", "shard": 0, "panel_id": "123", "timestamp": ..., "error": "..."}
+
+Since JSON decoding and diffing happen in the workers, throughput scales with
+the number of cores rather than being bound by one interpreter lock.
+"""
+
+import os
+import queue
+import time
+import zlib
+import logging
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("SectorAlarmAPI")
+
+DEFAULT_INTERVAL = 60
+DEFAULT_THREADS_PER_SHARD = 8
+
+
+def shard_for(panel_id, shards):
+    """Return the shard index of a panel; stable across processes and runs."""
+    return zlib.crc32(str(panel_id).encode('utf-8')) % shards
+
+
+def partition(panels, shards):
+    """
+    Partition panel configurations across shards.
+
+    :param panels: List of dictionaries with at least 'panel_id', plus
+                   optional 'email', 'password' and 'panel_code'.
+    :param shards: Number of shards.
+    :return: List of panel lists, one per shard.
+    """
+    partitions = [[] for _ in range(shards)]
+    for panel in panels:
+        partitions[shard_for(panel['panel_id'], shards)].append(panel)
+    return partitions
+
+
+def _poll_panel(api, max_ages, previous, snapshot):
+    """Poll one panel's categories, {category: maximum age of cached data}, returning its messages and new state."""
+    from .history import diff
+
+    messages = []
+    state = dict(previous) if previous is not None else {}
+    for category, max_age in max_ages.items():
+        data = api.get_category_data(category, max_age)
+        if data is None:
+            continue
+        if previous is not None:
+            changes = diff(previous.get(category), data) if category in previous else [
+                {"op": "set", "path": [], "value": data}]
+            if changes:
+                messages.append({"type": "event", "panel_id": api.panel_id, "category": category,
+                                 "timestamp": time.time(), "changes": changes})
+        state[category] = data
+    if snapshot:
+        messages.append({"type": "snapshot", "panel_id": api.panel_id, "timestamp": time.time(), "state": state})
+    return messages, state
+
+
+def run_shard(shard, panels, options, results, stop):
+    """
+    Worker process entry point: poll the shard's panels until stopped.
+
+    :param shard: Shard index, included in every message.
+    :param panels: Panel configurations of this shard.
+    :param options: Dictionary of poller options, see ShardedPoller.
+    :param results: Queue receiving the messages.
+    :param stop: Event set by the parent to stop the worker.
+    """
+    from .cache import MemoryBudget
+    from .client import SectorAlarmAPI
+    from .endpoints import data_categories, refresh_age
+    from .exceptions import AuthenticationError
+    from .hooks import MetricsHooks
+
+    def send(message):
+        message["shard"] = shard
+        results.put(message)
+
+    metrics = MetricsHooks()
+    # One budget for the whole worker, shared by the clients of its panels
+    budget = options.get('memory_budget')
+    if budget is not None:
+        budget = MemoryBudget(int(budget))
+    clients = []
+    tokens = {}
+    for panel in panels:
+        api = SectorAlarmAPI(panel['email'], panel['password'], str(panel['panel_id']),
+                             panel.get('panel_code'), hooks=[metrics], memory_budget=budget)
+        try:
+            if panel['email'] not in tokens:
+                api.login()
+                tokens[panel['email']] = api.auth_token
+            api.auth_token = tokens[panel['email']]
+            clients.append(api)
+        except (AuthenticationError, OSError) as e:
+            send({"type": "error", "panel_id": api.panel_id, "timestamp": time.time(), "error": str(e)})
+
+    categories = options.get('categories') or data_categories()
+    # Categories still within their TTL at the next cycle are served from the cache
+    interval = options.get('interval', DEFAULT_INTERVAL)
+    max_ages = {category: refresh_age(category, interval) for category in categories}
+    states = {}
+    cycle = 0
+    with ThreadPoolExecutor(max_workers=options.get('threads', DEFAULT_THREADS_PER_SHARD)) as executor:
+        while not stop.is_set():
+            cycle += 1
+            start = time.monotonic()
+            snapshot_every = options.get('snapshot_every')
+            snapshot = bool(snapshot_every) and (cycle == 1 or cycle % snapshot_every == 0)
+
+            def poll(api):
+                try:
+                    return api, _poll_panel(api, max_ages, states.get(api.panel_id), snapshot)
+                except Exception as e:
+                    return api, e
+
+            for api, outcome in executor.map(poll, clients):
+                if isinstance(outcome, Exception):
+                    send({"type": "error", "panel_id": api.panel_id, "timestamp": time.time(),
+                          "error": str(outcome)})
+                    continue
+                messages, states[api.panel_id] = outcome
+                for message in messages:
+                    send(message)
+
+            duration = time.monotonic() - start
+            send({"type": "metrics", "timestamp": time.time(), "cycle": cycle, "duration": round(duration, 3),
+                  "panels": len(clients), "metrics": metrics.snapshot()})
+            metrics.reset()
+            if options.get('cycles') and cycle >= options['cycles']:
+                break
+            stop.wait(max(0.0, interval - duration))
+    send({"type": "stopped", "timestamp": time.time(), "cycles": cycle})
+
+
+class ShardedPoller:
+    """Poll many panels from a pool of worker processes and aggregate their results.
+
+    :param panels: List of panel configurations ({'panel_id', 'email', 'password', 'panel_code'}).
+    :param shards: Number of worker processes, defaults to the number of CPUs.
+    :param interval: Seconds between polling cycles.
+    :param categories: Categories to poll, defaults to all.
+    :param snapshot_every: Send a full snapshot of each panel every N cycles (and on the first).
+    :param cycles: Stop after N cycles; None polls until stop() is called.
+    :param threads: Concurrent requests per worker process.
+    :param memory_budget: Byte limit on each worker's cached data.
+    """
+
+    def __init__(self, panels, shards=None, interval=DEFAULT_INTERVAL, categories=None,
+                 snapshot_every=None, cycles=None, threads=DEFAULT_THREADS_PER_SHARD, memory_budget=None):
+        self.shards = max(1, min(shards or os.cpu_count() or 1, len(panels) or 1))
+        self.partitions = partition(panels, self.shards)
+        self.options = {
+            'interval': interval,
+            'categories': categories,
+            'snapshot_every': snapshot_every,
+            'cycles': cycles,
+            'threads': threads,
+            'memory_budget': memory_budget,
+        }
+        # Spawned rather than forked workers do not inherit the parent's threads and locks
+        self.context = multiprocessing.get_context("spawn")
+        self.results = self.context.Queue()
+        self.stop_event = self.context.Event()
+        self.processes = []
+
+    def start(self):
+        """Start one worker process per non-empty shard."""
+        for shard, panels in enumerate(self.partitions):
+            if not panels:
+                continue
+            process = self.context.Process(
+                target=run_shard,
+                args=(shard, panels, self.options, self.results, self.stop_event),
+                name=f"sectoralarm-shard-{shard}",
+                daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+
+    def messages(self, timeout=None):
+        """
+        Yield messages from the workers until every worker has stopped.
+
+        :param timeout: Stop waiting after this many seconds without a message.
+        """
+        running = len(self.processes)
+        idle = 0.0
+        while running:
+            try:
+                message = self.results.get(timeout=1.0)
+            except queue.Empty:
+                idle += 1.0
+                # Workers that crashed never send their "stopped" message
+                if not any(process.is_alive() for process in self.processes):
+                    logger.error("Poller worker processes exited unexpectedly.")
+                    return
+                if timeout is not None and idle >= timeout:
+                    return
+                continue
+            idle = 0.0
+            if message["type"] == "stopped":
+                running -= 1
+            yield message
+
+    def stop(self, timeout=10):
+        """Ask the workers to stop and wait for them to exit."""
+        self.stop_event.set()
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class Aggregator:
+    """Combine worker messages into fleet-wide state and metrics.
+
+    :param shards: Number of workers; required to tell when a polling cycle is complete.
+    """
+
+    def __init__(self, shards=None):
+        self.shards = shards
+        self.states = {}  # {panel_id: {category: data}}, from snapshots and events
+        self.metrics = {}  # {shard: latest metrics message}
+        self.stopped = set()
+        self.cycle = 0  # Latest cycle every running worker has completed
+        self.errors = 0
+        self.events = 0
+
+    def add(self, message):
+        """
+        Apply one worker message.
+
+        :return: True if the message completes a polling cycle of every worker.
+        """
+        from .history import apply_delta
+
+        kind = message["type"]
+        if kind == "snapshot":
+            self.states[message["panel_id"]] = message["state"]
+        elif kind == "event":
+            self.events += 1
+            state = self.states.get(message["panel_id"])
+            if state is not None:
+                category = message["category"]
+                try:
+                    state[category] = apply_delta(state.get(category), message["changes"])
+                except (KeyError, IndexError, TypeError, ValueError) as e:
+                    # Wait for the next snapshot rather than keep a state that has diverged
+                    logger.warning(f"Dropping state of panel {message['panel_id']}: "
+                                   f"could not apply {category} changes ({e!r}).")
+                    del self.states[message["panel_id"]]
+        elif kind == "metrics":
+            self.metrics[message["shard"]] = message
+            return self._complete_cycle()
+        elif kind == "stopped":
+            self.stopped.add(message["shard"])
+            return self._complete_cycle()
+        elif kind == "error":
+            self.errors += 1
+        return False
+
+    def _complete_cycle(self):
+        if self.shards is None or len(self.stopped | set(self.metrics)) < self.shards:
+            return False
+        running = [message["cycle"] for shard, message in self.metrics.items() if shard not in self.stopped]
+        if not running:
+            return False
+        cycle = min(running)
+        if cycle <= self.cycle:
+            return False
+        self.cycle = cycle
+        return True
+
+    def summary(self):
+        """Return fleet-wide totals from the latest metrics of every shard."""
+        return {
+            "shards": len(self.metrics),
+            "panels": sum(message["panels"] for message in self.metrics.values()),
+            "slowest_cycle": max((message["duration"] for message in self.metrics.values()), default=0.0),
+            "events": self.events,
+            "errors": self.errors,
+        }
@@ -0,0 +1,69 @@
+# sectoralarm/singleflight.py
+
+import threading
+
+
+class _Call:
+    """A call in flight, shared by every caller of the same key."""
+
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into a single execution.
+
+    The first caller of a key runs the function; callers arriving while it is
+    in flight wait for it and receive the same result object (or exception), so
+    results must be treated as read-only. Once the
+    call completes the key is released, so later calls run again.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) unless a call for key is already in flight, and return its result."""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.event.set()
+        return call.result
+
+    async def do_async(self, key, fn, *args):
+        """Awaitable variant of do(), running the call in the event loop's default executor."""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: self.do(key, fn, *args))
+
+    def in_flight(self):
+        """Return the number of keys currently in flight."""
+        with self.lock:
+            return len(self.calls)
+
+
+# Group shared by every client in the process; clients key their calls by
+# client, so in_flight() reports the requests in flight across all of them
+default_group = SingleFlight()
@@ -0,0 +1,405 @@
+# sectoralarm/snapshot.py
+
+"""
+Compact, versioned binary snapshots of panel data.
+
+A snapshot file holds every category for one or more panels. Each category is
+serialized and compressed on its own, so a reader only decodes the categories
+it accesses, straight from a memory-mapped file.
+
+File layout (integers little-endian):
+
+    magic      6 bytes   b"SASNAP"
+    version    1 byte    SNAPSHOT_VERSION
+    codec      1 byte    serializer << 4 | compressor
+    index_len  4 bytes   length of the index
+    index      JSON      {"created": ..., "panels": {panel_id: {category: [offset, length]}}}
+    blobs      ...       one compressed, serialized blob per category; offsets are
+                         relative to the end of the index
+
+msgpack and zstandard are used when installed (pip install sectoralarm[snapshot]),
+otherwise the snapshot falls back to JSON and zlib from the standard library.
+"""
+
+import json
+import mmap
+import struct
+import time
+import zlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import CacheManager
+from .endpoints import data_categories
+from .hooks import HookDispatcher
+
+logger = logging.getLogger("SectorAlarmAPI")
+
+MAGIC = b"SASNAP"
+SNAPSHOT_VERSION = 1
+HEADER = struct.Struct("<6sBBI")
+
+SERIALIZER_JSON = 0
+SERIALIZER_MSGPACK = 1
+
+COMPRESSOR_NONE = 0
+COMPRESSOR_ZLIB = 1
+COMPRESSOR_ZSTD = 2
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 10
+
+
+class SnapshotError(Exception):
+    """Exception raised for unreadable or unsupported snapshot files."""
+    pass
+
+
+def _best_serializer():
+    try:
+        import msgpack  # noqa: F401
+        return SERIALIZER_MSGPACK
+    except ImportError:
+        return SERIALIZER_JSON
+
+
+def _best_compressor():
+    try:
+        import zstandard  # noqa: F401
+        return COMPRESSOR_ZSTD
+    except ImportError:
+        return COMPRESSOR_ZLIB
+
+
+def encode(data, serializer, compressor):
+    """Serialize and compress a value with the given codec."""
+    if serializer == SERIALIZER_MSGPACK:
+        import msgpack
+        raw = msgpack.packb(data, use_bin_type=True)
+    else:
+        raw = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    if compressor == COMPRESSOR_ZSTD:
+        import zstandard
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    elif compressor == COMPRESSOR_ZLIB:
+        return zlib.compress(raw, ZLIB_LEVEL)
+    return raw
+
+
+def check_codec(serializer, compressor):
+    """
+    Check that a codec is known and its packages are installed.
+
+    :raises SnapshotError: If the codec cannot be decoded here.
+    """
+    if serializer not in (SERIALIZER_JSON, SERIALIZER_MSGPACK) or \
+            compressor not in (COMPRESSOR_NONE, COMPRESSOR_ZLIB, COMPRESSOR_ZSTD):
+        raise SnapshotError(f"Unknown codec (serializer {serializer}, compressor {compressor}).")
+    required = []
+    if serializer == SERIALIZER_MSGPACK:
+        required.append("msgpack")
+    if compressor == COMPRESSOR_ZSTD:
+        required.append("zstandard")
+    for module in required:
+        try:
+            __import__(module)
+        except ImportError:
+            raise SnapshotError(f"Reading this file requires {module}: pip install sectoralarm[snapshot]")
+
+
+def decode(blob, serializer, compressor):
+    """
+    Decompress and deserialize a value encoded with encode().
+
+    :raises SnapshotError: If the blob is corrupt, or the codec's packages are not installed.
+    """
+    try:
+        if compressor == COMPRESSOR_ZSTD:
+            import zstandard
+            raw = zstandard.ZstdDecompressor().decompress(bytes(blob))
+        elif compressor == COMPRESSOR_ZLIB:
+            raw = zlib.decompress(blob)
+        else:
+            raw = bytes(blob)
+
+        if serializer == SERIALIZER_MSGPACK:
+            import msgpack
+            return msgpack.unpackb(raw, raw=False)
+        return json.loads(raw.decode('utf-8'))
+    except ImportError as e:
+        raise SnapshotError(f"Decoding requires {e.name}: pip install sectoralarm[snapshot]")
+    except Exception as e:
+        # zlib, zstandard, msgpack and json each raise their own errors for corrupt data
+        raise SnapshotError(f"Corrupt data: {e}") from e
+
+
+def write_snapshot(path, panels, serializer=None, compressor=None, created=None):
+    """
+    Write panel data to a snapshot file.
+
+    :param path: Destination file path.
+    :param panels: Dictionary of {panel_id: {category: data}}.
+    :param serializer: SERIALIZER_* constant, or None for the best available.
+    :param compressor: COMPRESSOR_* constant, or None for the best available.
+    :param created: Capture timestamp, defaults to now.
+    :return: Size of the written file in bytes.
+    """
+    if serializer is None:
+        serializer = _best_serializer()
+    if compressor is None:
+        compressor = _best_compressor()
+
+    index = {"created": time.time() if created is None else created, "panels": {}}
+    blobs = []
+    offset = 0
+    for panel_id, categories in panels.items():
+        panel_index = index["panels"][str(panel_id)] = {}
+        for category, data in categories.items():
+            blob = encode(data, serializer, compressor)
+            panel_index[category] = [offset, len(blob)]
+            blobs.append(blob)
+            offset += len(blob)
+
+    index_bytes = json.dumps(index, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, SNAPSHOT_VERSION, serializer << 4 | compressor, len(index_bytes)))
+        f.write(index_bytes)
+        for blob in blobs:
+            f.write(blob)
+    return HEADER.size + len(index_bytes) + offset
+
+
+def capture_panel(api, workers=4):
+    """
+    Retrieve every category for a panel.
+
+    :param api: Logged in SectorAlarmAPI instance.
+    :param workers: Number of categories retrieved concurrently.
+    :return: Dictionary of {category: data}, omitting categories that failed.
+    """
+    categories = data_categories()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(api.retrieve_category_data, categories))
+    return {category: data for category, data in zip(categories, results) if data is not None}
+
+
+def capture_snapshot(apis, path, workers=4):
+    """
+    Capture every category of one or more panels into a snapshot file.
+
+    :param apis: Iterable of logged in SectorAlarmAPI instances.
+    :param path: Destination file path.
+    :param workers: Number of categories retrieved concurrently per panel.
+    :return: Size of the written file in bytes.
+    """
+    panels = {api.panel_id: capture_panel(api, workers) for api in apis}
+    return write_snapshot(path, panels)
+
+
+class Snapshot:
+    """A read-only, memory-mapped snapshot file that decodes categories on access."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise SnapshotError(f"Snapshot '{path}' is empty.")
+        self._decoded = {}
+
+        if len(self._map) < HEADER.size:
+            self.close()
+            raise SnapshotError(f"Snapshot '{path}' is truncated.")
+        magic, version, codec, index_len = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise SnapshotError(f"'{path}' is not a snapshot file.")
+        if version > SNAPSHOT_VERSION:
+            self.close()
+            raise SnapshotError(f"Snapshot version {version} is not supported (maximum {SNAPSHOT_VERSION}).")
+        self.version = version
+        self.serializer = codec >> 4
+        self.compressor = codec & 0x0F
+        try:
+            check_codec(self.serializer, self.compressor)
+            self._read_index(index_len)
+        except SnapshotError as e:
+            self.close()
+            raise SnapshotError(f"Snapshot '{path}': {e}")
+
+    def _read_index(self, index_len):
+        """Parse the index and check that every blob lies within the file."""
+        index_end = HEADER.size + index_len
+        if index_end > len(self._map):
+            raise SnapshotError("The index is truncated.")
+        try:
+            index = json.loads(self._map[HEADER.size:index_end].decode('utf-8'))
+            created, panels = index["created"], index["panels"]
+        except (ValueError, TypeError, KeyError) as e:
+            raise SnapshotError(f"The index is corrupt ({e}).")
+        if not isinstance(panels, dict) or not all(isinstance(categories, dict) for categories in panels.values()):
+            raise SnapshotError("The index is corrupt.")
+        data_length = len(self._map) - index_end
+        for categories in panels.values():
+            for category, location in categories.items():
+                if not (isinstance(location, list) and len(location) == 2
+                        and all(isinstance(x, int) and not isinstance(x, bool) and x >= 0 for x in location)):
+                    raise SnapshotError(f"The index entry of {category} is corrupt.")
+                if location[0] + location[1] > data_length:
+                    raise SnapshotError(f"The data of {category} is truncated.")
+        self.created = created
+        self.index = panels
+        self._data_start = index_end
+
+    def panels(self):
+        """Return the panel IDs in the snapshot."""
+        return list(self.index)
+
+    def categories(self, panel_id):
+        """Return the categories captured for a panel, in capture order."""
+        return list(self.index.get(str(panel_id), {}))
+
+    def get(self, panel_id, category):
+        """
+        Return the data for a category, decoding it on first access.
+
+        :return: The category data, or None if it is not in the snapshot.
+        """
+        key = (str(panel_id), category)
+        if key in self._decoded:
+            return self._decoded[key]
+        location = self.index.get(key[0], {}).get(category)
+        if location is None:
+            return None
+        offset, length = location
+        start = self._data_start + offset
+        try:
+            # Released on exit even when decoding fails, so that the map can still be closed
+            with memoryview(self._map) as view, view[start:start + length] as blob:
+                data = decode(blob, self.serializer, self.compressor)
+        except SnapshotError as e:
+            raise SnapshotError(f"Snapshot '{self.path}', {category}: {e}")
+        self._decoded[key] = data
+        return data
+
+    def load_panel(self, panel_id):
+        """Return every category for a panel as {category: data}."""
+        return {category: self.get(panel_id, category) for category in self.categories(panel_id)}
+
+    def close(self):
+        self._decoded = {}
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SnapshotCacheManager(CacheManager):
+    """Cache manager serving categories from a snapshot instead of the API."""
+
+    def load_cache(self):
+        """List the snapshot's categories without decoding them."""
+        self.cache = {category: None for category in self.api.snapshot.categories(self.api.panel_id)}
+
+    def save_cache(self):
+        """Snapshots are read-only; nothing is persisted."""
+
+
+class OfflineActionsManager:
+    """Stand-in for ActionsManager when working from a snapshot."""
+
+    def __init__(self, api):
+        self.api = api
+
+    def _unavailable(self, *args, **kwargs):
+        logger.error("Actions are not available when working from a snapshot.")
+        return False
+
+    def _unavailable_bulk(self, *args, **kwargs):
+        self._unavailable()
+        return None
+
+    lock_door = unlock_door = arm_system = disarm_system = _unavailable
+    arm_partial = arm_annex = disarm_annex = _unavailable
+    turn_on_smartplug = turn_off_smartplug = set_smartplug = _unavailable
+    lock_all = unlock_all = set_smartplugs = _unavailable_bulk
+
+    def get_system_status(self):
+        return self.api.retrieve_category_data("Panel Status")
+
+
+class SnapshotAPI:
+    """Offline, read-only stand-in for SectorAlarmAPI backed by a snapshot.
+
+    Supports everything the interactive navigator and the OID resolver need.
+    """
+
+    def __init__(self, snapshot, panel_id=None):
+        # A snapshot opened from a path belongs to this instance and is closed by close()
+        self._owns_snapshot = not isinstance(snapshot, Snapshot)
+        if self._owns_snapshot:
+            snapshot = Snapshot(snapshot)
+        if panel_id is None:
+            panels = snapshot.panels()
+            if not panels:
+                self._close_owned(snapshot)
+                raise SnapshotError(f"Snapshot '{snapshot.path}' contains no panels.")
+            panel_id = panels[0]
+        elif str(panel_id) not in snapshot.index:
+            self._close_owned(snapshot)
+            raise SnapshotError(f"Panel {panel_id} is not in snapshot '{snapshot.path}'.")
+        self.snapshot = snapshot
+        self.panel_id = str(panel_id)
+        self.panel_code = None
+        self.mask_sensitive = False
+        self.hooks = HookDispatcher()
+        self.cache_manager = SnapshotCacheManager(self, cache_file=snapshot.path)
+        self.actions_manager = OfflineActionsManager(self)
+
+    def _close_owned(self, snapshot):
+        if self._owns_snapshot:
+            snapshot.close()
+
+    def close(self):
+        """Close the snapshot file, unless it was passed in already open."""
+        self._close_owned(self.snapshot)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def login(self):
+        """No authentication is needed offline."""
+
+    def retrieve_category_data(self, category):
+        """Return the snapshot data for a category."""
+        data = self.snapshot.get(self.panel_id, category)
+        if data is None:
+            logger.error(f"Category {category} is not in the snapshot.")
+            return None
+        return self.cache_manager.store(category, data)
+
+    def get_category_data(self, category, max_age=None):
+        """Return the snapshot data for a category; it never changes, so max_age is ignored."""
+        data = self.cache_manager.get_data(category)
+        if data is None:
+            data = self.retrieve_category_data(category)
+        return data
+
+    def search(self, query, category=None, limit=None):
+        """Search the snapshot data of this panel, see CacheManager.search()."""
+        for name in ([category] if category else self.snapshot.categories(self.panel_id)):
+            if self.cache_manager.get_data(name) is None:
+                self.retrieve_category_data(name)
+        return self.cache_manager.search(query, category, limit)
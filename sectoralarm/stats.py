@@ -0,0 +1,209 @@
+# sectoralarm/stats.py
+
+"""
+Structure statistics over cached panel data.
+
+StatisticsEngine walks {panel_id: {category: data}} iteratively in a single
+pass over every node, counting per category, per section and per device
+type, measuring payload sizes and depths, and, across successive updates,
+how often values change. It works for one panel's cache or a whole fleet.
+"""
+
+import threading
+from json.encoder import encode_basestring
+
+# Keys holding the navigation hierarchy, see category_navigation.json
+SECTIONS_KEY = "Sections"
+PLACES_KEY = "Places"
+COMPONENTS_KEY = "Components"
+
+# Component fields naming the device type, in order of preference
+DEVICE_TYPE_FIELDS = ("Type", "DeviceType", "ComponentType")
+IDENTIFIER_FIELDS = ("Name", "Label", "Id", "Key")
+
+
+def flatten(data):
+    """
+    Iterate over every node of a data structure without recursion.
+
+    :param data: The data structure (dict, list or value).
+    :return: Iterator of (path, depth, value) tuples, parents before children.
+    """
+    stack = [((), data)]
+    while stack:
+        path, value = stack.pop()
+        yield path, len(path), value
+        if isinstance(value, dict):
+            stack.extend((path + (key,), item) for key, item in reversed(list(value.items())))
+        elif isinstance(value, list):
+            stack.extend((path + (index,), item) for index, item in reversed(list(enumerate(value))))
+
+
+def _json_size(value):
+    """Size in bytes of a value in compact JSON, as json.dumps(ensure_ascii=False) would write it."""
+    if isinstance(value, str):
+        return len(encode_basestring(value).encode('utf-8'))
+    if value is None or value is True:
+        return 4
+    if value is False:
+        return 5
+    if isinstance(value, float) and value != value:
+        return 3  # NaN
+    if isinstance(value, float) and value in (float("inf"), float("-inf")):
+        return 8 if value > 0 else 9  # Infinity, -Infinity
+    return len(repr(value))
+
+
+def _container_size(value):
+    """Size of a container's own JSON punctuation and keys, excluding its values."""
+    if not value:
+        return 2
+    size = 2 + len(value) - 1
+    if isinstance(value, dict):
+        size += sum(_json_size(key if isinstance(key, str) else str(key)) + 1 for key in value)
+    return size
+
+
+def _identifier(item):
+    for field in IDENTIFIER_FIELDS:
+        if item.get(field):
+            return str(item[field])
+    return "Item"
+
+
+def _device_type(component, category):
+    for field in DEVICE_TYPE_FIELDS:
+        if component.get(field) not in (None, ""):
+            return str(component[field])
+    return category
+
+
+def _category_counters():
+    return {
+        "panels": 0, "sections": 0, "places": 0, "components": 0,
+        "keys": 0, "items": 0, "leaves": 0, "bytes": 0, "max_depth": 0,
+        "changes": 0, "updates": 0, "change_rate": 0.0,
+    }
+
+
+class StatisticsEngine:
+    """Compute structure statistics, tracking value changes between updates.
+
+    :param track_changes: Remember a fingerprint of every value so that later
+                          updates can count how many values changed.
+    """
+
+    def __init__(self, track_changes=True):
+        self.track_changes = track_changes
+        self.lock = threading.Lock()
+        self.fingerprints = {}  # {(panel_id, category): {path: hash}}
+        self.changes = {}  # {category: values changed over all updates}
+        self.updates = {}  # {category: number of updates compared}
+
+    def update(self, panels, untracked=()):
+        """
+        Compute statistics for the given panels.
+
+        :param panels: Dictionary of {panel_id: {category: data}}.
+        :param untracked: Categories counted without tracking their changes, e.g. structure placeholders.
+        :return: JSON-serializable statistics report.
+        """
+        totals = {"panels": len(panels), "categories": 0, "sections": 0, "places": 0,
+                  "components": 0, "keys": 0, "items": 0, "leaves": 0, "bytes": 0}
+        categories = {}
+        sections = {}
+        device_types = {}
+        depth_histogram = {}
+
+        with self.lock:
+            for panel_id, panel in panels.items():
+                for category, data in panel.items():
+                    if data is None:
+                        continue
+                    counters = categories.get(category)
+                    if counters is None:
+                        counters = categories[category] = _category_counters()
+                    counters["panels"] += 1
+
+                    track = self.track_changes and category not in untracked
+                    previous = self.fingerprints.get((panel_id, category)) if track else None
+                    current = {} if track else None
+                    changed = 0
+
+                    # Section, place and component context of each node, keyed by its path
+                    context = {(): None}
+                    for path, depth, value in flatten(data):
+                        depth_histogram[depth] = depth_histogram.get(depth, 0) + 1
+                        if depth > counters["max_depth"]:
+                            counters["max_depth"] = depth
+                        section = context.get(path[:-1]) if path else None
+                        if isinstance(value, dict):
+                            counters["keys"] += len(value)
+                            counters["bytes"] += _container_size(value)
+                            if len(path) >= 2 and isinstance(path[-1], int):
+                                container = path[-2]
+                                if container == SECTIONS_KEY:
+                                    section = f"{category} > {_identifier(value)}"
+                                    counters["sections"] += 1
+                                    sections.setdefault(section, {"places": 0, "components": 0})
+                                elif container == PLACES_KEY:
+                                    counters["places"] += 1
+                                    if section is not None:
+                                        sections[section]["places"] += 1
+                                elif container == COMPONENTS_KEY:
+                                    counters["components"] += 1
+                                    if section is not None:
+                                        sections[section]["components"] += 1
+                                    device_type = _device_type(value, category)
+                                    device_types[device_type] = device_types.get(device_type, 0) + 1
+                            context[path] = section
+                        elif isinstance(value, list):
+                            counters["items"] += len(value)
+                            counters["bytes"] += _container_size(value)
+                            context[path] = section
+                        else:
+                            counters["leaves"] += 1
+                            counters["bytes"] += _json_size(value)
+                            if current is not None:
+                                # Strings are remembered by hash to bound memory; other values as is
+                                fingerprint = hash(value) if isinstance(value, str) else value
+                                current[path] = fingerprint
+                                if previous is not None and previous.get(path) != fingerprint:
+                                    changed += 1
+
+                    if current is not None:
+                        if previous is not None:
+                            # Values that disappeared also count as changes
+                            changed += sum(1 for path in previous if path not in current)
+                            self.changes[category] = self.changes.get(category, 0) + changed
+                            self.updates[category] = self.updates.get(category, 0) + 1
+                        self.fingerprints[(panel_id, category)] = current
+
+            for category, counters in categories.items():
+                counters["changes"] = self.changes.get(category, 0)
+                counters["updates"] = self.updates.get(category, 0)
+                if counters["updates"]:
+                    counters["change_rate"] = round(counters["changes"] / counters["updates"], 3)
+                totals["categories"] += 1
+                for key in ("sections", "places", "components", "keys", "items", "leaves", "bytes"):
+                    totals[key] += counters[key]
+
+        return {
+            "totals": totals,
+            "categories": categories,
+            "sections": sections,
+            "device_types": dict(sorted(device_types.items(), key=lambda item: -item[1])),
+            "depth_histogram": dict(sorted(depth_histogram.items())),
+        }
+
+    def reset(self):
+        """Forget the values remembered for change tracking."""
+        with self.lock:
+            self.fingerprints = {}
+            self.changes = {}
+            self.updates = {}
+
+
+def collect(panels):
+    """Compute statistics for {panel_id: {category: data}} without change tracking."""
+    return StatisticsEngine(track_changes=False).update(panels)
@@ -0,0 +1,187 @@
+# sectoralarm/transport.py
+
+import threading
+import logging
+
+logger = logging.getLogger("SectorAlarmAPI")
+
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 32
+DEFAULT_KEEPALIVE_EXPIRY = 60.0
+
+
+class TransportPool:
+    """A shared HTTP session with tuned connection pooling.
+
+    Every SectorAlarmAPI (and its ActionsManager) using the same pool sends its
+    requests over the same set of kept-alive connections, so TLS handshakes and
+    DNS lookups are paid once per connection rather than once per client.
+
+    :param pool_connections: Number of per-host connection pools to keep.
+    :param pool_maxsize: Maximum number of connections kept per host.
+    :param pool_block: Block when all connections are busy instead of opening extra, unpooled ones.
+    :param keep_alive: Keep connections open between requests.
+    :param max_retries: Number of retries on connection errors.
+    :param http2: Use HTTP/2 through httpx (requires the 'http2' extra). Network errors
+                  are raised as the equivalent requests exceptions, see HTTP2Session.
+    :param keepalive_expiry: Seconds an idle HTTP/2 connection is kept open.
+    """
+
+    def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 pool_block=False, keep_alive=True, max_retries=0, http2=False,
+                 keepalive_expiry=DEFAULT_KEEPALIVE_EXPIRY):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.max_retries = max_retries
+        self.http2 = http2
+        self.keepalive_expiry = keepalive_expiry
+        self.lock = threading.Lock()
+        self._session = None
+        self._adapter = None
+
+    @property
+    def session(self):
+        """The shared session, created on first use."""
+        if self._session is None:
+            with self.lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def _create_session(self):
+        if self.http2:
+            try:
+                import httpx
+            except ImportError:
+                raise ImportError("HTTP/2 support requires httpx: pip install sectoralarm[http2]")
+            limits = httpx.Limits(
+                # Without pool_block, busy connections are supplemented by extra ones that are closed after use
+                max_connections=self.pool_maxsize * self.pool_connections if self.pool_block else None,
+                max_keepalive_connections=self.pool_maxsize if self.keep_alive else 0,
+                keepalive_expiry=self.keepalive_expiry,
+            )
+            transport = httpx.HTTPTransport(http2=True, limits=limits, retries=self.max_retries)
+            return HTTP2Session(httpx.Client(transport=transport))
+
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        self._adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block,
+            max_retries=self.max_retries,
+        )
+        session.mount("https://", self._adapter)
+        session.mount("http://", self._adapter)
+        if not self.keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+    def stats(self):
+        """
+        Return connection reuse metrics.
+
+        :return: Dictionary with the number of requests sent, connections opened,
+                 requests served over a reused connection and the reuse ratio.
+                 Counts are not available for HTTP/2 sessions.
+        """
+        stats = {"requests": 0, "connections": 0, "reused": 0, "reuse_ratio": 0.0, "pools": 0}
+        if self._adapter is None:
+            return stats
+        pools = self._adapter.poolmanager.pools
+        connection_pools = [pool for pool in map(pools.get, pools.keys()) if pool is not None]
+        for pool in connection_pools:
+            stats["requests"] += pool.num_requests
+            stats["connections"] += pool.num_connections
+        stats["pools"] = len(connection_pools)
+        if not self.keep_alive:
+            # urllib3 reconnects a closed connection in place without counting it
+            stats["connections"] = stats["requests"]
+        stats["reused"] = max(0, stats["requests"] - stats["connections"])
+        if stats["requests"]:
+            stats["reuse_ratio"] = round(stats["reused"] / stats["requests"], 3)
+        return stats
+
+    def close(self):
+        """Close the shared session and its connections."""
+        with self.lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+            self._adapter = None
+
+
+class HTTP2Session:
+    """An httpx client behind the part of the requests.Session interface the clients use.
+
+    httpx errors are not OSErrors; they are raised as the equivalent requests
+    exceptions, so they are retried and reported like any other connection failure.
+
+    :param client: The httpx.Client sending the requests.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def request(self, method, url, **kwargs):
+        import httpx
+        from requests import exceptions
+
+        try:
+            return self.client.request(method, url, **kwargs)
+        except httpx.ConnectTimeout as e:
+            raise exceptions.ConnectTimeout(str(e)) from e
+        except httpx.ReadTimeout as e:
+            raise exceptions.ReadTimeout(str(e)) from e
+        except httpx.TimeoutException as e:
+            raise exceptions.Timeout(str(e)) from e
+        except httpx.TransportError as e:
+            raise exceptions.ConnectionError(str(e)) from e
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        self.client.close()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool():
+    """Return the process-wide transport pool used by clients that are not given one."""
+    global _default_pool
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = TransportPool()
+    return _default_pool
+
+
+def configure_default_pool(**kwargs):
+    """Replace the process-wide transport pool with one built from the given options.
+
+    Only clients created afterwards use the new pool.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        previous, _default_pool = _default_pool, TransportPool(**kwargs)
+    if previous is not None:
+        logger.info("Default transport pool reconfigured.")
+    return _default_pool
+
+
+def set_default_pool(pool):
+    """Use the given transport, e.g. a replay transport, for clients that are not given one."""
+    global _default_pool
+    with _default_pool_lock:
+        _default_pool = pool
+    return pool
@@ -0,0 +1,297 @@
+# sectoralarm/tui.py
+
+"""
+Full-screen terminal interface with background refresh.
+
+Every category is retrieved in the background by a DataUpdateCoordinator,
+concurrently and again every interval. Screens are drawn from the data
+already retrieved, so navigating never waits on the network, and values on
+screen update as new data arrives. Categories served from stale data while
+the API is unavailable are marked with their age.
+
+Keys:
+
+    Up/Down, j/k, PgUp/PgDn   Move
+    Enter, Right, l           Open the selected item
+    Left, Backspace, h        Back
+    r                         Refresh now
+    q                         Quit
+"""
+
+import json
+import threading
+import time
+import logging
+
+from .coordinator import DataUpdateCoordinator
+from .main import find_data_at_path, get_navigable_items, mask_sensitive_data
+from .query import available_categories
+
+logger = logging.getLogger("SectorAlarmAPI")
+
+DEFAULT_INTERVAL = 60
+FRAME_INTERVAL_MS = 250  # Keys and new data are picked up this often
+REDRAW_INTERVAL = 1.0  # Ages and categories arriving one by one are redrawn this often while idle
+
+PANEL_STATUS_LABELS = {1: "Disarmed", 2: "Partially armed", 3: "Armed"}
+IDENTIFIER_FIELDS = ('Name', 'Label', 'Id', 'Key')  # As in main.get_identifier
+SUMMARY_FIELDS = 3
+
+KEYS_UP = (ord('k'),)
+KEYS_DOWN = (ord('j'),)
+KEYS_OPEN = (10, 13, ord('l'))
+KEYS_BACK = (8, 127, ord('h'))
+
+
+def format_age(seconds):
+    """Return an age such as '12s', '5m' or '2h'."""
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f}m"
+    return f"{seconds / 3600:.0f}h"
+
+
+def summarize(item, mask=False):
+    """Return the first few scalar fields of an item as a one-line summary."""
+    if not isinstance(item, dict):
+        return ""
+    fields = []
+    for key, value in item.items():
+        if key in IDENTIFIER_FIELDS or isinstance(value, (dict, list)):
+            continue
+        if mask:
+            value = mask_sensitive_data({key: value})[key]
+        fields.append(f"{key}: {value}")
+        if len(fields) == SUMMARY_FIELDS:
+            break
+    return "  ".join(fields)
+
+
+class StatusHandler(logging.Handler):
+    """Show the latest library warning in the status line instead of writing over the screen."""
+
+    def __init__(self, tui):
+        super().__init__(logging.WARNING)
+        self.tui = tui
+
+    def emit(self, record):
+        self.tui.message = record.getMessage()
+        self.tui.dirty.set()
+
+
+class Tui:
+    """State and drawing of the terminal interface.
+
+    :param api: Logged in SectorAlarmAPI, or a SnapshotAPI.
+    :param interval: Seconds between background refreshes.
+    """
+
+    def __init__(self, api, interval=DEFAULT_INTERVAL):
+        self.api = api
+        self.mask = getattr(api, 'mask_sensitive', False)
+        self.categories = available_categories(api)
+        self.coordinator = DataUpdateCoordinator(api, interval, self.categories, workers=len(self.categories) or 1)
+        self.path = []  # [category, identifier, ...]
+        self.cursors = [0]  # Selected row per level
+        self.scroll = 0  # First line shown of a leaf
+        self.message = ""
+        self.dirty = threading.Event()
+        self.refreshing = threading.Lock()
+        self.coordinator.add_listener(self.dirty.set)
+
+    # Data, always read from the cache
+
+    def entry(self, category):
+        return self.api.cache_manager.get_entry(category)
+
+    def node(self):
+        """Return the data at the current path, or None if it is not retrieved (yet)."""
+        entry = self.entry(self.path[0])
+        if entry is None:
+            return None
+        return find_data_at_path(entry.data, self.path[1:], self.path[0])
+
+    def rows(self):
+        """
+        Return the current screen as (rows, lines).
+
+        rows are (label, detail, openable) tuples for a list screen; lines is the
+        JSON of a leaf, or None.
+        """
+        if not self.path:
+            rows = []
+            for category in self.categories:
+                entry = self.entry(category)
+                if entry is None:
+                    detail = "loading..." if self.coordinator.refreshes == 0 else "not available"
+                else:
+                    size = len(entry.data) if isinstance(entry.data, (list, dict)) else 1
+                    detail = f"{size} items, {format_age(entry.age)} ago"
+                    if entry.stale:
+                        detail += " (stale)"
+                rows.append((category, detail, entry is not None))
+            return rows, None
+
+        node = self.node()
+        if node is None:
+            return [], ["Not available; it may have been removed."]
+        items = get_navigable_items(node, self.path[0], len(self.path) - 1)
+        if not items:
+            data = mask_sensitive_data(node) if self.mask else node
+            return [], json.dumps(data, indent=2, ensure_ascii=False).splitlines()
+        return [(identifier, summarize(item, self.mask), True) for identifier, item in items], None
+
+    def header(self):
+        status = self.entry("Panel Status")
+        state = "Unknown"
+        if status is not None and isinstance(status.data, dict):
+            state = PANEL_STATUS_LABELS.get(status.data.get("Status"), str(status.data.get("Status")))
+        refreshed = self.coordinator.last_update
+        age = f"updated {format_age(time.time() - refreshed)} ago" if refreshed else "loading..."
+        if self.refreshing.locked():
+            age = "refreshing..."
+        return f"Sector Alarm {self.api.panel_id} | {state} | {age}"
+
+    # Actions
+
+    def refresh_now(self):
+        """Refresh every category in the background, unless a manual refresh is already running."""
+        def refresh():
+            if not self.refreshing.acquire(blocking=False):
+                return
+            try:
+                self.coordinator.refresh()
+            except Exception as e:
+                self.message = f"Refresh failed: {e}"
+            finally:
+                self.refreshing.release()
+                self.dirty.set()
+
+        threading.Thread(target=refresh, name="sectoralarm-tui-refresh", daemon=True).start()
+
+    def open(self, rows):
+        if rows and rows[self.cursors[-1]][2]:
+            self.path.append(rows[self.cursors[-1]][0])
+            self.cursors.append(0)
+            self.scroll = 0
+
+    def back(self):
+        if self.path:
+            self.path.pop()
+            self.cursors.pop()
+            self.scroll = 0
+
+    def handle_key(self, key, rows, lines, height):
+        """Apply a key press; return False to quit."""
+        import curses
+
+        page = max(1, height - 3)
+        if key == ord('q'):
+            return False
+        if key == ord('r'):
+            self.refresh_now()
+        elif key in KEYS_OPEN or key in (curses.KEY_ENTER, curses.KEY_RIGHT):
+            self.open(rows)
+        elif key in KEYS_BACK or key in (curses.KEY_BACKSPACE, curses.KEY_LEFT):
+            self.back()
+        elif lines is not None:
+            moves = {curses.KEY_UP: -1, curses.KEY_DOWN: 1, curses.KEY_PPAGE: -page, curses.KEY_NPAGE: page}
+            step = moves.get(key, -1 if key in KEYS_UP else 1 if key in KEYS_DOWN else 0)
+            self.scroll = max(0, min(self.scroll + step, len(lines) - page))
+        elif rows:
+            moves = {curses.KEY_UP: -1, curses.KEY_DOWN: 1, curses.KEY_PPAGE: -page, curses.KEY_NPAGE: page,
+                     curses.KEY_HOME: -len(rows), curses.KEY_END: len(rows)}
+            step = moves.get(key, -1 if key in KEYS_UP else 1 if key in KEYS_DOWN else 0)
+            self.cursors[-1] = max(0, min(self.cursors[-1] + step, len(rows) - 1))
+        return True
+
+    # Drawing
+
+    def draw(self, screen, rows, lines):
+        import curses
+
+        screen.erase()
+        height, width = screen.getmaxyx()
+
+        def put(y, text, attr=0):
+            if 0 <= y < height:
+                try:
+                    screen.addnstr(y, 0, text.ljust(width), width - 1, attr)
+                except curses.error:
+                    pass
+
+        put(0, self.header(), curses.A_REVERSE)
+        location = " > ".join(self.path) or "Categories"
+        entry = self.entry(self.path[0]) if self.path else None
+        if entry is not None and entry.stale:
+            location += f"  (stale, {format_age(entry.age)} old)"
+        put(1, location, curses.A_BOLD)
+        page = max(1, height - 3)
+        if lines is not None:
+            for offset, line in enumerate(lines[self.scroll:self.scroll + page]):
+                put(2 + offset, line)
+        else:
+            if rows:
+                self.cursors[-1] = min(self.cursors[-1], len(rows) - 1)
+            cursor = self.cursors[-1]
+            first = max(0, cursor - page + 1)
+            label_width = max([len(label) for label, _, _ in rows] + [0]) + 2
+            for offset, (label, detail, _) in enumerate(rows[first:first + page]):
+                selected = first + offset == cursor
+                put(2 + offset, f" {label.ljust(label_width)}{detail}", curses.A_REVERSE if selected else 0)
+        footer = self.message or "Enter open  Left back  r refresh  q quit"
+        put(height - 1, footer, curses.A_DIM)
+        screen.refresh()
+
+    def run(self, screen):
+        """Draw and handle keys until 'q' is pressed; data arrives in the background meanwhile."""
+        import curses
+
+        try:
+            curses.curs_set(0)
+        except curses.error:
+            pass
+        screen.keypad(True)
+        screen.timeout(FRAME_INTERVAL_MS)
+        drawn = 0.0
+        key = None
+        while True:
+            if key is not None or self.dirty.is_set() or time.monotonic() - drawn >= REDRAW_INTERVAL:
+                self.dirty.clear()
+                rows, lines = self.rows()
+                self.draw(screen, rows, lines)
+                drawn = time.monotonic()
+            key = screen.getch()
+            if key == -1:
+                key = None
+                continue
+            self.message = ""
+            if not self.handle_key(key, rows, lines, screen.getmaxyx()[0]):
+                return
+
+
+def run_tui(api, interval=DEFAULT_INTERVAL):
+    """
+    Run the terminal interface until the user quits.
+
+    :param api: Logged in SectorAlarmAPI, or a SnapshotAPI.
+    :param interval: Seconds between background refreshes.
+    """
+    try:
+        import curses
+    except ImportError:
+        raise ImportError("The terminal interface requires curses; on Windows: pip install windows-curses")
+
+    tui = Tui(api, interval)
+    handler = StatusHandler(tui)
+    propagate = logger.propagate
+    logger.addHandler(handler)
+    logger.propagate = False
+    tui.coordinator.start()
+    try:
+        curses.wrapper(tui.run)
+    finally:
+        tui.coordinator.stop(wait=False)
+        logger.removeHandler(handler)
+        logger.propagate = propagate
@@ -1,5 +1,8 @@
 # sectoralarm/utils.py
 
+import sys
+
+
 def extract_structure(data, key_path=[]):
     """Recursively extract the structure of the data, replacing values with None, but keeping identifiers.
     For the 'Logs' category, we return the data as is to preserve all log entries and their fields.
@@ -24,3 +27,50 @@ def extract_structure(data, key_path=[]):
         return [extract_structure(item, key_path) for item in data]
     else:
         return None
+
+
+# String values worth interning: labels and names repeat across panels and polls
+INTERNED_FIELDS = {'name', 'label', 'type', 'devicetype', 'room', 'eventtype', 'user', 'status'}
+
+
+def compact(data, interned_fields=INTERNED_FIELDS):
+    """Return a copy of the data with dictionary keys and repeated label values interned.
+
+    Interned strings are shared between every response holding them, so keeping
+    many parsed responses costs one copy of each key rather than one per response.
+    """
+    if isinstance(data, dict):
+        compacted = {}
+        for key, value in data.items():
+            if isinstance(key, str):
+                key = sys.intern(key)
+            if isinstance(value, str):
+                if key.lower() in interned_fields:
+                    value = sys.intern(value)
+                compacted[key] = value
+            else:
+                compacted[key] = compact(value, interned_fields)
+        return compacted
+    elif isinstance(data, list):
+        return [compact(item, interned_fields) for item in data]
+    else:
+        return data
+
+
+def estimate_size(data):
+    """Estimate the memory used by a data structure, in bytes, counting shared objects once."""
+    seen = set()
+    total = 0
+    stack = [data]
+    while stack:
+        obj = stack.pop()
+        if obj is None or obj is True or obj is False or id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, list):
+            stack.extend(obj)
+    return total
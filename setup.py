@@ -4,9 +4,16 @@ setup(
     name='sectoralarm',
     version='1.2.0',
     packages=find_packages(),
+    package_data={
+        'sectoralarm': ['category_navigation.json'],
+    },
     install_requires=[
         'requests',
     ],
+    extras_require={
+        'http2': ['httpx[http2]'],
+        'snapshot': ['msgpack', 'zstandard'],
+    },
     author='Jonathan Petersson',
     author_email='jpetersson@garnser.se',
     description='A Python library for interacting with the Sector Alarm API.',
@@ -16,5 +23,5 @@ setup(
         'License :: OSI Approved :: MIT License',
         'Operating System :: OS Independent',
     ],
-    python_requires='>=3.6',
+    python_requires='>=3.7',
 )
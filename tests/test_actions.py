@@ -0,0 +1,154 @@
+# tests/test_actions.py
+
+import pytest
+
+from sectoralarm import actions
+from sectoralarm.actions import ActionsManager, arm_many, run_bulk
+from sectoralarm.hooks import HookDispatcher
+
+
+class FakeResponse:
+    text = ""
+
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+
+
+class FakeCacheManager:
+    def is_stale(self, category):
+        return False
+
+
+class FakePanelAPI:
+    """Applies actions to an in-memory panel; the new state shows up one poll later, like the real panel."""
+
+    def __init__(self, panel_id="123456", locks=(), plugs=(), status_code=200):
+        self.panel_id = panel_id
+        self.panel_code = "1234"
+        self.hooks = HookDispatcher()
+        self.cache_manager = FakeCacheManager()
+        self.status_code = status_code
+        self.calls = []
+        self.polls = 0
+        self.state = {
+            "Panel Status": {"Status": actions.PANEL_STATUS_DISARMED},
+            "Lock Status": [dict(lock) for lock in locks],
+            "Smartplug Status": [dict(plug) for plug in plugs],
+        }
+        self.pending = []
+
+    def call(self, name, payload):
+        self.calls.append((name, payload))
+        if self.status_code == 200:
+            self.pending.append((name, payload))
+        return FakeResponse(self.status_code), None
+
+    def retrieve_category_data(self, category):
+        self.polls += 1
+        data = self.state[category]
+        for name, payload in self.pending:
+            self.apply(name, payload)
+        self.pending = []
+        return data
+
+    def apply(self, name, payload):
+        panel_statuses = {
+            "Arm": actions.PANEL_STATUS_ARMED,
+            "PartialArm": actions.PANEL_STATUS_PARTIALLY_ARMED,
+            "Disarm": actions.PANEL_STATUS_DISARMED,
+        }
+        lock_statuses = {"Lock": actions.LOCK_STATUS_LOCKED, "Unlock": actions.LOCK_STATUS_UNLOCKED}
+        plug_statuses = {"TurnOnSmartplug": "On", "TurnOffSmartplug": "Off"}
+        if name in panel_statuses:
+            self.state["Panel Status"] = {"Status": panel_statuses[name]}
+        for lock in self.state["Lock Status"]:
+            if name in lock_statuses and str(lock.get("Serial") or lock.get("SerialNo")) == payload["LockSerial"]:
+                lock["Status"] = lock_statuses[name]
+        for plug in self.state["Smartplug Status"]:
+            if name in plug_statuses and str(plug["Id"]) == str(payload["DeviceId"]):
+                plug["Status"] = plug_statuses[name]
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(actions, "WAIT_INITIAL_INTERVAL", 0.001)
+    monkeypatch.setattr(actions, "WAIT_MAX_INTERVAL", 0.001)
+
+
+LOCKS = [
+    {"Serial": "L1", "Status": actions.LOCK_STATUS_UNLOCKED},
+    {"SerialNo": "L2", "Status": actions.LOCK_STATUS_UNLOCKED},
+]
+PLUGS = [{"Id": 11, "Status": "Off"}, {"Id": 12, "Status": "On"}]
+
+
+def test_lock_all_waits_for_serial_and_serialno_locks():
+    api = FakePanelAPI(locks=LOCKS)
+    assert ActionsManager(api).lock_all(wait=True, timeout=2) == {"L1": True, "L2": True}
+    assert sorted(payload["LockSerial"] for name, payload in api.calls) == ["L1", "L2"]
+
+
+def test_unlock_all_sends_the_panel_code():
+    api = FakePanelAPI(locks=[dict(lock, Status=actions.LOCK_STATUS_LOCKED) for lock in LOCKS])
+    assert ActionsManager(api).unlock_all(wait=True, timeout=2) == {"L1": True, "L2": True}
+    assert all(name == "Unlock" and payload["PanelCode"] == "1234" for name, payload in api.calls)
+
+
+def test_lock_wait_times_out_when_the_state_never_changes():
+    api = FakePanelAPI(locks=LOCKS)
+    api.apply = lambda name, payload: None
+    assert ActionsManager(api).lock_door("L2", wait=True, timeout=0.05) is False
+    assert api.polls > 1
+
+
+def test_set_smartplugs_switches_every_plug():
+    api = FakePanelAPI(plugs=PLUGS)
+    assert ActionsManager(api).set_smartplugs(True, wait=True, timeout=2) == {11: True, 12: True}
+    assert [plug["Status"] for plug in api.state["Smartplug Status"]] == ["On", "On"]
+
+
+def test_set_smartplugs_with_string_ids():
+    api = FakePanelAPI(plugs=PLUGS)
+    assert ActionsManager(api).set_smartplugs({"11": True, "12": False}, wait=True, timeout=2) == {
+        "11": True, "12": True}
+    assert sorted(name for name, payload in api.calls) == ["TurnOffSmartplug", "TurnOnSmartplug"]
+
+
+def test_arm_partial_waits_for_home_mode():
+    api = FakePanelAPI()
+    assert ActionsManager(api).arm_partial(wait=True, timeout=2) is True
+    assert api.state["Panel Status"]["Status"] == actions.PANEL_STATUS_PARTIALLY_ARMED
+    assert api.calls == [("PartialArm", {"PanelCode": "1234", "PanelId": "123456"})]
+
+
+@pytest.mark.parametrize("method, name", [("arm_annex", "ArmAnnex"), ("disarm_annex", "DisarmAnnex")])
+def test_annex_payload(method, name):
+    api = FakePanelAPI()
+    assert getattr(ActionsManager(api), method)() is True
+    assert api.calls == [(name, {"PanelCode": "1234", "PanelId": "123456"})]
+
+
+def test_rejected_action_is_not_awaited():
+    api = FakePanelAPI(status_code=403)
+    assert ActionsManager(api).arm_system(wait=True, timeout=2) is False
+    assert api.polls == 0
+
+
+def test_run_bulk_counts_exceptions_as_failures():
+    def action(key):
+        if key == "bad":
+            raise RuntimeError("boom")
+        return key
+
+    assert run_bulk(action, ["ok", "bad", ""]) == {"ok": True, "bad": False, "": False}
+    assert run_bulk(action, []) == {}
+
+
+def test_arm_many_reports_per_panel():
+    class FakeClient:
+        def __init__(self, panel_id, status_code):
+            self.panel_id = panel_id
+            self.actions_manager = ActionsManager(FakePanelAPI(panel_id, status_code=status_code))
+
+    apis = [FakeClient("1", 200), FakeClient("2", 500)]
+    assert arm_many(apis, wait=True, timeout=2) == {"1": True, "2": False}
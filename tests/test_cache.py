@@ -0,0 +1,52 @@
+# tests/test_cache.py
+
+import pytest
+
+from sectoralarm.cache import CacheManager, MemoryBudget
+from sectoralarm.hooks import HookDispatcher, MetricsHooks
+
+
+class StubAPI:
+    panel_id = "123456"
+
+    def __init__(self):
+        self.metrics = MetricsHooks()
+        self.hooks = HookDispatcher([self.metrics])
+
+
+def test_reads_report_hits_and_misses(tmp_path):
+    api = StubAPI()
+    cache = CacheManager(api, cache_file=str(tmp_path / "cache.json"))
+    assert cache.get_entry("Panel Status") is None
+    cache.store("Panel Status", {"Status": 1})
+    assert cache.get_entry("Panel Status").data == {"Status": 1}
+    assert cache.get_data("Panel Status") == {"Status": 1}
+    assert cache.get_fresh_data("Panel Status") == {"Status": 1}
+    assert cache.get_data("Panel Status", max_age=-1) is None
+    assert sum(api.metrics.cache_hits.values()) == 3
+    assert sum(api.metrics.cache_misses.values()) == 2
+
+
+@pytest.mark.parametrize("budget", [4096, 4096.0, 4e3])
+def test_memory_budget_in_bytes(tmp_path, budget):
+    cache = CacheManager(StubAPI(), cache_file=str(tmp_path / "cache.json"), memory_budget=budget)
+    assert isinstance(cache.memory_budget, MemoryBudget)
+    assert cache.memory_budget.max_bytes == int(budget)
+    cache.store("Panel Status", {"Status": 1})
+    assert cache.memory_usage()["budget"]["bytes"] > 0
+
+
+@pytest.mark.parametrize("budget", ["4096", True, [4096]])
+def test_invalid_memory_budget(tmp_path, budget):
+    with pytest.raises(TypeError):
+        CacheManager(StubAPI(), cache_file=str(tmp_path / "cache.json"), memory_budget=budget)
+
+
+def test_statistics_ignore_structure_placeholders(tmp_path):
+    cache = CacheManager(StubAPI(), cache_file=str(tmp_path / "cache.json"))
+    cache.cache["Lock Status"] = [{"Serial": None, "Status": None}]
+    assert cache.statistics()["categories"]["Lock Status"]["updates"] == 0
+    cache.store("Lock Status", [{"Serial": "L1", "Status": "lock"}])
+    cache.statistics()
+    counters = cache.statistics()["categories"]["Lock Status"]
+    assert (counters["changes"], counters["updates"]) == (0, 1)
@@ -0,0 +1,145 @@
+# tests/test_client.py
+
+import json
+import threading
+
+import pytest
+
+from sectoralarm import client as client_module
+from sectoralarm.breaker import CircuitBreakers
+from sectoralarm.client import SectorAlarmAPI
+from sectoralarm.endpoints import get_endpoint
+from sectoralarm.singleflight import SingleFlight
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {"Content-Type": "application/json"}
+
+    def __init__(self, data):
+        self.text = json.dumps(data)
+        self.content = self.text.encode()
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class FakeSession:
+    """Answers with the account of the authorization token; the first request waits until released."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.requests = 0
+
+    def respond(self, headers):
+        self.requests += 1
+        if self.requests == 1:
+            self.started.set()
+            self.release.wait(5)
+        return FakeResponse({"Status": 1, "Account": headers.get("Authorization")})
+
+    def post(self, url, headers=None, **kwargs):
+        return self.respond(headers)
+
+    def get(self, url, headers=None, **kwargs):
+        return self.respond(headers)
+
+
+class FakeTransport:
+    def __init__(self):
+        self.session = FakeSession()
+
+
+def client(email, transport, group):
+    api = SectorAlarmAPI(email, "secret", "123456", None, request_group=group, transport=transport,
+                         breakers=CircuitBreakers())
+    api.auth_token = email
+    return api
+
+
+def test_clients_do_not_share_responses(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    transport = FakeTransport()
+    group = SingleFlight()
+    first, second = client("a@example.com", transport, group), client("b@example.com", transport, group)
+
+    results = {}
+    thread = threading.Thread(target=lambda: results.update(a=first.retrieve_category_data("Panel Status")))
+    thread.start()
+    assert transport.session.started.wait(5)
+    results["b"] = second.retrieve_category_data("Panel Status")
+    transport.session.release.set()
+    thread.join()
+
+    assert results["a"]["Account"] == "a@example.com"
+    assert results["b"]["Account"] == "b@example.com"
+    assert first.cache_manager.get_data("Panel Status")["Account"] == "a@example.com"
+    assert second.cache_manager.get_data("Panel Status")["Account"] == "b@example.com"
+    assert transport.session.requests == 2
+
+
+class ScriptedSession:
+    """Answers with the given status codes in turn, then 200."""
+
+    def __init__(self, *status_codes):
+        self.status_codes = list(status_codes)
+        self.requests = []
+
+    def respond(self, url):
+        self.requests.append(url)
+        response = FakeResponse({"Status": 1})
+        if self.status_codes:
+            response.status_code = self.status_codes.pop(0)
+        return response
+
+    def post(self, url, **kwargs):
+        return self.respond(url)
+
+    def get(self, url, **kwargs):
+        return self.respond(url)
+
+
+def scripted_client(tmp_path, monkeypatch, *status_codes):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(client_module, "RETRY_DELAY", 0)
+    transport = FakeTransport()
+    transport.session = ScriptedSession(*status_codes)
+    return client("a@example.com", transport, SingleFlight()), transport.session
+
+
+def test_cached_data_is_used_within_its_ttl(tmp_path, monkeypatch):
+    api, session = scripted_client(tmp_path, monkeypatch)
+    assert api.get_category_data("Panel Status") == {"Status": 1}
+    assert api.get_category_data("Panel Status") == {"Status": 1}
+    assert len(session.requests) == 1
+    api.get_category_data("Panel Status", max_age=-1)
+    assert len(session.requests) == 2
+
+
+def test_idempotent_requests_are_retried(tmp_path, monkeypatch):
+    api, session = scripted_client(tmp_path, monkeypatch, 503)
+    assert api.retrieve_category_data("Panel Status") == {"Status": 1}
+    assert len(session.requests) == 2
+
+
+def test_actions_are_not_retried(tmp_path, monkeypatch):
+    api, session = scripted_client(tmp_path, monkeypatch, 503)
+    assert not get_endpoint("Arm").idempotent
+    assert not api.actions_manager.arm_system()
+    assert len(session.requests) == 1
+
+
+def test_unlock_is_sent_once_after_a_read_timeout(tmp_path, monkeypatch):
+    from requests.exceptions import ReadTimeout
+
+    api, session = scripted_client(tmp_path, monkeypatch)
+
+    def timeout(url, **kwargs):
+        session.requests.append(url)
+        raise ReadTimeout("Read timed out.")
+
+    session.post = timeout
+    with pytest.raises(ReadTimeout):
+        api.actions_manager.unlock_door("L1")
+    assert len(session.requests) == 1
@@ -0,0 +1,121 @@
+# tests/test_commands.py
+
+import json
+import threading
+
+import pytest
+
+from sectoralarm import transport as transport_module
+from sectoralarm.commands import ClientPool, build_operations, command_usage, run_batch
+from sectoralarm.main import SUBCOMMANDS
+
+
+@pytest.mark.parametrize("command", SUBCOMMANDS)
+def test_command_usage(command, capsys):
+    command_usage(command)
+    out = capsys.readouterr().out
+    assert f"sectoralarm {command} [options]" in out
+    assert "{Label,Temperature}" in out
+    assert "{Label}" in out
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {"Content-Type": "application/json"}
+
+    def __init__(self, data):
+        self.text = json.dumps(data)
+        self.content = self.text.encode()
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class FakeSession:
+    """Answers every request; logins to blocked accounts wait until released."""
+
+    def __init__(self):
+        self.blocked = {}
+        self.logins = []
+
+    def post(self, url, json=None, **kwargs):
+        if url.endswith("/Login"):
+            self.logins.append(json["UserId"])
+            if json["UserId"] in self.blocked:
+                self.blocked[json["UserId"]].wait(5)
+            return FakeResponse({"AuthorizationToken": "token-" + json["UserId"]})
+        return FakeResponse({"Status": 1})
+
+    def get(self, url, **kwargs):
+        return FakeResponse({"Status": 1})
+
+    def close(self):
+        pass
+
+
+class FakeTransport:
+    def __init__(self):
+        self.session = FakeSession()
+
+    def stats(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def transport(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fake = FakeTransport()
+    monkeypatch.setattr(transport_module, "_default_pool", fake)
+    return fake
+
+
+def test_login_does_not_block_other_accounts(transport):
+    pool = ClientPool({"password": "secret"})
+    transport.session.blocked["slow@example.com"] = threading.Event()
+    slow = threading.Thread(target=pool.get, args=({"email": "slow@example.com", "panel_id": "1"},))
+    slow.start()
+    try:
+        api = pool.get({"email": "fast@example.com", "panel_id": "2"})
+        assert api.auth_token == "token-fast@example.com"
+        assert slow.is_alive()
+    finally:
+        transport.session.blocked["slow@example.com"].set()
+        slow.join()
+    pool.get({"email": "slow@example.com", "panel_id": "3"})
+    assert sorted(transport.session.logins) == ["fast@example.com", "slow@example.com"]
+
+
+def test_malformed_operations_fail_alone(transport):
+    pool = ClientPool({"email": "user@example.com", "password": "secret", "panel_id": "1"})
+    operations = build_operations("status", {"config": pool.config, "batch": None}, [])
+    operations += ["arm", {"command": 5}, {"command": "lock", "lock_serial": {"bad": 1}},
+                   {"command": "get", "categories": "Logs"}, {"command": "status", "panel_id": ["1"]}]
+    records = run_batch(pool, operations)
+    assert records[0]["success"], records[0]
+    assert [record["success"] for record in records[1:]] == [False] * 5
+    assert all("must" in record["error"] for record in records[1:])
+
+
+def test_get_without_oids_fails_alone(transport, tmp_path):
+    batch = tmp_path / "batch.jsonl"
+    batch.write_text('{"command": "get"}\n{"command": "status"}\n')
+    pool = ClientPool({"email": "user@example.com", "password": "secret", "panel_id": "1"})
+    records = run_batch(pool, build_operations("status", {"config": pool.config, "batch": str(batch)}, []))
+    assert [record["success"] for record in records] == [False, True]
+    assert "requires 'oids' or 'categories'" in records[0]["error"]
+    with pytest.raises(ValueError):
+        build_operations("get", {"config": pool.config, "batch": None}, [])
+
+
+def test_annex_actions_cannot_wait(transport, tmp_path):
+    batch = tmp_path / "batch.json"
+    batch.write_text('[{"command": "annex-arm"}, {"command": "annex-disarm", "wait": true}]')
+    pool = ClientPool({"email": "user@example.com", "password": "secret", "panel_id": "1"})
+    operations = build_operations("status", {"config": pool.config, "batch": str(batch), "wait": True}, [])
+    assert "wait" not in operations[0]
+    records = run_batch(pool, operations)
+    assert [record["success"] for record in records] == [True, False]
+    assert "cannot wait" in records[1]["error"]
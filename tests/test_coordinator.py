@@ -0,0 +1,118 @@
+# tests/test_coordinator.py
+
+import copy
+
+from sectoralarm.coordinator import CoordinatorEntity, DataUpdateCoordinator, index_devices
+from sectoralarm.endpoints import refresh_age
+
+TEMPERATURES = {
+    "Sections": [
+        {"Id": "S1", "Name": "Ground floor", "Places": [
+            {"Id": "P1", "Name": "Kitchen", "Components": [
+                {"SerialNo": "T1", "Label": "Kitchen", "Temperature": 21},
+                {"SerialNo": "T2", "Label": "Hall", "Temperature": 19},
+            ]},
+        ]},
+    ],
+}
+LOCKS = [{"Serial": "L1", "Status": "lock"}, {"Serial": "L2", "Status": "unlock"}]
+
+
+class FakeCacheManager:
+    def __init__(self):
+        self.stale = set()
+
+    def is_stale(self, category):
+        return category in self.stale
+
+
+class FakeAPI:
+    def __init__(self):
+        self.data = {
+            "Temperatures": copy.deepcopy(TEMPERATURES),
+            "Lock Status": copy.deepcopy(LOCKS),
+            "Panel Status": {"Status": 1},
+        }
+        self.max_ages = {}
+        self.cache_manager = FakeCacheManager()
+
+    def get_category_data(self, category, max_age=None):
+        self.max_ages[category] = max_age
+        return copy.deepcopy(self.data[category])
+
+
+def coordinator(api, interval=60):
+    return DataUpdateCoordinator(api, interval, categories=["Temperatures", "Lock Status", "Panel Status"])
+
+
+def test_index_devices_skips_sections_and_places():
+    assert sorted(index_devices("Temperatures", TEMPERATURES)) == ["T1", "T2"]
+    assert sorted(index_devices("Lock Status", LOCKS)) == ["L1", "L2"]
+    assert index_devices("Panel Status", {"Id": "123456", "Status": 1}) == {}
+
+
+def test_change_detection_and_listener_fan_out():
+    api = FakeAPI()
+    updater = coordinator(api)
+    assert updater.refresh() == {"T1", "T2", "L1", "L2"}
+    kitchen = CoordinatorEntity(updater, "T1", "Temperatures")
+    hall = CoordinatorEntity(updater, "T2")
+    panel = CoordinatorEntity(updater, None, "Panel Status")
+    calls = []
+    kitchen.add_listener(lambda: calls.append("kitchen"))
+    hall.add_listener(lambda: calls.append("hall"))
+    panel.add_listener(lambda: calls.append("panel"))
+
+    assert updater.refresh() == set()
+    assert calls == ["panel"]
+
+    api.data["Temperatures"]["Sections"][0]["Places"][0]["Components"][0]["Temperature"] = 25
+    calls.clear()
+    assert updater.refresh() == {"T1"}
+    assert sorted(calls) == ["kitchen", "panel"]
+    assert kitchen.data["Temperature"] == 25
+    assert hall.data["Temperature"] == 19
+    assert panel.data == {"Status": 1}
+    assert kitchen.available and not kitchen.stale
+
+
+def test_removed_device_and_listener():
+    api = FakeAPI()
+    updater = coordinator(api)
+    updater.refresh()
+    lock = CoordinatorEntity(updater, "L2", "Lock Status")
+    calls = []
+    remove = lock.add_listener(lambda: calls.append("lock"))
+
+    api.data["Lock Status"] = api.data["Lock Status"][:1]
+    assert updater.refresh() == {"L2"}
+    assert calls == ["lock"]
+    assert lock.data is None and not lock.available
+    assert "L2" not in updater.categories_by_serial
+
+    remove()
+    api.data["Lock Status"] = copy.deepcopy(LOCKS)
+    assert updater.refresh() == {"L2"}
+    assert calls == ["lock"]
+
+
+def test_failed_category_keeps_previous_data():
+    api = FakeAPI()
+    updater = coordinator(api)
+    updater.refresh()
+    api.get_category_data = lambda category, max_age=None: None
+    assert updater.refresh() == set()
+    assert not updater.last_update_success
+    assert updater.get("L1")["Status"] == "lock"
+    api.cache_manager.stale.add("Lock Status")
+    assert CoordinatorEntity(updater, "L1").stale
+
+
+def test_ttl_skip():
+    api = FakeAPI()
+    updater = coordinator(api, interval=20)
+    updater.refresh()
+    assert set(api.max_ages.values()) == {0}
+    updater.refresh(force=False)
+    assert api.max_ages == {category: refresh_age(category, 20) for category in api.data}
+    assert api.max_ages["Temperatures"] == 280
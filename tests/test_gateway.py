@@ -0,0 +1,152 @@
+# tests/test_gateway.py
+
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from urllib.request import urlopen
+
+import pytest
+
+from sectoralarm.gateway import Gateway, GatewayRequestHandler, websocket_accept
+
+
+class StubAPI:
+    def __init__(self, panel_id):
+        self.panel_id = panel_id
+        self.reads = []
+
+    def get_category_data(self, category, max_age=None):
+        self.reads.append((category, max_age))
+        return {"Status": 1}
+
+
+def test_poll_skips_categories_within_their_ttl():
+    api = StubAPI("123456")
+    gateway = Gateway([api], interval=10, categories=["Panel Status", "Cameras"])
+    gateway.poll()
+    gateway.poll(force=True)
+    assert api.reads == [("Panel Status", 20), ("Cameras", 3590), ("Panel Status", 0), ("Cameras", 0)]
+    assert gateway.snapshot() == {"123456": {"Panel Status": {"Status": 1}, "Cameras": {"Status": 1}}}
+
+
+def test_state_is_sent_without_holding_the_lock():
+    locked = []
+
+    class Handler(GatewayRequestHandler):
+        def _send_json(self, status, body):
+            locked.append(self.server.gateway.lock.locked())
+            super()._send_json(status, body)
+
+        def log_message(self, *args):
+            pass
+
+    gateway = Gateway([StubAPI("123456")], categories=["Panel Status"])
+    gateway.poll()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.gateway = gateway
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with urlopen(f"http://127.0.0.1:{server.server_address[1]}/state?panel=123456", timeout=5) as response:
+            state = json.loads(response.read())
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert state == {"123456": {"Panel Status": {"Status": 1}}}
+    assert locked == [False]
+
+
+@pytest.fixture
+def server():
+    gateway = Gateway([StubAPI("123456")], categories=["Panel Status"])
+    gateway.poll()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GatewayRequestHandler)
+    server.daemon_threads = True
+    server.gateway = gateway
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def handshake(server, version="13"):
+    """Open a WebSocket connection; return the socket, its reader and the response status line."""
+    sock = socket.create_connection(server.server_address, timeout=5)
+    key = "dGhlIHNhbXBsZSBub25jZQ=="
+    sock.sendall((f"GET /ws HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                  f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: {version}\r\n\r\n").encode())
+    reader = sock.makefile("rb")
+    status = reader.readline().decode()
+    headers = {}
+    for line in iter(reader.readline, b"\r\n"):
+        name, value = line.decode().split(":", 1)
+        headers[name.strip()] = value.strip()
+    if status.startswith("HTTP/1.1 101"):
+        assert headers["Sec-WebSocket-Accept"] == websocket_accept(key)
+    return sock, reader, status, headers
+
+
+def client_frame(opcode, payload=b"", masked=True):
+    mask = os.urandom(4) if masked else b""
+    body = bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload)) if masked else payload
+    return struct.pack("!BB", 0x80 | opcode, (0x80 if masked else 0) | len(payload)) + mask + body
+
+
+def server_frame(reader):
+    first, length = reader.read(2)
+    if length == 126:
+        length = struct.unpack("!H", reader.read(2))[0]
+    return first & 0x0F, reader.read(length)
+
+
+def wait_until(condition):
+    deadline = time.monotonic() + 5
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_websocket_rejects_other_versions(server):
+    sock, reader, status, headers = handshake(server, version="8")
+    assert status.startswith("HTTP/1.1 426")
+    assert headers["Sec-WebSocket-Version"] == "13"
+    sock.close()
+
+
+def test_websocket_answers_ping_and_close(server):
+    sock, reader, status, headers = handshake(server)
+    assert status.startswith("HTTP/1.1 101")
+    opcode, payload = server_frame(reader)
+    assert opcode == 0x1 and json.loads(payload)["type"] == "snapshot"
+
+    sock.sendall(client_frame(0xA, b"unsolicited pong") + client_frame(0x9, b"hello"))
+    assert server_frame(reader) == (0xA, b"hello")
+
+    sock.sendall(client_frame(0x8, struct.pack("!H", 1000) + b"bye"))
+    assert server_frame(reader) == (0x8, struct.pack("!H", 1000))
+    assert reader.read(1) == b""
+    assert wait_until(lambda: not server.gateway.subscribers)
+    sock.close()
+
+
+def test_websocket_closes_on_unmasked_frames(server):
+    sock, reader, status, headers = handshake(server)
+    server_frame(reader)
+    sock.sendall(client_frame(0x1, b"{}", masked=False))
+    assert server_frame(reader) == (0x8, struct.pack("!H", 1002))
+    assert wait_until(lambda: not server.gateway.subscribers)
+    sock.close()
+
+
+def test_websocket_client_disconnect_ends_the_stream(server):
+    sock, reader, status, headers = handshake(server)
+    server_frame(reader)
+    assert len(server.gateway.subscribers) == 1
+    sock.shutdown(socket.SHUT_WR)
+    assert wait_until(lambda: not server.gateway.subscribers)
+    sock.close()
@@ -0,0 +1,142 @@
+# tests/test_history.py
+
+import copy
+import os
+
+import pytest
+
+from sectoralarm.history import HistoryStore, apply_delta, diff
+from sectoralarm.snapshot import SnapshotError
+
+BASE = {
+    "123456": {
+        "Panel Status": {"Status": 1, "IsOnline": True},
+        "Lock Status": [
+            {"Serial": "L1", "Status": "locked", "Extra": {"Battery": 80}},
+            {"Serial": "L2", "Status": "unlocked"},
+        ],
+        "Logs": [{"Time": "1", "EventType": "armed"}, {"Time": "2", "EventType": "disarmed"}],
+    },
+}
+
+
+def changed(change):
+    state = copy.deepcopy(BASE)
+    change(state)
+    return state
+
+
+CHANGES = {
+    "add panel": lambda s: s.update({"654321": {"Panel Status": {"Status": 3}}}),
+    "remove panel": lambda s: s.pop("123456"),
+    "add category": lambda s: s["123456"].update({"Smartplug Status": []}),
+    "remove category": lambda s: s["123456"].pop("Panel Status"),
+    "add field": lambda s: s["123456"]["Panel Status"].update({"ArmedTime": "now"}),
+    "remove field": lambda s: s["123456"]["Panel Status"].pop("IsOnline"),
+    "add item field": lambda s: s["123456"]["Lock Status"][1].update({"Battery": 50}),
+    "remove item field": lambda s: s["123456"]["Lock Status"][0].pop("Status"),
+    "add nested field": lambda s: s["123456"]["Lock Status"][0]["Extra"].update({"Signal": 3}),
+    "remove nested field": lambda s: s["123456"]["Lock Status"][0]["Extra"].pop("Battery"),
+    "change nested field": lambda s: s["123456"]["Lock Status"][0]["Extra"].update({"Battery": 20}),
+    "add item": lambda s: s["123456"]["Lock Status"].append({"Serial": "L3", "Status": "locked"}),
+    "remove item": lambda s: s["123456"]["Lock Status"].pop(0),
+    "append log": lambda s: s["123456"]["Logs"].append({"Time": "3", "EventType": "armed"}),
+    "rotate log": lambda s: s["123456"].update({"Logs": s["123456"]["Logs"][1:] + [{"Time": "3"}]}),
+}
+
+
+@pytest.mark.parametrize("name", sorted(CHANGES))
+def test_round_trip(name):
+    new = changed(CHANGES[name])
+    ops = diff(BASE, new)
+    assert ops
+    assert apply_delta(copy.deepcopy(BASE), ops) == new
+
+
+@pytest.mark.parametrize("name", sorted(CHANGES))
+def test_round_trip_reverse(name):
+    new = changed(CHANGES[name])
+    assert apply_delta(copy.deepcopy(new), diff(new, BASE)) == BASE
+
+
+def test_equal_states_have_no_delta():
+    assert diff(BASE, copy.deepcopy(BASE)) == []
+
+
+def test_replace_whole_state():
+    assert apply_delta(copy.deepcopy(BASE), diff(BASE, [1, 2])) == [1, 2]
+
+
+def states(count):
+    """Successive states in which the first lock's battery drains."""
+    result = []
+    for step in range(count):
+        state = copy.deepcopy(BASE)
+        state["123456"]["Lock Status"][0]["Extra"]["Battery"] = 80 - step
+        result.append(state)
+    return result
+
+
+def test_keyframe_interval(tmp_path):
+    with HistoryStore(str(tmp_path / "history.bin"), keyframe_interval=3) as store:
+        for timestamp, state in enumerate(states(7)):
+            assert store.append(state, timestamp)
+        assert not store.append(states(7)[-1], 7)
+        assert store.keyframes == [0, 3, 6]
+
+
+def test_state_at(tmp_path):
+    expected = states(5)
+    with HistoryStore(str(tmp_path / "history.bin"), keyframe_interval=2) as store:
+        for timestamp, state in enumerate(expected):
+            store.append(state, timestamp * 10)
+        assert store.state_at(-1) is None
+        assert store.state_at(25) == expected[2]
+        assert store.state_at() == expected[-1]
+        assert store.diff(0, 10) == diff(expected[0], expected[1])
+        with pytest.raises(ValueError):
+            store.append(BASE, 5)
+
+
+def test_reopen_after_torn_write(tmp_path):
+    path = str(tmp_path / "history.bin")
+    expected = states(4)
+    with HistoryStore(path) as store:
+        for timestamp, state in enumerate(expected[:3]):
+            store.append(state, timestamp)
+    size = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(b"D" + b"\0" * 7)
+
+    with HistoryStore(path) as store:
+        assert os.path.getsize(path) == size
+        assert store.state_at() == expected[2]
+        store.append(expected[3], 3)
+    with HistoryStore(path) as store:
+        assert len(store.timestamps) == 4
+        assert store.state_at() == expected[3]
+
+
+@pytest.mark.parametrize("offset, data", [(0, b"NOTHIS"), (8, b"X"), (8, b"D")])
+def test_corrupt_history(tmp_path, offset, data):
+    path = str(tmp_path / "history.bin")
+    with HistoryStore(path) as store:
+        store.append(BASE, 0)
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        f.write(data)
+    with pytest.raises(SnapshotError):
+        HistoryStore(path)
+
+
+def test_corrupt_delta(tmp_path):
+    path = str(tmp_path / "history.bin")
+    with HistoryStore(path) as store:
+        store.append(BASE, 0)
+        store.append(states(2)[1], 1)
+        # A delta naming a lock that is not in the keyframe
+        store._last_state["123456"]["Lock Status"][0]["Serial"] = "L9"
+        store.append(changed(lambda s: s["123456"]["Lock Status"][0].update({"Serial": "L9", "Status": "x"})), 2)
+    with HistoryStore(path) as store:
+        with pytest.raises(SnapshotError):
+            store.state_at()
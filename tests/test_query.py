@@ -0,0 +1,35 @@
+# tests/test_query.py
+
+import pytest
+
+from sectoralarm.query import Condition, compile_query
+
+TEMPERATURES = {
+    "Sections": [{"Name": "Ground floor", "Places": [{"Name": "Kitchen", "Components": [
+        {"Label": "Stove", "SerialNo": "T1", "Temperature": "26.1"},
+        {"Label": "Window", "SerialNo": "T2", "Temperature": "9.5"},
+        {"Label": "Door", "SerialNo": "T3", "Temperature": 30},
+    ]}]}],
+}
+
+
+@pytest.mark.parametrize("text, item, expected", [
+    ("Temperature>25", {"Temperature": "26.1"}, True),
+    ("Temperature>25", {"Temperature": "9.5"}, False),
+    ("Temperature<=9.5", {"Temperature": "9.5"}, True),
+    ("Temperature>25", {"Temperature": 26}, True),
+    ("Temperature=21", {"Temperature": "21.0"}, True),
+    ("Temperature!=21", {"Temperature": "21.0"}, False),
+    ("Temperature>25", {"Temperature": "n/a"}, False),
+    ("Temperature>25", {"Temperature": True}, False),
+    ("Label>B", {"Label": "C"}, True),
+    ("Label<'26'", {"Label": "3"}, False),
+])
+def test_condition(text, item, expected):
+    assert Condition(text).matches(item) is expected
+
+
+def test_filter_numeric_strings():
+    query = compile_query("Temperatures/*/*/Components[?Temperature>25]{Label,Temperature}")
+    values = [value for _, value in query.evaluate("Temperatures", TEMPERATURES)]
+    assert values == [{"Label": "Stove", "Temperature": "26.1"}, {"Label": "Door", "Temperature": 30}]
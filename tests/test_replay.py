@@ -0,0 +1,99 @@
+# tests/test_replay.py
+
+import json
+import time
+
+from sectoralarm.breaker import CircuitBreakers
+from sectoralarm.client import SectorAlarmAPI
+from sectoralarm.replay import RecordingTransport, ReplaySession, ReplayTransport
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {"Content-Type": "application/json"}
+
+    def __init__(self, data):
+        self.text = json.dumps(data)
+        self.content = self.text.encode()
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class FakeSession:
+    def post(self, url, json=None, **kwargs):
+        return FakeResponse({"AuthorizationToken": "secret-token"} if url.endswith("/Login") else {})
+
+    def get(self, url, **kwargs):
+        return FakeResponse({})
+
+    def close(self):
+        pass
+
+
+class FakeTransport:
+    session = FakeSession()
+
+    def stats(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+def test_recording_redacts_panel_code(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cassette = str(tmp_path / "traffic.jsonl")
+    transport = RecordingTransport(cassette, FakeTransport())
+    api = SectorAlarmAPI("user@example.com", "hunter2", "123456", "8642", transport=transport,
+                         breakers=CircuitBreakers())
+    api.login()
+    assert api.actions_manager.arm_system()
+
+    with open(cassette, encoding="utf-8") as f:
+        recorded = f.read()
+    assert transport.session.count == 2
+    for secret in ("8642", "hunter2", "user@example.com", "secret-token"):
+        assert secret not in recorded
+
+    replayed = SectorAlarmAPI("user@example.com", "hunter2", "123456", "1357", transport=ReplayTransport(cassette),
+                              breakers=CircuitBreakers())
+    replayed.login()
+    assert replayed.actions_manager.arm_system()
+
+
+def write_cassette(path, offsets):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"version": 1}) + "\n")
+        for offset in offsets:
+            f.write(json.dumps({"method": "GET", "url": "https://example.com/status", "body": None, "status": 200,
+                                "content_type": "application/json", "response": "{}", "elapsed": 0.1,
+                                "offset": offset}) + "\n")
+
+
+def test_replay_follows_recorded_offsets(tmp_path):
+    cassette = str(tmp_path / "traffic.jsonl")
+    write_cassette(cassette, [0.0, 1.0])
+    session = ReplaySession(cassette, speed=10)
+    start = time.monotonic()
+    times = []
+    for _ in range(3):
+        session.get("https://example.com/status")
+        times.append(time.monotonic() - start)
+    # Due at (offset + elapsed) / speed, and on the looped pass one recording length (1.1s) later
+    assert 0.01 <= times[0] < 0.1
+    assert 0.11 <= times[1] < 0.2
+    assert 0.12 <= times[2] < 0.25
+    assert session.served == 3
+
+
+def test_replay_as_fast_as_possible(tmp_path):
+    cassette = str(tmp_path / "traffic.jsonl")
+    write_cassette(cassette, [0.0, 100.0])
+    session = ReplaySession(cassette, loop=False)
+    start = time.monotonic()
+    assert session.get("https://example.com/status").status_code == 200
+    assert session.get("https://example.com/status").status_code == 200
+    assert session.get("https://example.com/status").status_code == 404
+    assert time.monotonic() - start < 0.1
+    assert (session.served, session.missed) == (2, 1)
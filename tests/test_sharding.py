@@ -0,0 +1,43 @@
+# tests/test_sharding.py
+
+from sectoralarm.history import diff
+from sectoralarm.sharding import Aggregator
+
+
+def metrics(shard, cycle):
+    return {"type": "metrics", "shard": shard, "cycle": cycle, "duration": 0.1, "panels": 1, "metrics": {}}
+
+
+def test_cycle_completes_after_every_shard():
+    aggregator = Aggregator(shards=2)
+    assert not aggregator.add(metrics(0, 1))
+    assert aggregator.add(metrics(1, 1))
+    assert not aggregator.add(metrics(1, 2))
+    assert aggregator.add(metrics(0, 2))
+    assert aggregator.cycle == 2
+
+
+def test_stopped_shard_does_not_hold_back_cycles():
+    aggregator = Aggregator(shards=2)
+    assert not aggregator.add(metrics(0, 1))
+    assert aggregator.add({"type": "stopped", "shard": 1, "cycles": 0})
+    assert aggregator.add(metrics(0, 2))
+
+
+def test_event_adding_keys():
+    old = {"Status": 1}
+    new = {"Status": 3, "ArmedTime": "now", "Annex": {"Status": 1}}
+    aggregator = Aggregator(shards=1)
+    aggregator.add({"type": "snapshot", "shard": 0, "panel_id": "1", "state": {"Panel Status": dict(old)}})
+    aggregator.add({"type": "event", "shard": 0, "panel_id": "1", "category": "Panel Status",
+                    "changes": diff(old, new)})
+    assert aggregator.states["1"]["Panel Status"] == new
+
+
+def test_event_that_does_not_apply_drops_the_state():
+    aggregator = Aggregator(shards=1)
+    aggregator.add({"type": "snapshot", "shard": 0, "panel_id": "1", "state": {"Logs": []}})
+    aggregator.add({"type": "event", "shard": 0, "panel_id": "1", "category": "Logs",
+                    "changes": [{"op": "remove", "path": [5]}]})
+    assert "1" not in aggregator.states
+    assert aggregator.events == 1
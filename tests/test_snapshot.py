@@ -0,0 +1,132 @@
+# tests/test_snapshot.py
+
+import importlib.util
+import json
+import os
+
+import pytest
+
+from sectoralarm.snapshot import (COMPRESSOR_NONE, COMPRESSOR_ZLIB, HEADER, SERIALIZER_JSON, SERIALIZER_MSGPACK,
+                                  Snapshot, SnapshotAPI, SnapshotError, write_snapshot)
+
+PANELS = {
+    "123456": {
+        "Lock Status": [{"Serial": "L1", "Label": "Front door", "Status": "locked"}],
+        "Smoke Detector": [{"SerialNo": "S1", "Label": "Kitchen smoke detector"}],
+    },
+}
+
+
+def test_search(tmp_path):
+    path = str(tmp_path / "panels.snap")
+    write_snapshot(path, PANELS)
+    api = SnapshotAPI(path)
+    results = api.search("kitchen")
+    assert [result["category"] for result in results] == ["Smoke Detector"]
+    assert api.search("kitchen", category="Lock Status") == []
+    assert api.search("front door")[0]["category"] == "Lock Status"
+
+
+@pytest.mark.parametrize("compressor", [COMPRESSOR_NONE, COMPRESSOR_ZLIB])
+def test_round_trip(tmp_path, compressor):
+    path = str(tmp_path / "panels.snap")
+    size = write_snapshot(path, PANELS, serializer=SERIALIZER_JSON, compressor=compressor, created=1.5)
+    assert size == os.path.getsize(path)
+    with Snapshot(path) as snapshot:
+        assert snapshot.created == 1.5
+        assert snapshot.panels() == ["123456"]
+        assert snapshot.categories("123456") == list(PANELS["123456"])
+        assert snapshot.load_panel("123456") == PANELS["123456"]
+        assert snapshot.get("123456", "Logs") is None
+
+
+def corrupt(tmp_path, change, compressor=COMPRESSOR_ZLIB):
+    path = str(tmp_path / "panels.snap")
+    write_snapshot(path, PANELS, serializer=SERIALIZER_JSON, compressor=compressor)
+    with open(path, "rb") as f:
+        content = bytearray(f.read())
+    with open(path, "wb") as f:
+        f.write(change(content))
+    return path
+
+
+def header(content):
+    return HEADER.unpack_from(content, 0)
+
+
+def with_index(content, index):
+    magic, version, codec, index_len = header(content)
+    blobs = content[HEADER.size + index_len:]
+    index_bytes = json.dumps(index).encode()
+    return HEADER.pack(magic, version, codec, len(index_bytes)) + index_bytes + blobs
+
+
+def index_of(content):
+    index_len = header(content)[3]
+    return json.loads(bytes(content[HEADER.size:HEADER.size + index_len]))
+
+
+def out_of_bounds(content):
+    index = index_of(content)
+    index["panels"]["123456"]["Lock Status"][1] += 1000
+    return with_index(content, index)
+
+
+def negative_offset(content):
+    index = index_of(content)
+    index["panels"]["123456"]["Lock Status"][0] = -1
+    return with_index(content, index)
+
+
+CORRUPTIONS = {
+    "empty": lambda content: b"",
+    "truncated header": lambda content: content[:HEADER.size - 2],
+    "not a snapshot": lambda content: b"NOTSNP" + content[6:],
+    "truncated index": lambda content: content[:HEADER.size + 10],
+    "index not json": lambda content: content[:HEADER.size] + b"\xff" * header(content)[3] + content[
+        HEADER.size + header(content)[3]:],
+    "index missing panels": lambda content: with_index(content, {"created": 1}),
+    "blob out of bounds": out_of_bounds,
+    "negative offset": negative_offset,
+    "truncated blobs": lambda content: content[:-5],
+    "unknown codec": lambda content: content[:7] + bytes([0x07]) + content[8:],
+}
+
+
+@pytest.mark.parametrize("name", sorted(CORRUPTIONS))
+def test_corrupt_file(tmp_path, name):
+    path = corrupt(tmp_path, CORRUPTIONS[name])
+    with pytest.raises(SnapshotError):
+        SnapshotAPI(path)
+
+
+def test_corrupt_blob(tmp_path):
+    def flip_last_blob(content):
+        content[-3] ^= 0xFF
+        return content
+
+    path = corrupt(tmp_path, flip_last_blob)
+    with Snapshot(path) as snapshot:
+        assert snapshot.get("123456", "Lock Status") == PANELS["123456"]["Lock Status"]
+        with pytest.raises(SnapshotError):
+            snapshot.get("123456", "Smoke Detector")
+
+
+@pytest.mark.skipif(importlib.util.find_spec("msgpack") is not None, reason="msgpack is installed")
+def test_missing_codec_package(tmp_path):
+    path = corrupt(tmp_path, lambda content: content[:7] + bytes([SERIALIZER_MSGPACK << 4 | COMPRESSOR_ZLIB])
+                   + content[8:])
+    with pytest.raises(SnapshotError, match="msgpack"):
+        Snapshot(path)
+
+
+def test_snapshot_api_closes_the_file(tmp_path):
+    path = str(tmp_path / "panels.snap")
+    write_snapshot(path, PANELS)
+    with SnapshotAPI(path) as api:
+        assert api.retrieve_category_data("Lock Status") == PANELS["123456"]["Lock Status"]
+    assert api.snapshot._file.closed
+
+    with Snapshot(path) as snapshot:
+        SnapshotAPI(snapshot).close()
+        assert not snapshot._file.closed
@@ -0,0 +1,65 @@
+# tests/test_stats.py
+
+import json
+
+from sectoralarm.stats import StatisticsEngine, collect, flatten
+
+PANELS = {
+    "123456": {
+        "Panel Status": {"Status": 1, "IsOnline": True, "Name": "Hé \"home\"", "Temperature": 21.5},
+        "Temperatures": {
+            "Sections": [
+                {"Name": "Ground floor", "Places": [
+                    {"Name": "Kitchen", "Components": [
+                        {"Type": "SmokeDetector", "Label": "Kitchen smoke", "Temperature": None},
+                        {"Label": "Kitchen plug"},
+                    ]},
+                ]},
+            ],
+        },
+        "Logs": [],
+    },
+}
+
+
+def test_flatten_visits_parents_first():
+    paths = [path for path, depth, value in flatten({"a": [1, {"b": 2}], "c": 3})]
+    assert paths == [(), ("a",), ("a", 0), ("a", 1), ("a", 1, "b"), ("c",)]
+
+
+def test_counts_structure():
+    report = collect(PANELS)
+    temperatures = report["categories"]["Temperatures"]
+    assert (temperatures["sections"], temperatures["places"], temperatures["components"]) == (1, 1, 2)
+    assert report["sections"] == {"Temperatures > Ground floor": {"places": 1, "components": 2}}
+    assert report["device_types"] == {"SmokeDetector": 1, "Temperatures": 1}
+    assert report["totals"]["categories"] == 3
+    assert report["categories"]["Panel Status"]["leaves"] == 4
+
+
+def test_bytes_match_compact_json():
+    report = collect(PANELS)
+    for category, data in PANELS["123456"].items():
+        expected = len(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        assert report["categories"][category]["bytes"] == expected
+
+
+def test_change_tracking():
+    engine = StatisticsEngine()
+    first = engine.update({"1": {"Panel Status": {"Status": 1, "IsOnline": True}}})
+    assert first["categories"]["Panel Status"]["updates"] == 0
+    engine.update({"1": {"Panel Status": {"Status": 3, "IsOnline": True}}})
+    report = engine.update({"1": {"Panel Status": {"Status": 3}}})
+    counters = report["categories"]["Panel Status"]
+    assert (counters["changes"], counters["updates"], counters["change_rate"]) == (2, 2, 1.0)
+
+    engine.reset()
+    assert engine.update({"1": {"Panel Status": {"Status": 1}}})["categories"]["Panel Status"]["updates"] == 0
+
+
+def test_untracked_categories_are_not_remembered():
+    engine = StatisticsEngine()
+    engine.update({"1": {"Lock Status": [{"Serial": None}]}}, untracked={"Lock Status"})
+    engine.update({"1": {"Lock Status": [{"Serial": "L1"}]}})
+    report = engine.update({"1": {"Lock Status": [{"Serial": "L1"}]}})
+    assert (report["categories"]["Lock Status"]["changes"], report["categories"]["Lock Status"]["updates"]) == (0, 1)
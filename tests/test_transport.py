@@ -0,0 +1,74 @@
+# tests/test_transport.py
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from sectoralarm.transport import HTTP2Session, TransportPool
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep connections open between requests
+
+    def do_GET(self):
+        body = b'{"Status": 1}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_stats_count_reused_connections(server):
+    pool = TransportPool()
+    assert pool.stats()["requests"] == 0
+    for _ in range(5):
+        assert pool.session.get(server + "/state", timeout=5).json() == {"Status": 1}
+    stats = pool.stats()
+    assert (stats["requests"], stats["connections"], stats["reused"], stats["pools"]) == (5, 1, 4, 1)
+    assert stats["reuse_ratio"] == 0.8
+    pool.close()
+    assert pool.stats()["requests"] == 0
+
+
+def test_stats_without_keep_alive(server):
+    pool = TransportPool(keep_alive=False)
+    for _ in range(3):
+        pool.session.get(server + "/state", timeout=5)
+    assert pool.stats()["connections"] == 3
+    assert pool.stats()["reused"] == 0
+    pool.close()
+
+
+@pytest.mark.parametrize("error, expected", [
+    ("ConnectError", requests.exceptions.ConnectionError),
+    ("ConnectTimeout", requests.exceptions.ConnectTimeout),
+    ("ReadTimeout", requests.exceptions.ReadTimeout),
+    ("PoolTimeout", requests.exceptions.Timeout),
+])
+def test_http2_errors_are_os_errors(error, expected):
+    httpx = pytest.importorskip("httpx")
+
+    def fail(request):
+        raise getattr(httpx, error)("unreachable", request=request)
+
+    session = HTTP2Session(httpx.Client(transport=httpx.MockTransport(fail)))
+    with pytest.raises(expected) as info:
+        session.post("https://example.invalid/api", json={}, timeout=1)
+    assert isinstance(info.value, OSError)
+    session.close()